@@ -2,8 +2,16 @@
 AI API endpoints
 """
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
+from app.cache import cached
+from app.services.document_analyzer import DocumentAnalyzer, summarize_text
+import asyncio
+import hashlib
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -11,13 +19,30 @@ router = APIRouter()
 
 
 class DocumentRequest(BaseModel):
-    content: str
-    title: str
+    content: Optional[str] = None
+    title: str = ""
+    # Documento já enviado por /upload-pdf: dispensa reenviar o texto
+    document_id: Optional[str] = None
 
 
 class QuestionRequest(BaseModel):
     question: str
-    context: str
+    context: Optional[str] = None
+    document_id: Optional[str] = None
+
+
+async def resolve_text(text: Optional[str], document_id: Optional[str]) -> str:
+    """Text sent in the request, or the stored text of `document_id`"""
+    from app.services.document_store import load_text
+    
+    if document_id:
+        stored = await load_text(document_id)
+        if stored is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        return stored
+    if text is None:
+        raise HTTPException(status_code=400, detail="Send the document text or a document_id")
+    return text
 
 
 # ============================================================
@@ -27,58 +52,119 @@ class QuestionRequest(BaseModel):
 @router.post("/gist-memory")
 async def process_document_gist(request: DocumentRequest):
     """Process document with Gist Memory"""
+    request.content = await resolve_text(request.content, request.document_id)
     try:
         from app.services.cerebras_service import cerebras_service
         
-        # Se o serviço Cerebras não estiver disponível, usar simulação
-        if not cerebras_service:
-            logger.warning("⚠️  Cerebras not configured, using simulation")
-            return simulate_gist_memory(request.content, request.title)
+        # Se o serviço Cerebras não estiver disponível (ou o circuito aberto), usar simulação
+        if not cerebras_service or not cerebras_service.available:
+            logger.warning("⚠️  Cerebras unavailable, using simulation")
+            return await cached_simulate_gist_memory(request.content, request.title, request.document_id)
         
         result = await cerebras_service.gist_memory(request.content)
-        logger.info(f"✅ Gist Memory: {result['total_pages']} pages processed")
+        logger.info(
+            f"✅ Gist Memory: {result['total_pages']} pages processed "
+            f"(cache hit rate {result['cache']['hit_rate']:.0%})"
+        )
         
         return result
     except Exception as e:
         logger.error(f"❌ Gist Memory error: {e}")
         # Fallback para simulação em caso de erro
         logger.info("🔄 Falling back to simulation")
-        return simulate_gist_memory(request.content, request.title)
+        return await cached_simulate_gist_memory(request.content, request.title, request.document_id)
 
 
-def simulate_gist_memory(content: str, title: str) -> dict:
-    """Advanced Gist Memory processing with intelligent analysis"""
-    import re
-    from collections import Counter
+# Versão da análise simulada: alterar a lógica exige trocar a versão (invalida o cache)
+SIMULATION_VERSION = "v1"
+SIMULATION_CACHE_TTL = 7 * 24 * 3600
+
+
+@cached(key="gist:simulation:{digest}", ttl=SIMULATION_CACHE_TTL)
+async def _simulated_gist(digest: str, content: str, title: str, computed: list) -> dict:
+    """simulate_gist_memory keyed by content digest; concurrent misses share one computation"""
+    computed.append(digest)
+    # Análise em CPU (TF-IDF, frases): numa thread para não bloquear o event loop
+    return await asyncio.to_thread(simulate_gist_memory, content, title)
+
+
+async def cached_simulate_gist_memory(content: str, title: str, document_id: Optional[str] = None) -> dict:
+    """simulate_gist_memory cached by content hash (the title does not affect the analysis)"""
+    from app.services.document_store import get_analysis, set_analysis
+    
+    # Documento armazenado: a análise fica persistida junto dele
+    analysis_key = f"gist_memory:{SIMULATION_VERSION}"
+    if document_id:
+        result = await get_analysis(document_id, analysis_key)
+        if result is not None:
+            result["cache"] = {"hits": 1, "misses": 0, "hit_rate": 1.0}
+            return result
     
-    # Análise avançada do documento
-    words = content.split()
-    total_words = len(words)
-    sentences = re.split(r'[.!?]+', content)
-    paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
+    digest = hashlib.sha256(f"{SIMULATION_VERSION}\x00{content}".encode("utf-8")).hexdigest()
+    computed: list = []
+    # Cópia: o mesmo resultado é entregue a todas as chamadas que esperavam a computação
+    result = dict(await _simulated_gist(digest, content, title, computed))
+    hit = not computed
+    if document_id:
+        await set_analysis(document_id, analysis_key, result)
+    result["cache"] = {"hits": int(hit), "misses": int(not hit), "hit_rate": float(hit)}
+    return result
+
+
+def _sse(payload: dict) -> str:
+    """Format one Server-Sent Event"""
+    event = payload.get("event", "message")
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@router.post("/gist-memory/stream")
+async def process_document_gist_stream(request: DocumentRequest):
+    """Process document with Gist Memory, streaming each gist as soon as it is ready (SSE)"""
+    from app.services.cerebras_service import cerebras_service
     
-    # Dividir em seções inteligentes
-    sections = extract_document_sections(content)
-    total_pages = max(1, len(sections))
+    request.content = await resolve_text(request.content, request.document_id)
     
-    # Extrair tópicos principais
-    topics = extract_topics(content)
+    async def events():
+        if not cerebras_service or not cerebras_service.available:
+            logger.warning("⚠️  Cerebras unavailable, using simulation")
+            result = await cached_simulate_gist_memory(request.content, request.title, request.document_id)
+            yield _sse({
+                "event": "start",
+                "total_pages": result["total_pages"],
+                "simulation": True,
+                "cache": result["cache"]
+            })
+            for i, gist in enumerate(result["gists"]):
+                yield _sse({"event": "gist", "page": i + 1, "gist": gist})
+            yield _sse({"event": "done", "total_pages": result["total_pages"], "topics": result["topics"]})
+            return
+        
+        started = time.monotonic()
+        first_gist = True
+        async for event in cerebras_service.gist_memory_stream(request.content):
+            if first_gist and event["event"] == "gist":
+                cerebras_service.record_ttft("gist_memory", time.monotonic() - started)
+                first_gist = False
+            yield _sse(event)
     
-    # Gerar resumos inteligentes para cada seção
-    gists = []
-    for i, section in enumerate(sections):
-        gist = generate_intelligent_summary(section, i + 1, topics)
-        gists.append(gist)
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def simulate_gist_memory(content: str, title: str) -> dict:
+    """Advanced Gist Memory processing with intelligent analysis"""
+    result = DocumentAnalyzer(content).gist_memory()
     
-    logger.info(f"✅ Advanced Gist Memory: {total_pages} sections, {total_words} words, {len(topics)} topics")
+    logger.info(
+        f"✅ Advanced Gist Memory: {result['total_pages']} sections, "
+        f"{result['word_count']} words, {len(result['topics'])} topics"
+    )
     
     return {
-        "total_pages": total_pages,
-        "gists": gists,
-        "topics": topics,
-        "word_count": total_words,
-        "sentence_count": len([s for s in sentences if s.strip()]),
-        "paragraph_count": len(paragraphs),
+        **result,
         "simulation": True,
         "message": "Resumos gerados com análise inteligente avançada"
     }
@@ -86,150 +172,30 @@ def simulate_gist_memory(content: str, title: str) -> dict:
 
 def extract_document_sections(content: str) -> list:
     """Extract logical sections from document"""
-    import re
-    
-    # Padrões para identificar títulos/seções
-    title_patterns = [
-        r'^[A-Z][A-Z\s]{5,}$',  # Títulos em maiúsculas
-        r'^\d+\.\s+[A-Z].*$',   # Numeração (1. Título)
-        r'^[IVX]+\.\s+[A-Z].*$', # Numeração romana
-        r'^[A-Z][^.!?]*:$',     # Títulos com dois pontos
-        r'^\s*#{1,6}\s+.*$'     # Markdown headers
-    ]
-    
-    lines = content.split('\n')
-    sections = []
-    current_section = []
-    
-    for line in lines:
-        line_stripped = line.strip()
-        
-        # Verificar se é um título
-        is_title = any(re.match(pattern, line_stripped, re.MULTILINE) for pattern in title_patterns)
-        
-        if is_title and current_section:
-            # Salvar seção anterior
-            section_text = '\n'.join(current_section).strip()
-            if len(section_text.split()) > 20:  # Mínimo de 20 palavras
-                sections.append(section_text)
-            current_section = [line]
-        else:
-            current_section.append(line)
-    
-    # Adicionar última seção
-    if current_section:
-        section_text = '\n'.join(current_section).strip()
-        if len(section_text.split()) > 20:
-            sections.append(section_text)
-    
-    # Se não encontrou seções, dividir por parágrafos grandes
-    if len(sections) <= 1:
-        paragraphs = content.split('\n\n')
-        sections = [p.strip() for p in paragraphs if len(p.split()) > 50]
-    
-    # Se ainda não tem seções suficientes, dividir por tamanho
-    if len(sections) <= 1:
-        words = content.split()
-        chunk_size = max(200, len(words) // 5)  # Máximo 5 seções
-        sections = []
-        for i in range(0, len(words), chunk_size):
-            chunk = ' '.join(words[i:i + chunk_size])
-            sections.append(chunk)
-    
-    return sections[:10]  # Máximo 10 seções
+    return [section.text for section in DocumentAnalyzer(content).sections]
 
 
 def extract_topics(content: str) -> list:
     """Extract main topics from content using frequency analysis"""
-    import re
-    from collections import Counter
-    
-    # Palavras comuns a ignorar
-    stop_words = {
-        'que', 'de', 'a', 'o', 'e', 'do', 'da', 'em', 'um', 'para', 'é', 'com', 'não', 'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'das', 'dos', 'ao', 'aos', 'às', 'pela', 'pelo', 'pelos', 'pelas',
-        'the', 'of', 'and', 'a', 'to', 'in', 'is', 'you', 'that', 'it', 'he', 'was', 'for', 'on', 'are', 'as', 'with', 'his', 'they', 'i', 'at', 'be', 'this', 'have', 'from', 'or', 'one', 'had', 'by', 'word', 'but', 'not', 'what', 'all', 'were', 'we', 'when', 'your', 'can', 'said', 'there', 'each', 'which', 'she', 'do', 'how', 'their', 'if', 'will', 'up', 'other', 'about', 'out', 'many', 'then', 'them', 'these', 'so', 'some', 'her', 'would', 'make', 'like', 'into', 'him', 'has', 'two', 'more', 'very', 'what', 'know', 'just', 'first', 'get', 'over', 'think', 'also', 'back', 'after', 'use', 'our', 'work', 'life', 'only', 'new', 'way', 'may', 'say'
-    }
-    
-    # Extrair palavras significativas
-    words = re.findall(r'\b[a-zA-ZÀ-ÿ]{3,}\b', content.lower())
-    significant_words = [word for word in words if word not in stop_words and len(word) > 3]
-    
-    # Contar frequências
-    word_freq = Counter(significant_words)
-    
-    # Extrair bigramas (pares de palavras)
-    bigrams = []
-    for i in range(len(significant_words) - 1):
-        bigram = f"{significant_words[i]} {significant_words[i+1]}"
-        bigrams.append(bigram)
-    
-    bigram_freq = Counter(bigrams)
-    
-    # Combinar palavras individuais e bigramas
-    top_words = [word for word, count in word_freq.most_common(10) if count > 1]
-    top_bigrams = [bigram for bigram, count in bigram_freq.most_common(5) if count > 1]
-    
-    topics = top_words + top_bigrams
-    return topics[:8]  # Máximo 8 tópicos
+    return DocumentAnalyzer(content).topics
 
 
 def generate_intelligent_summary(section: str, section_num: int, topics: list) -> str:
     """Generate intelligent summary for a section"""
-    import re
-    
-    words = section.split()
-    sentences = [s.strip() for s in re.split(r'[.!?]+', section) if s.strip()]
-    
-    # Identificar frases-chave
-    key_sentences = []
-    for sentence in sentences:
-        sentence_lower = sentence.lower()
-        # Priorizar frases com tópicos principais
-        topic_matches = sum(1 for topic in topics if topic.lower() in sentence_lower)
-        
-        # Priorizar frases com palavras indicativas
-        indicator_words = ['importante', 'fundamental', 'principal', 'essencial', 'resultado', 'conclusão', 'objetivo', 'método', 'processo', 'descoberta', 'evidência', 'análise', 'estudo', 'pesquisa', 'dados', 'informação']
-        indicator_matches = sum(1 for word in indicator_words if word in sentence_lower)
-        
-        if topic_matches > 0 or indicator_matches > 0:
-            key_sentences.append((sentence, topic_matches + indicator_matches))
-    
-    # Ordenar por relevância
-    key_sentences.sort(key=lambda x: x[1], reverse=True)
-    
-    # Construir resumo
-    if key_sentences:
-        main_sentence = key_sentences[0][0]
-        summary = f"Seção {section_num}: {main_sentence[:150]}..."
-        
-        # Adicionar contexto adicional
-        if len(key_sentences) > 1:
-            summary += f" Também aborda: {key_sentences[1][0][:100]}..."
-    else:
-        # Fallback: usar primeiras frases
-        if sentences:
-            summary = f"Seção {section_num}: {sentences[0][:150]}..."
-            if len(sentences) > 1:
-                summary += f" {sentences[1][:100]}..."
-        else:
-            summary = f"Seção {section_num}: Contém {len(words)} palavras sobre os temas do documento."
-    
-    # Adicionar estatísticas
-    summary += f" ({len(words)} palavras, {len(sentences)} frases)"
-    
-    return summary
+    return summarize_text(section, section_num, topics)
 
 
 @router.post("/ask-question")
 async def ask_question(request: QuestionRequest):
     """Ask question about document"""
+    request.context = await resolve_text(request.context, request.document_id)
     try:
         from app.services.cerebras_service import cerebras_service
         
-        # Se o serviço Cerebras não estiver disponível, usar simulação
-        if not cerebras_service:
-            logger.warning("⚠️  Cerebras not configured, using simulation")
-            return {"answer": simulate_question_answer(request.question, request.context)}
+        # Se o serviço Cerebras não estiver disponível (ou o circuito aberto), usar simulação
+        if not cerebras_service or not cerebras_service.available:
+            logger.warning("⚠️  Cerebras unavailable, using simulation")
+            return {"answer": await fallback_question_answer(request.question, request.context)}
         
         answer = await cerebras_service.answer_question(
             request.context,
@@ -242,52 +208,91 @@ async def ask_question(request: QuestionRequest):
         logger.error(f"❌ Question error: {e}")
         # Fallback para simulação
         logger.info("🔄 Falling back to simulation")
-        return {"answer": simulate_question_answer(request.question, request.context)}
+        return {"answer": await fallback_question_answer(request.question, request.context)}
+
+
+@router.post("/ask-question/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """Ask question about document, streaming the answer token by token (SSE)"""
+    from app.services.cerebras_service import cerebras_service
+    
+    request.context = await resolve_text(request.context, request.document_id)
+    
+    async def simulated():
+        answer = await fallback_question_answer(request.question, request.context)
+        yield _sse({"event": "token", "delta": answer})
+        yield _sse({"event": "done", "answer": answer, "simulation": True})
+    
+    async def events():
+        if not cerebras_service or not cerebras_service.available:
+            logger.warning("⚠️  Cerebras unavailable, using simulation")
+            async for event in simulated():
+                yield event
+            return
+        
+        started = time.monotonic()
+        parts = []
+        try:
+            async for delta in cerebras_service.answer_question_stream(request.context, request.question):
+                if not parts:
+                    cerebras_service.record_ttft("ask_question", time.monotonic() - started)
+                parts.append(delta)
+                yield _sse({"event": "token", "delta": delta})
+        except Exception as e:
+            logger.error(f"❌ Question stream error: {e}")
+            if not parts:
+                # Nada foi enviado ainda: cair para a simulação
+                logger.info("🔄 Falling back to simulation")
+                async for event in simulated():
+                    yield event
+                return
+            yield _sse({"event": "error", "detail": str(e)})
+        
+        logger.info("✅ Question answered (stream)")
+        yield _sse({"event": "done", "answer": "".join(parts)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
+async def fallback_question_answer(question: str, context: str) -> str:
+    """simulate_question_answer with the document's cached sentence index"""
+    from app.services.sentence_index import get_sentence_index
+    
+    return simulate_question_answer(question, context, await get_sentence_index(context))
 
-def simulate_question_answer(question: str, context: str) -> str:
+
+def simulate_question_answer(question: str, context: str, sentence_index=None) -> str:
     """Advanced AI question answering simulation"""
     import re
-    from collections import Counter
+    from app.services.sentence_index import get_sentence_index_local
     
     question_lower = question.lower()
-    context_lower = context.lower()
+    # Frases, tokens, datas, números e tópicos do documento: calculados uma vez por conteúdo
+    document = sentence_index or get_sentence_index_local(context)
     
     # Extrair palavras-chave da pergunta
     question_words = re.findall(r'\b[a-zA-ZÀ-ÿ]{3,}\b', question_lower)
     question_keywords = [word for word in question_words if len(word) > 3]
     
-    # Encontrar frases relevantes no contexto
-    sentences = [s.strip() for s in re.split(r'[.!?]+', context) if s.strip()]
-    relevant_sentences = []
-    
-    for sentence in sentences:
-        sentence_lower = sentence.lower()
-        # Calcular relevância baseada em palavras-chave
-        relevance_score = sum(1 for keyword in question_keywords if keyword in sentence_lower)
-        
-        if relevance_score > 0:
-            relevant_sentences.append((sentence, relevance_score))
-    
-    # Ordenar por relevância
-    relevant_sentences.sort(key=lambda x: x[1], reverse=True)
+    # Frases relevantes pelo índice invertido (ordenadas por relevância)
+    relevant_sentences = document.rank(question_keywords)
     
     # Análise por tipo de pergunta
     if any(word in question_lower for word in ['o que', 'what', 'que é', 'define', 'definição', 'conceito']):
         if relevant_sentences:
             best_sentence = relevant_sentences[0][0]
-            return f"Com base no documento, posso responder que: {best_sentence[:200]}... Esta definição está contextualizada no documento que contém {len(context.split())} palavras sobre o tema."
+            return f"Com base no documento, posso responder que: {best_sentence[:200]}... Esta definição está contextualizada no documento que contém {document.word_count} palavras sobre o tema."
         else:
-            topics = extract_topics(context)
+            topics = document.topics
             return f"O documento não contém uma definição direta para '{question}', mas aborda temas relacionados como: {', '.join(topics[:5])}. Recomendo reformular a pergunta com termos mais específicos do documento."
     
     elif any(word in question_lower for word in ['como', 'how', 'de que forma', 'método', 'processo']):
         method_indicators = ['método', 'processo', 'procedimento', 'técnica', 'abordagem', 'forma', 'maneira', 'modo']
-        method_sentences = []
-        
-        for sentence in sentences:
-            if any(indicator in sentence.lower() for indicator in method_indicators):
-                method_sentences.append(sentence)
+        method_sentences = document.first_with_any(method_indicators)
         
         if method_sentences:
             return f"Sobre como realizar o que você perguntou, o documento indica: {method_sentences[0][:200]}... {f'Também menciona: {method_sentences[1][:150]}...' if len(method_sentences) > 1 else ''}"
@@ -297,18 +302,8 @@ def simulate_question_answer(question: str, context: str) -> str:
             return f"O documento não apresenta metodologias específicas para '{question}'. Considere buscar por termos como 'processo', 'método' ou 'procedimento' no texto."
     
     elif any(word in question_lower for word in ['quando', 'when', 'data', 'tempo', 'período', 'ano']):
-        # Buscar datas e referências temporais
-        date_patterns = [
-            r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b',  # DD/MM/YYYY
-            r'\b\d{4}\b',  # Anos
-            r'\b(janeiro|fevereiro|março|abril|maio|junho|julho|agosto|setembro|outubro|novembro|dezembro)\b',
-            r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\b'
-        ]
-        
-        temporal_info = []
-        for pattern in date_patterns:
-            matches = re.findall(pattern, context_lower)
-            temporal_info.extend(matches)
+        # Datas e referências temporais (pré-calculadas no índice)
+        temporal_info = document.dates
         
         if temporal_info:
             return f"Sobre aspectos temporais relacionados à sua pergunta, o documento menciona: {', '.join(set(temporal_info[:5]))}. {relevant_sentences[0][0][:150] if relevant_sentences else 'Consulte o documento para mais detalhes cronológicos.'}..."
@@ -320,11 +315,7 @@ def simulate_question_answer(question: str, context: str) -> str:
     elif any(word in question_lower for word in ['onde', 'where', 'local', 'lugar', 'localização', 'região']):
         # Buscar referências geográficas
         location_indicators = ['cidade', 'país', 'região', 'local', 'lugar', 'área', 'zona', 'território', 'estado', 'município']
-        location_sentences = []
-        
-        for sentence in sentences:
-            if any(indicator in sentence.lower() for indicator in location_indicators):
-                location_sentences.append(sentence)
+        location_sentences = document.first_with_any(location_indicators)
         
         if location_sentences:
             return f"Sobre localização, o documento indica: {location_sentences[0][:200]}... {f'Também menciona: {location_sentences[1][:150]}...' if len(location_sentences) > 1 else ''}"
@@ -335,11 +326,7 @@ def simulate_question_answer(question: str, context: str) -> str:
     
     elif any(word in question_lower for word in ['por que', 'why', 'motivo', 'razão', 'causa', 'porque']):
         reason_indicators = ['porque', 'devido', 'razão', 'motivo', 'causa', 'consequência', 'resultado', 'efeito']
-        reason_sentences = []
-        
-        for sentence in sentences:
-            if any(indicator in sentence.lower() for indicator in reason_indicators):
-                reason_sentences.append(sentence)
+        reason_sentences = document.first_with_any(reason_indicators)
         
         if reason_sentences:
             return f"Sobre as razões relacionadas à sua pergunta, o documento explica: {reason_sentences[0][:200]}... {f'Adicionalmente: {reason_sentences[1][:150]}...' if len(reason_sentences) > 1 else ''}"
@@ -349,17 +336,8 @@ def simulate_question_answer(question: str, context: str) -> str:
             return f"O documento não apresenta justificativas específicas para '{question}'. Procure por termos como 'porque', 'devido a' ou 'razão'."
     
     elif any(word in question_lower for word in ['quantos', 'quanto', 'how many', 'how much', 'número', 'quantidade']):
-        # Buscar números e quantidades
-        number_patterns = [
-            r'\b\d+[.,]?\d*\s*%\b',  # Percentuais
-            r'\b\d+[.,]?\d*\s*(mil|milhão|bilhão|thousand|million|billion)\b',  # Números grandes
-            r'\b\d+[.,]?\d*\b'  # Números gerais
-        ]
-        
-        numbers = []
-        for pattern in number_patterns:
-            matches = re.findall(pattern, context)
-            numbers.extend(matches)
+        # Números e quantidades (pré-calculados no índice)
+        numbers = document.numbers
         
         if numbers:
             return f"Sobre quantidades relacionadas à sua pergunta, o documento menciona: {', '.join(set(numbers[:5]))}. {relevant_sentences[0][0][:150] if relevant_sentences else 'Consulte o documento para mais detalhes numéricos.'}..."
@@ -381,10 +359,21 @@ def simulate_question_answer(question: str, context: str) -> str:
             return response
         else:
             # Sugerir tópicos relacionados
-            topics = extract_topics(context)
+            topics = document.topics
             return f"Não encontrei informações diretas sobre '{question}' no documento. No entanto, o texto aborda temas como: {', '.join(topics[:5])}. Tente reformular sua pergunta usando estes termos ou seja mais específico."
 
 
+@router.get("/metrics")
+async def get_ai_metrics():
+    """Cerebras client and circuit breaker metrics"""
+    from app.services.cerebras_service import cerebras_service
+    
+    if not cerebras_service:
+        return {"configured": False}
+    
+    return {"configured": True, **cerebras_service.metrics()}
+
+
 # ============================================================
 # Voice Endpoints (Placeholder)
 # ============================================================
@@ -456,87 +445,14 @@ async def create_token(room_name: str, user_name: str):
 
 from fastapi import UploadFile, File
 from typing import Optional
-import tempfile
 import os
 
-@router.post("/upload-pdf")
-async def upload_pdf(file: UploadFile = File(...)):
-    """Upload and process PDF file with real text extraction"""
-    try:
-        # Verificar se é PDF
-        if not file.content_type == "application/pdf":
-            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-        
-        # Verificar tamanho (50MB)
-        max_size = 50 * 1024 * 1024  # 50MB
-        content = await file.read()
-        
-        if len(content) > max_size:
-            raise HTTPException(status_code=400, detail="File too large. Maximum size: 50MB")
-        
-        # Salvar temporariamente
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            temp_file.write(content)
-            temp_path = temp_file.name
-        
-        try:
-            # Tentar extrair texto real do PDF
-            extracted_text = ""
-            num_pages = 0
-            
-            try:
-                # Tentar com PyPDF2 primeiro
-                import PyPDF2
-                
-                with open(temp_path, 'rb') as pdf_file:
-                    pdf_reader = PyPDF2.PdfReader(pdf_file)
-                    num_pages = len(pdf_reader.pages)
-                    
-                    for page_num, page in enumerate(pdf_reader.pages):
-                        try:
-                            page_text = page.extract_text()
-                            if page_text:
-                                extracted_text += f"\n\n--- Página {page_num + 1} ---\n\n{page_text}"
-                        except Exception as page_error:
-                            logger.warning(f"⚠️  Error extracting page {page_num + 1}: {page_error}")
-                            continue
-                
-                logger.info(f"✅ PDF extracted with PyPDF2: {num_pages} pages")
-                
-            except ImportError:
-                logger.warning("⚠️  PyPDF2 not installed, trying pdfplumber")
-                
-                try:
-                    # Tentar com pdfplumber
-                    import pdfplumber
-                    
-                    with pdfplumber.open(temp_path) as pdf:
-                        num_pages = len(pdf.pages)
-                        
-                        for page_num, page in enumerate(pdf.pages):
-                            try:
-                                page_text = page.extract_text()
-                                if page_text:
-                                    extracted_text += f"\n\n--- Página {page_num + 1} ---\n\n{page_text}"
-                            except Exception as page_error:
-                                logger.warning(f"⚠️  Error extracting page {page_num + 1}: {page_error}")
-                                continue
-                    
-                    logger.info(f"✅ PDF extracted with pdfplumber: {num_pages} pages")
-                    
-                except ImportError:
-                    logger.error("❌ Neither PyPDF2 nor pdfplumber is installed")
-                    raise HTTPException(
-                        status_code=500, 
-                        detail="PDF processing libraries not installed. Please install PyPDF2 or pdfplumber."
-                    )
-            
-            # Se não conseguiu extrair texto, usar simulação
-            if not extracted_text.strip():
-                logger.warning("⚠️  No text extracted, using simulation")
-                extracted_text = f"""
-Documento PDF processado: {file.filename}
-Tamanho: {len(content) / 1024 / 1024:.2f} MB
+
+def no_text_placeholder(filename: str, size: int, num_pages: int) -> str:
+    """Text stored for PDFs without selectable text (scans, protected files)"""
+    return f"""
+Documento PDF processado: {filename}
+Tamanho: {size / 1024 / 1024:.2f} MB
 
 ⚠️ AVISO: Não foi possível extrair texto deste PDF.
 Possíveis razões:
@@ -556,27 +472,91 @@ Se o PDF contém apenas imagens, considere usar ferramentas de OCR como:
 
 Total de páginas: {num_pages if num_pages > 0 else 'desconhecido'}
                 """
+
+
+@router.post("/upload-pdf")
+async def upload_pdf(file: UploadFile = File(...)):
+    """Upload and process PDF file with real text extraction"""
+    from app.services.document_store import get_document, load_text, save_document
+    from app.services.pdf_extractor import (
+        PDFLibraryMissing, UploadTooLarge, extract_pdf_text, remove_file, save_upload
+    )
+    
+    try:
+        # Verificar se é PDF
+        if not file.content_type == "application/pdf":
+            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+        
+        # Gravar em disco em blocos, parando assim que passar de 50MB
+        max_size = 50 * 1024 * 1024  # 50MB
+        try:
+            upload = await save_upload(file, max_size, suffix=".pdf")
+        except UploadTooLarge:
+            raise HTTPException(status_code=400, detail="File too large. Maximum size: 50MB")
+        temp_path, size = upload.path, upload.size
+        
+        try:
+            # Mesmo arquivo já processado (mesmo SHA-256): devolver o texto armazenado sem reprocessar
+            document = await get_document(upload.sha256)
+            stored_text = await load_text(upload.sha256) if document else None
+            if stored_text is not None:
+                logger.info(f"✅ PDF already stored: {file.filename} ({upload.sha256[:12]})")
+                return {
+                    "document_id": document["id"],
+                    "filename": file.filename,
+                    "size": size,
+                    "text": stored_text,
+                    "pages": document["pages"],
+                    "words": document["words"],
+                    "cached": True,
+                    "message": f"PDF already processed ({document['pages']} pages, {document['words']} words)"
+                }
+            
+            # Extrair texto real do PDF (páginas em paralelo, fora do event loop)
+            try:
+                extracted = await extract_pdf_text(temp_path)
+            except PDFLibraryMissing as e:
+                logger.error("❌ Neither PyPDF2 nor pdfplumber is installed")
+                raise HTTPException(status_code=500, detail=str(e))
+            extracted_text, num_pages, page_offsets = extracted.text, extracted.num_pages, extracted.page_offsets
+            
+            # Se não conseguiu extrair texto, usar simulação
+            if not extracted_text.strip():
+                logger.warning("⚠️  No text extracted, using simulation")
+                extracted_text = no_text_placeholder(file.filename, size, num_pages)
                 num_pages = max(1, num_pages)
+                page_offsets = []
             
             # Limpar texto extraído
             extracted_text = extracted_text.strip()
             word_count = len(extracted_text.split())
             
-            logger.info(f"✅ PDF processed: {file.filename} ({len(content)} bytes, {num_pages} pages, {word_count} words)")
+            logger.info(f"✅ PDF processed: {file.filename} ({size} bytes, {num_pages} pages, {word_count} words)")
+            
+            # Guardar PDF + texto: próximos uploads e endpoints de IA usam o document_id
+            try:
+                document = await save_document(
+                    temp_path, upload.sha256, file.filename, file.content_type, size,
+                    extracted_text, num_pages, page_offsets
+                )
+            except Exception as e:
+                logger.error(f"❌ Document store error: {e}")
+                document = {"id": None}
             
             return {
+                "document_id": document["id"],
                 "filename": file.filename,
-                "size": len(content),
+                "size": size,
                 "text": extracted_text,
                 "pages": num_pages,
                 "words": word_count,
+                "cached": False,
                 "message": f"PDF processed successfully ({num_pages} pages, {word_count} words extracted)"
             }
             
         finally:
             # Limpar arquivo temporário
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+            await remove_file(temp_path)
                 
     except HTTPException:
         raise
@@ -585,6 +565,163 @@ Total de páginas: {num_pages if num_pages > 0 else 'desconhecido'}
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
 
+@router.get("/documents/{document_id}")
+async def get_stored_document(document_id: str):
+    """Metadata of a stored document (pages, words, page offsets)"""
+    from app.services.document_store import get_document
+    
+    document = await get_document(document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+
+# ============================================================
+# Background Jobs (upload -> extração -> Gist Memory)
+# ============================================================
+
+from app.config import settings
+from app.services.jobs import JobError, jobs
+
+
+@jobs.stage("extract", concurrency=settings.JOB_EXTRACT_CONCURRENCY)
+async def extract_document_job(job):
+    """Extract and store an uploaded PDF (skipped when the same file is already stored)"""
+    from app.services.document_store import get_document, save_document
+    from app.services.pdf_extractor import PDFLibraryMissing, extract_pdf_text, remove_file
+    
+    payload = job.payload
+    try:
+        document = await get_document(payload["sha256"])
+        if document is None:
+            await job.progress(0.1, "Extracting text")
+            try:
+                extracted = await extract_pdf_text(payload["path"])
+            except PDFLibraryMissing as e:
+                raise JobError(str(e))
+            text, num_pages, page_offsets = extracted.text, extracted.num_pages, extracted.page_offsets
+            if not text:
+                text = no_text_placeholder(payload["filename"], payload["size"], num_pages).strip()
+                num_pages, page_offsets = max(1, num_pages), []
+            
+            await job.progress(0.9, f"Storing document ({num_pages} pages)")
+            document = await save_document(
+                payload["path"], payload["sha256"], payload["filename"], payload["content_type"],
+                payload["size"], text, num_pages, page_offsets
+            )
+    except asyncio.CancelledError:
+        # Desligamento com fila durável: o job volta para a fila e a extração repetida precisa do arquivo
+        if not jobs.backend.durable:
+            await remove_file(payload["path"])
+        raise
+    except Exception:
+        # Falha definitiva (o job não é repetido): o arquivo de entrada não serve mais
+        await remove_file(payload["path"])
+        raise
+    # Documento armazenado: save_document move o arquivo; se o documento já existia, a cópia recebida sobra
+    await remove_file(payload["path"])
+    
+    await job.update_payload(document_id=document["id"])
+    return document
+
+
+@jobs.stage("gist", concurrency=settings.JOB_GIST_CONCURRENCY)
+async def gist_document_job(job):
+    """Gist Memory of a stored document (or of the text sent with the job), with per-page progress"""
+    from app.services.cerebras_service import cerebras_service
+    
+    document_id = job.payload.get("document_id")
+    try:
+        content = await resolve_text(job.payload.get("content"), document_id)
+    except HTTPException as e:
+        raise JobError(e.detail)
+    title = job.payload.get("title", "")
+    
+    if cerebras_service and cerebras_service.available:
+        try:
+            gists, failed_pages, total_pages, cache_stats = [], [], 0, None
+            async for event in cerebras_service.gist_memory_stream(content):
+                if event["event"] == "start":
+                    total_pages, cache_stats = event["total_pages"], event["cache"]
+                    gists = [None] * total_pages
+                elif event["event"] == "gist":
+                    gists[event["page"] - 1] = event["gist"]
+                    if event.get("error"):
+                        failed_pages.append(event["page"])
+                    done = sum(gist is not None for gist in gists)
+                    await job.progress(done / total_pages, f"{done}/{total_pages} pages summarized")
+            if not total_pages or len(failed_pages) < total_pages:
+                return {
+                    "document_id": document_id,
+                    "total_pages": total_pages,
+                    "gists": gists,
+                    "failed_pages": sorted(failed_pages),
+                    "cache": cache_stats
+                }
+            logger.warning("⚠️  All pages failed, using simulation")
+        except Exception as e:
+            logger.error(f"❌ Gist Memory job error: {e}")
+    
+    result = await cached_simulate_gist_memory(content, title, document_id)
+    return {"document_id": document_id, **result}
+
+
+@router.post("/jobs/upload-pdf", status_code=202)
+async def submit_pdf_job(file: UploadFile = File(...), title: str = ""):
+    """Upload a PDF and process it in the background (extraction + Gist Memory); poll /jobs/{id}"""
+    from app.services.pdf_extractor import UploadTooLarge, save_upload
+    
+    if not file.content_type == "application/pdf":
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    
+    # Diretório de entrada dentro do store: visível para workers de outros nós
+    max_size = 50 * 1024 * 1024  # 50MB
+    try:
+        upload = await save_upload(
+            file, max_size, suffix=".pdf", directory=os.path.join(settings.DOCUMENT_STORE_DIR, "incoming")
+        )
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail="File too large. Maximum size: 50MB")
+    
+    job = await jobs.submit("pdf-gist", ["extract", "gist"], {
+        "path": upload.path,
+        "sha256": upload.sha256,
+        "filename": file.filename,
+        "content_type": file.content_type,
+        "size": upload.size,
+        "title": title or file.filename,
+    })
+    return {"job_id": job["id"], "document_id": upload.sha256, "status": job["status"]}
+
+
+@router.post("/jobs/gist-memory", status_code=202)
+async def submit_gist_job(request: DocumentRequest):
+    """Run Gist Memory in the background; poll /jobs/{id}"""
+    if request.document_id:
+        await resolve_text(None, request.document_id)  # 404 agora, não no worker
+        payload = {"document_id": request.document_id, "title": request.title}
+    else:
+        payload = {"content": await resolve_text(request.content, None), "title": request.title}
+    
+    job = await jobs.submit("gist", ["gist"], payload)
+    return {"job_id": job["id"], "status": job["status"]}
+
+
+@router.get("/jobs")
+async def get_jobs_metrics():
+    """Job backend, workers per stage and jobs running now"""
+    return jobs.metrics()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, progress and (when completed) result of a background job"""
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @router.get("/supported-formats")
 async def get_supported_formats():
     """Get supported file formats"""
@@ -606,8 +743,6 @@ async def get_supported_formats():
 # RSS Feed Endpoints
 # ============================================================
 
-import feedparser
-import httpx
 from datetime import datetime
 from typing import List, Dict, Any
 
@@ -619,67 +754,50 @@ class RSSSearchRequest(BaseModel):
     query: str
     sources: Optional[List[str]] = None
     max_items: Optional[int] = 20
+    offset: int = 0
 
 @router.post("/rss/fetch")
 async def fetch_rss_feed(request: RSSFeedRequest):
     """Fetch RSS feed from URL"""
+    from app.services.feed_store import feed_items
+    from app.services.rss_ingester import IngestError, rss_ingester
+    
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(request.url)
-            response.raise_for_status()
-            
-            # Parse RSS feed
-            feed = feedparser.parse(response.content)
-            
-            if feed.bozo:
-                logger.warning(f"⚠️  RSS feed may have issues: {request.url}")
-            
-            items = []
-            for entry in feed.entries[:request.max_items]:
-                # Extract image from entry
-                image_url = None
-                if hasattr(entry, 'media_content') and entry.media_content:
-                    image_url = entry.media_content[0].get('url')
-                elif hasattr(entry, 'enclosures') and entry.enclosures:
-                    for enclosure in entry.enclosures:
-                        if enclosure.type.startswith('image/'):
-                            image_url = enclosure.href
-                            break
-                
-                # Parse published date
-                published = None
-                if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                    published = datetime(*entry.published_parsed[:6]).isoformat()
-                elif hasattr(entry, 'updated_parsed') and entry.updated_parsed:
-                    published = datetime(*entry.updated_parsed[:6]).isoformat()
-                
-                items.append({
-                    "id": getattr(entry, 'id', entry.link),
-                    "title": getattr(entry, 'title', 'Sem título'),
-                    "description": getattr(entry, 'summary', ''),
-                    "content": getattr(entry, 'content', [{}])[0].get('value', '') if hasattr(entry, 'content') else '',
-                    "link": getattr(entry, 'link', ''),
-                    "published": published,
-                    "author": getattr(entry, 'author', ''),
-                    "image": image_url,
-                    "tags": [tag.term for tag in getattr(entry, 'tags', [])]
-                })
-            
-            logger.info(f"✅ RSS feed fetched: {len(items)} items from {request.url}")
-            
-            return {
-                "feed_info": {
-                    "title": getattr(feed.feed, 'title', 'Feed RSS'),
-                    "description": getattr(feed.feed, 'description', ''),
-                    "link": getattr(feed.feed, 'link', ''),
-                    "language": getattr(feed.feed, 'language', 'pt-br'),
-                    "updated": getattr(feed.feed, 'updated', '')
-                },
-                "items": items,
-                "total_items": len(items),
-                "source_url": request.url
-            }
+        # Servido do feed_store; URL nova vira assinatura avulsa (expira sem uso) e é coletada agora
+        feed = await rss_ingester.ingest_url(request.url, ephemeral=True)
+        entries, _ = await feed_items(feed["id"], limit=request.max_items)
+        
+        items = []
+        for entry in entries:
+            items.append({
+                "id": entry["id"],
+                "title": entry["title"] or 'Sem título',
+                "description": entry["description"],
+                "content": entry["content"],
+                "link": entry["link"],
+                "published": entry["published"],
+                "author": entry["author"],
+                "image": entry["image"],
+                "tags": entry["tags"]
+            })
+        
+        logger.info(f"✅ RSS feed fetched: {len(items)} items from {request.url}")
+        
+        return {
+            "feed_info": {
+                "title": feed["title"] or 'Feed RSS',
+                "description": feed["description"],
+                "link": feed["link"],
+                "language": feed["language"] or 'pt-br',
+                "updated": feed["updated"]
+            },
+            "items": items,
+            "total_items": len(items),
+            "source_url": request.url
+        }
             
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=f"Could not fetch feed: {e}")
     except Exception as e:
         logger.error(f"❌ RSS fetch error: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching RSS feed: {str(e)}")
@@ -687,119 +805,93 @@ async def fetch_rss_feed(request: RSSFeedRequest):
 @router.get("/rss/popular-feeds")
 async def get_popular_feeds():
     """Get list of popular RSS feeds"""
-    popular_feeds = [
-        {
-            "name": "G1 - Tecnologia",
-            "url": "https://g1.globo.com/rss/g1/tecnologia/",
-            "category": "Tecnologia",
-            "description": "Últimas notícias de tecnologia do G1",
-            "language": "pt-br"
-        },
-        {
-            "name": "TechCrunch",
-            "url": "https://techcrunch.com/feed/",
-            "category": "Tecnologia",
-            "description": "Latest technology news from TechCrunch",
-            "language": "en"
-        },
-        {
-            "name": "Folha - Tec",
-            "url": "https://feeds.folha.uol.com.br/tec/rss091.xml",
-            "category": "Tecnologia",
-            "description": "Notícias de tecnologia da Folha de S.Paulo",
-            "language": "pt-br"
-        },
-        {
-            "name": "Hacker News",
-            "url": "https://hnrss.org/frontpage",
-            "category": "Tecnologia",
-            "description": "Top stories from Hacker News",
-            "language": "en"
-        },
-        {
-            "name": "BBC News - Technology",
-            "url": "http://feeds.bbci.co.uk/news/technology/rss.xml",
-            "category": "Tecnologia",
-            "description": "BBC Technology News",
-            "language": "en"
-        },
-        {
-            "name": "Exame - Tecnologia",
-            "url": "https://exame.com/rss/",
-            "category": "Negócios",
-            "description": "Notícias de negócios e tecnologia da Exame",
-            "language": "pt-br"
-        }
-    ]
+    from app.services.feed_store import POPULAR_FEEDS
     
     return {
-        "feeds": popular_feeds,
-        "total": len(popular_feeds),
-        "categories": list(set(feed["category"] for feed in popular_feeds))
+        "feeds": POPULAR_FEEDS,
+        "total": len(POPULAR_FEEDS),
+        "categories": list(set(feed["category"] for feed in POPULAR_FEEDS))
     }
 
 @router.post("/rss/search")
 async def search_rss_content(request: RSSSearchRequest):
-    """Search content across multiple RSS feeds"""
+    """
+    Search the ingested RSS items (all feeds, or only `sources`). Supports
+    "quoted phrases" and prefix* terms; page with `offset`.
+    """
+    from app.services.feed_store import count_ephemeral_feeds, feed_ids_by_url, items_by_ids, touch_feeds
+    from app.services.rss_ingester import rss_ingester
+    from app.services.rss_search import item_index, parse_query
+    
     try:
-        # Get popular feeds if no sources specified
-        if not request.sources:
-            popular_response = await get_popular_feeds()
-            feed_urls = [feed["url"] for feed in popular_response["feeds"][:5]]  # Limit to 5 feeds
-        else:
-            feed_urls = request.sources
-        
-        all_items = []
-        
-        # Fetch from multiple feeds
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            for feed_url in feed_urls:
-                try:
-                    response = await client.get(feed_url)
-                    response.raise_for_status()
-                    
-                    feed = feedparser.parse(response.content)
-                    
-                    for entry in feed.entries[:10]:  # Limit per feed
-                        # Check if query matches title or description
-                        title = getattr(entry, 'title', '').lower()
-                        summary = getattr(entry, 'summary', '').lower()
-                        query_lower = request.query.lower()
-                        
-                        if query_lower in title or query_lower in summary:
-                            # Parse published date
-                            published = None
-                            if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                                published = datetime(*entry.published_parsed[:6]).isoformat()
-                            
-                            all_items.append({
-                                "id": getattr(entry, 'id', entry.link),
-                                "title": getattr(entry, 'title', 'Sem título'),
-                                "description": getattr(entry, 'summary', ''),
-                                "link": getattr(entry, 'link', ''),
-                                "published": published,
-                                "source": getattr(feed.feed, 'title', 'RSS Feed'),
-                                "source_url": feed_url,
-                                "relevance_score": title.count(query_lower) + summary.count(query_lower)
-                            })
-                            
-                except Exception as e:
-                    logger.warning(f"⚠️  Failed to fetch feed {feed_url}: {e}")
-                    continue
-        
-        # Sort by relevance and published date
-        all_items.sort(key=lambda x: (x["relevance_score"], x["published"] or ""), reverse=True)
-        
-        # Limit results
-        results = all_items[:request.max_items]
-        
-        logger.info(f"✅ RSS search completed: {len(results)} results for '{request.query}'")
+        feed_filter = None
+        failed_feeds: List[str] = []
+        timed_out_feeds: List[str] = []
+        max_age = settings.RSS_SEARCH_SYNC_INTERVAL
+        
+        if request.sources:
+            sources = list(dict.fromkeys(request.sources))
+            known = await feed_ids_by_url(sources)
+            # Busca conta como uso: feeds avulsos já assinados não expiram
+            await touch_feeds(list(known.values()))
+            # Fonte ainda não assinada: validada e assinada como avulsa (limite e expiração
+            # de /rss/fetch), coletada dentro do prazo da busca. Além da vaga livre, falha já.
+            new_sources = [url for url in sources if url not in known]
+            if new_sources:
+                capacity = max(rss_ingester.max_ephemeral - await count_ephemeral_feeds(), 0)
+                failed_feeds.extend(new_sources[capacity:])
+                new_sources = new_sources[:capacity]
+            tasks = {url: asyncio.create_task(rss_ingester.ingest_url(url, ephemeral=True)) for url in new_sources}
+            if tasks:
+                done, pending = await asyncio.wait(tasks.values(), timeout=settings.RSS_SEARCH_DEADLINE)
+                for task in pending:
+                    task.cancel()
+                for url, task in tasks.items():
+                    if task in pending:
+                        timed_out_feeds.append(url)
+                    elif task.exception() is not None:
+                        failed_feeds.append(url)
+                    else:
+                        known[url] = task.result()["id"]
+                max_age = 0
+            feed_filter = list(known.values())
+        
+        await item_index.refresh(max_age)
+        offset = max(request.offset, 0)
+        limit = request.max_items or 20
+        found = await asyncio.to_thread(item_index.search, parse_query(request.query), offset, limit, feed_filter)
+        items = await items_by_ids([item_id for item_id, _ in found.hits])
+        
+        results = []
+        for item_id, score in found.hits:
+            item = items.get(item_id)
+            if item is None:  # feed removido depois da busca
+                continue
+            results.append({
+                "id": item["id"],
+                "title": item["title"] or 'Sem título',
+                "description": item["description"],
+                "link": item["link"],
+                "published": item["published"],
+                "source": item["source"] or 'RSS Feed',
+                "source_url": item["source_url"],
+                "relevance_score": round(score, 4)
+            })
+        
+        next_offset = offset + limit
+        logger.info(f"✅ RSS search completed: {found.total} matches for '{request.query}'")
         
         return {
             "query": request.query,
             "results": results,
             "total_results": len(results),
-            "searched_feeds": len(feed_urls)
+            "total_matches": found.total,
+            "exact_total": found.exact,
+            "next_offset": next_offset if next_offset < found.total else None,
+            "searched_feeds": len(feed_filter) if feed_filter is not None else len(item_index.known_feeds or ()),
+            "partial": bool(failed_feeds or timed_out_feeds),
+            "failed_feeds": failed_feeds,
+            "timed_out_feeds": timed_out_feeds
         }
         
     except Exception as e:
@@ -835,8 +927,9 @@ import os
 import uuid
 import mimetypes
 from pathlib import Path
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import Request
 from fastapi.staticfiles import StaticFiles
+from app.services.ranged_files import file_response
 
 # Create uploads directory
 UPLOAD_DIR = Path("uploads")
@@ -983,38 +1076,40 @@ async def list_shared_files(category: Optional[str] = None, search: Optional[str
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/p2p/download/{file_id}")
-async def download_file(file_id: str):
-    """Download shared file"""
+async def download_file(file_id: str, request: Request):
+    """Download shared file (resumable: Range / If-Range)"""
     try:
         if file_id not in shared_files_db:
             raise HTTPException(status_code=404, detail="File not found")
         
         file_info = shared_files_db[file_id]
-        file_path = Path(file_info["file_path"])
         
-        if not file_path.exists():
+        try:
+            response = await file_response(
+                request, file_info["file_path"], file_info["type"], filename=file_info["original_name"]
+            )
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="File not found on disk")
         
-        # Update download count
-        if file_id not in download_stats:
-            download_stats[file_id] = {"downloads": 0, "peers": 1}
-        download_stats[file_id]["downloads"] += 1
-        
-        logger.info(f"✅ File downloaded: {file_info['name']}")
+        # Conta o download só no pedido que começa do byte 0 (retomadas e 304 não contam)
+        ranges = getattr(response, "ranges", ())
+        if response.status_code == 200 or (ranges and ranges[0][0] == 0):
+            if file_id not in download_stats:
+                download_stats[file_id] = {"downloads": 0, "peers": 1}
+            download_stats[file_id]["downloads"] += 1
+            logger.info(f"✅ File downloaded: {file_info['name']}")
         
-        return FileResponse(
-            path=file_path,
-            filename=file_info["original_name"],
-            media_type=file_info["type"]
-        )
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Download error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/p2p/stream/{file_id}")
-async def stream_media(file_id: str):
-    """Stream audio/video file for web player"""
+async def stream_media(file_id: str, request: Request):
+    """Stream audio/video file for web player (seekable: Range requests get 206)"""
     try:
         if file_id not in shared_files_db:
             raise HTTPException(status_code=404, detail="File not found")
@@ -1025,25 +1120,16 @@ async def stream_media(file_id: str):
         if not (file_info["is_audio"] or file_info["type"].startswith('video/')):
             raise HTTPException(status_code=400, detail="File is not audio or video")
         
-        file_path = Path(file_info["file_path"])
-        
-        if not file_path.exists():
+        try:
+            # no-cache: o player revalida pelo ETag (304) em vez de baixar de novo
+            return await file_response(
+                request, file_info["file_path"], file_info["type"], headers={"Cache-Control": "no-cache"}
+            )
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="File not found on disk")
         
-        def iterfile(file_path: Path):
-            with open(file_path, mode="rb") as file_like:
-                yield from file_like
-        
-        return StreamingResponse(
-            iterfile(file_path),
-            media_type=file_info["type"],
-            headers={
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(file_info["size"]),
-                "Cache-Control": "no-cache"
-            }
-        )
-        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Stream error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,85 +1,751 @@
-import redis
+import redis.asyncio as redis
+import asyncio
 import json
+import functools
+import inspect
 import os
-from typing import Any, Optional
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Canal usado para invalidar o L1 de todos os workers/réplicas
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Libera o lock apenas se ele ainda pertence a quem o adquiriu
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+# ============================================================
+# Codecs (serialização + compressão)
+# ============================================================
+
+# Valores gravados pelo Codec começam com MAGIC + id do serializer + id da compressão.
+# Valores sem MAGIC são entradas antigas em JSON puro e continuam sendo lidos.
+MAGIC = 0xFE
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=str).encode("utf-8")
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=str, use_bin_type=True)
+
+
+def _msgpack_loads(raw: bytes) -> Any:
+    return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+# id -> (nome, encode, decode)
+SERIALIZERS: Dict[int, Tuple[str, Callable, Callable]] = {
+    ord("j"): ("json", _json_dumps, json.loads),
+}
+if orjson is not None:
+    SERIALIZERS[ord("o")] = ("orjson", _orjson_dumps, orjson.loads)
+if msgpack is not None:
+    SERIALIZERS[ord("m")] = ("msgpack", _msgpack_dumps, _msgpack_loads)
+
+COMPRESSORS: Dict[int, Tuple[str, Callable, Callable]] = {
+    ord("n"): ("none", lambda raw: raw, lambda raw: raw),
+    ord("z"): ("zlib", lambda raw: zlib.compress(raw, 1), zlib.decompress),
+}
+if zstandard is not None:
+    _zstd_compressor = zstandard.ZstdCompressor(level=3)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+    COMPRESSORS[ord("s")] = (
+        "zstd",
+        _zstd_compressor.compress,
+        lambda raw: _zstd_decompressor.decompress(raw, max_output_size=256 * 1024 * 1024),
+    )
+if lz4 is not None:
+    COMPRESSORS[ord("l")] = ("lz4", lz4.frame.compress, lz4.frame.decompress)
+
+
+def _pick(table: Dict[int, Tuple[str, Callable, Callable]], name: str, preference: List[str]) -> int:
+    by_name = {entry[0]: code for code, entry in table.items()}
+    if name != "auto":
+        if name not in by_name:
+            raise ValueError(f"Cache codec '{name}' is not available (installed: {sorted(by_name)})")
+        return by_name[name]
+    return next(by_name[n] for n in preference if n in by_name)
+
+
+class Codec:
+    """Tagged serializer with optional compression above a size threshold"""
+
+    def __init__(self, serializer: str = "auto", compression: str = "auto", compress_min_bytes: int = 1024):
+        self.serializer_id = _pick(SERIALIZERS, serializer, ["orjson", "msgpack", "json"])
+        self.compression_id = _pick(COMPRESSORS, compression, ["zstd", "lz4", "zlib"])
+        self.compress_min_bytes = compress_min_bytes
+        self._dumps = SERIALIZERS[self.serializer_id][1]
+        self._compress = COMPRESSORS[self.compression_id][1]
+
+    @classmethod
+    def from_env(cls) -> "Codec":
+        return cls(
+            serializer=os.getenv("CACHE_CODEC", "auto"),
+            compression=os.getenv("CACHE_COMPRESSION", "auto"),
+            compress_min_bytes=int(os.getenv("CACHE_COMPRESS_MIN_BYTES", 1024)),
+        )
+
+    @property
+    def name(self) -> str:
+        return f"{SERIALIZERS[self.serializer_id][0]}+{COMPRESSORS[self.compression_id][0]}"
+
+    def encode(self, value: Any) -> bytes:
+        payload = self._dumps(value)
+        compression_id = ord("n")
+        if len(payload) >= self.compress_min_bytes and self.compression_id != ord("n"):
+            compressed = self._compress(payload)
+            if len(compressed) < len(payload):
+                payload, compression_id = compressed, self.compression_id
+        return bytes((MAGIC, self.serializer_id, compression_id)) + payload
+
+    @staticmethod
+    def decode(raw: Union[bytes, str]) -> Any:
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+        if not raw or raw[0] != MAGIC:
+            # Entrada antiga (JSON sem cabeçalho)
+            return json.loads(raw)
+
+        serializer = SERIALIZERS.get(raw[1])
+        compressor = COMPRESSORS.get(raw[2])
+        if serializer is None or compressor is None:
+            raise ValueError(f"Unknown cache encoding {raw[1:3]!r}")
+        return serializer[2](compressor[2](raw[3:]))
+
+
+class LocalCache:
+    """LRU em memória com TTL (tier L1, por processo)"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024, ttl: int = 30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_bytes = 0
+        # key -> (expires_at, encoded_value)
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        expires_at, raw = entry
+        if expires_at < time.monotonic():
+            self.delete(key)
+            return None
+
+        self._data.move_to_end(key)
+        return raw
+
+    def set(self, key: str, raw: bytes, ttl: Optional[int] = None):
+        size = len(raw)
+        if size > self.max_bytes:
+            return
+
+        self.delete(key)
+        # L1 nunca guarda por mais tempo que o L2
+        ttl = min(ttl or self.ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, raw)
+        self.size_bytes += size
+
+        while self._data and (len(self._data) > self.max_entries or self.size_bytes > self.max_bytes):
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.size_bytes -= len(evicted)
+
+    def delete(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(entry[1])
+
+    def delete_prefix(self, prefix: str):
+        for key in [k for k in self._data if k.startswith(prefix)]:
+            self.delete(key)
+
+    def clear(self):
+        self._data.clear()
+        self.size_bytes = 0
+
 
 class CacheLayer:
     """Cache com KeyDB (Redis-compatible)"""
-    
+
     def __init__(self):
         self.enabled = os.getenv("CACHE_ENABLED", "true").lower() == "true"
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
         self.ttl = int(os.getenv("CACHE_TTL", 3600))
-        
-        if self.enabled:
-            self.client = redis.from_url(self.redis_url, decode_responses=True)
-        else:
+        # Todas as chaves da aplicação ficam sob este prefixo (clear() não usa FLUSHDB)
+        self.prefix = os.getenv("CACHE_KEY_PREFIX", "orkut")
+        self.codec = Codec.from_env()
+
+        # Pool asyncio (parser hiredis é usado automaticamente se instalado)
+        self.max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+        self.socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", 2.0))
+        self.connect_timeout = float(os.getenv("REDIS_CONNECT_TIMEOUT", 2.0))
+
+        self.pool: Optional[redis.ConnectionPool] = None
+        self.client: Optional[redis.Redis] = None
+
+        # Tier L1 opcional em memória na frente do KeyDB
+        self.l1: Optional[LocalCache] = None
+        if os.getenv("CACHE_L1_ENABLED", "false").lower() == "true":
+            self.l1 = LocalCache(
+                max_entries=int(os.getenv("CACHE_L1_MAX_ENTRIES", 1024)),
+                max_bytes=int(os.getenv("CACHE_L1_MAX_BYTES", 16 * 1024 * 1024)),
+                ttl=int(os.getenv("CACHE_L1_TTL", 30)),
+            )
+        self.instance_id = uuid.uuid4().hex
+        self._invalidation_task: Optional[asyncio.Task] = None
+
+        self.stats: Dict[str, Dict[str, int]] = {
+            "l1": {"hits": 0, "misses": 0},
+            "l2": {"hits": 0, "misses": 0},
+        }
+
+    async def connect(self):
+        """Open connection pool (called from app lifespan)"""
+        if not self.enabled or self.client is not None:
+            return
+
+        self.pool = redis.ConnectionPool.from_url(
+            self.redis_url,
+            decode_responses=False,
+            max_connections=self.max_connections,
+            socket_timeout=self.socket_timeout,
+            socket_connect_timeout=self.connect_timeout,
+            health_check_interval=30,
+        )
+        self.client = redis.Redis(connection_pool=self.pool)
+
+        if self.l1 is not None:
+            self._invalidation_task = asyncio.create_task(self._listen_invalidations())
+
+    async def close(self):
+        """Drain connection pool (called from app lifespan)"""
+        if self._invalidation_task is not None:
+            self._invalidation_task.cancel()
+            try:
+                await self._invalidation_task
+            except asyncio.CancelledError:
+                pass
+            self._invalidation_task = None
+
+        if self.client is None:
+            return
+
+        try:
+            await self.client.aclose()
+            if self.pool is not None:
+                await self.pool.disconnect()
+        except Exception as e:
+            print(f"Cache close error: {e}")
+        finally:
             self.client = None
-    
+            self.pool = None
+
+    @property
+    def available(self) -> bool:
+        return self.enabled and self.client is not None
+
+    def _k(self, key: str) -> str:
+        """Physical KeyDB key for a logical cache key"""
+        return f"{self.prefix}:{key}"
+
+    def namespace(self, name: str) -> "CacheNamespace":
+        """Versioned key namespace that can be invalidated in O(1)"""
+        return CacheNamespace(self, name)
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters per tier"""
+        stats = {tier: dict(counters) for tier, counters in self.stats.items()}
+        if self.l1 is not None:
+            stats["l1"]["entries"] = len(self.l1)
+            stats["l1"]["bytes"] = self.l1.size_bytes
+        stats["codec"] = self.codec.name
+        return stats
+
     async def get(self, key: str) -> Optional[Any]:
         """Get from cache"""
-        if not self.enabled:
+        if not self.available:
             return None
-        
+
+        if self.l1 is not None:
+            raw = self.l1.get(key)
+            if raw is not None:
+                self.stats["l1"]["hits"] += 1
+                return self.codec.decode(raw)
+            self.stats["l1"]["misses"] += 1
+
         try:
-            value = self.client.get(key)
+            value = await self.client.get(self._k(key))
             if value:
-                return json.loads(value)
+                self.stats["l2"]["hits"] += 1
+                if self.l1 is not None:
+                    self.l1.set(key, value)
+                return self.codec.decode(value)
+            self.stats["l2"]["misses"] += 1
         except Exception as e:
             print(f"Cache get error: {e}")
         return None
-    
+
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """Set cache with TTL"""
-        if not self.enabled:
+        if not self.available:
             return False
-        
+
         try:
             ttl = ttl or self.ttl
-            self.client.setex(
-                key,
-                ttl,
-                json.dumps(value, default=str)
-            )
+            raw = self.codec.encode(value)
+            await self.client.setex(self._k(key), ttl, raw)
+            if self.l1 is not None:
+                self.l1.set(key, raw, ttl)
+                await self._invalidate_remote([key])
             return True
         except Exception as e:
             print(f"Cache set error: {e}")
         return False
-    
+
     async def delete(self, key: str) -> bool:
         """Delete from cache"""
-        if not self.enabled:
+        if not self.available:
             return False
-        
+
         try:
-            self.client.delete(key)
+            await self.client.unlink(self._k(key))
+            if self.l1 is not None:
+                self.l1.delete(key)
+                await self._invalidate_remote([key])
             return True
         except Exception as e:
             print(f"Cache delete error: {e}")
         return False
-    
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get several keys in one round trip (missing keys are left out)"""
+        keys = list(keys)
+        if not self.available or not keys:
+            return {}
+
+        results: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in keys:
+            raw = self.l1.get(key) if self.l1 is not None else None
+            if raw is not None:
+                self.stats["l1"]["hits"] += 1
+                results[key] = self.codec.decode(raw)
+            else:
+                if self.l1 is not None:
+                    self.stats["l1"]["misses"] += 1
+                missing.append(key)
+
+        if not missing:
+            return results
+
+        try:
+            values = await self.client.mget([self._k(key) for key in missing])
+            for key, value in zip(missing, values):
+                if value:
+                    self.stats["l2"]["hits"] += 1
+                    if self.l1 is not None:
+                        self.l1.set(key, value)
+                    results[key] = self.codec.decode(value)
+                else:
+                    self.stats["l2"]["misses"] += 1
+        except Exception as e:
+            print(f"Cache get_many error: {e}")
+        return results
+
+    async def set_many(self, items: Dict[str, Any], ttl: Union[int, Dict[str, int], None] = None) -> bool:
+        """Set several keys in one pipeline. `ttl` may be a single value or a per-key dict"""
+        if not self.available or not items:
+            return False
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            encoded = {}
+            for key, value in items.items():
+                key_ttl = (ttl.get(key) if isinstance(ttl, dict) else ttl) or self.ttl
+                raw = self.codec.encode(value)
+                encoded[key] = (raw, key_ttl)
+                pipe.setex(self._k(key), key_ttl, raw)
+            await pipe.execute()
+
+            if self.l1 is not None:
+                for key, (raw, key_ttl) in encoded.items():
+                    self.l1.set(key, raw, key_ttl)
+                await self._invalidate_remote(list(encoded))
+            return True
+        except Exception as e:
+            print(f"Cache set_many error: {e}")
+        return False
+
+    async def delete_many(self, keys: Iterable[str]) -> bool:
+        """Delete several keys with a single UNLINK"""
+        keys = list(keys)
+        if not self.available or not keys:
+            return False
+
+        try:
+            await self.client.unlink(*[self._k(key) for key in keys])
+            if self.l1 is not None:
+                for key in keys:
+                    self.l1.delete(key)
+                await self._invalidate_remote(keys)
+            return True
+        except Exception as e:
+            print(f"Cache delete_many error: {e}")
+        return False
+
+    async def delete_prefix(self, prefix: str, batch_size: int = 500) -> int:
+        """Delete every key under a logical prefix with SCAN + UNLINK (non-blocking)"""
+        if not self.available:
+            return 0
+
+        # Escapar caracteres de glob do padrão do SCAN
+        pattern = "".join(f"\\{c}" if c in "*?[]\\" else c for c in self._k(prefix)) + "*"
+        deleted = 0
+        try:
+            batch = []
+            async for key in self.client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += await self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.client.unlink(*batch)
+
+            if self.l1 is not None:
+                self.l1.delete_prefix(prefix)
+                await self.pub(INVALIDATION_CHANNEL, {"origin": self.instance_id, "prefix": prefix})
+        except Exception as e:
+            print(f"Cache delete_prefix error: {e}")
+        return deleted
+
+    async def _invalidate_remote(self, keys: list = None):
+        """Tell other workers to drop keys from their L1 (None = everything)"""
+        await self.pub(INVALIDATION_CHANNEL, {"origin": self.instance_id, "keys": keys})
+
+    async def _listen_invalidations(self):
+        """Drop L1 entries written/deleted by other workers"""
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if not message:
+                        continue
+
+                    payload = json.loads(message["data"])
+                    if payload.get("origin") == self.instance_id:
+                        continue
+
+                    keys = payload.get("keys")
+                    if "prefix" in payload:
+                        self.l1.delete_prefix(payload["prefix"])
+                    elif keys is None:
+                        self.l1.clear()
+                    else:
+                        for key in keys:
+                            self.l1.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+                # Sem o canal não dá para garantir coerência: esvaziar o L1
+                self.l1.clear()
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
     async def pub(self, channel: str, message: Any):
         """Publish message (Pub/Sub)"""
-        if not self.enabled:
+        if not self.available:
             return
-        
+
         try:
-            self.client.publish(
+            await self.client.publish(
                 channel,
                 json.dumps(message, default=str)
             )
         except Exception as e:
             print(f"Pub error: {e}")
-    
+
+    async def acquire_lock(self, key: str, timeout: float) -> Optional[str]:
+        """Short cross-worker lock (SET NX PX). Returns a token or None if held elsewhere"""
+        token = uuid.uuid4().hex
+        if not self.available:
+            # Sem KeyDB não há outros workers para coordenar
+            return token
+
+        try:
+            if await self.client.set(self._k(f"lock:{key}"), token, nx=True, px=int(timeout * 1000)):
+                return token
+            return None
+        except Exception as e:
+            print(f"Cache lock error: {e}")
+            return token
+
+    async def release_lock(self, key: str, token: str):
+        """Release a lock acquired with acquire_lock"""
+        if not self.available:
+            return
+
+        try:
+            await self.client.eval(RELEASE_LOCK_SCRIPT, 1, self._k(f"lock:{key}"), token)
+        except Exception as e:
+            print(f"Cache unlock error: {e}")
+
     async def clear(self):
-        """Clear all cache"""
-        if not self.enabled:
+        """Clear all application keys (other data in the same KeyDB is kept)"""
+        if not self.available:
             return
-        
+
         try:
-            self.client.flushdb()
+            await self.delete_prefix("")
+            if self.l1 is not None:
+                self.l1.clear()
+                await self._invalidate_remote(None)
         except Exception as e:
             print(f"Clear cache error: {e}")
 
+
+class CacheNamespace:
+    """
+    Versioned group of keys. Physical keys embed the namespace version, so
+    invalidate() bumps one counter instead of deleting every key; old entries
+    simply stop being read and expire through their TTL.
+    """
+
+    def __init__(self, layer: CacheLayer, name: str):
+        self.layer = layer
+        self.name = name
+
+    async def version(self) -> int:
+        if not self.layer.available:
+            return 0
+        try:
+            return int(await self.layer.client.get(self.layer._k(f"nsver:{self.name}")) or 0)
+        except Exception as e:
+            print(f"Cache namespace error: {e}")
+            return 0
+
+    async def _key(self, key: str, version: Optional[int] = None) -> str:
+        if version is None:
+            version = await self.version()
+        return f"{self.name}:v{version}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await self.layer.get(await self._key(key))
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        return await self.layer.set(await self._key(key), value, ttl)
+
+    async def delete(self, key: str) -> bool:
+        return await self.layer.delete(await self._key(key))
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        version = await self.version()
+        mapping = {await self._key(key, version): key for key in keys}
+        found = await self.layer.get_many(mapping)
+        return {mapping[k]: v for k, v in found.items()}
+
+    async def set_many(self, items: Dict[str, Any], ttl: Union[int, Dict[str, int], None] = None) -> bool:
+        version = await self.version()
+        physical = {await self._key(key, version): value for key, value in items.items()}
+        if isinstance(ttl, dict):
+            ttl = {await self._key(key, version): value for key, value in ttl.items()}
+        return await self.layer.set_many(physical, ttl)
+
+    async def invalidate(self) -> int:
+        """Invalidate the whole namespace in O(1)"""
+        if not self.layer.available:
+            return 0
+        try:
+            version = await self.layer.client.incr(self.layer._k(f"nsver:{self.name}"))
+            if self.layer.l1 is not None:
+                self.layer.l1.delete_prefix(f"{self.name}:")
+                await self.layer.pub(
+                    INVALIDATION_CHANNEL, {"origin": self.layer.instance_id, "prefix": f"{self.name}:"}
+                )
+            return version
+        except Exception as e:
+            print(f"Cache namespace error: {e}")
+            return 0
+
+    async def purge(self) -> int:
+        """Eagerly delete every version of the namespace (SCAN + UNLINK)"""
+        return await self.layer.delete_prefix(f"{self.name}:")
+
 # Global instance
 cache = CacheLayer()
+
+
+# ============================================================
+# Cache-aside decorator (single-flight + stale-while-revalidate)
+# ============================================================
+
+# Computações em andamento neste processo: key -> Future
+_inflight: Dict[str, asyncio.Future] = {}
+_refreshing: set = set()
+_background_tasks: set = set()
+
+
+def _build_key(key: Union[str, Callable[..., str]], func: Callable, args: tuple, kwargs: dict) -> str:
+    if callable(key):
+        return key(*args, **kwargs)
+
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return key.format(**bound.arguments)
+
+
+async def _compute_and_store(cache_key: str, compute: Callable, ttl: int, stale_ttl: int,
+                             lock_timeout: float) -> Any:
+    """Compute under a short KeyDB lock so only one worker recomputes a key"""
+    token = await cache.acquire_lock(cache_key, lock_timeout)
+
+    if token is None:
+        # Outro worker está calculando: aguardar o resultado dele
+        deadline = time.monotonic() + lock_timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            envelope = await cache.get(cache_key)
+            if envelope and envelope["fresh_until"] > time.time():
+                return envelope["value"]
+        # Lock expirou sem resultado: calcular aqui mesmo
+        token = await cache.acquire_lock(cache_key, lock_timeout)
+
+    try:
+        value = await compute()
+        envelope = {"value": value, "fresh_until": time.time() + ttl}
+        await cache.set(cache_key, envelope, ttl + stale_ttl)
+        return value
+    finally:
+        if token is not None:
+            await cache.release_lock(cache_key, token)
+
+
+async def _single_flight(cache_key: str, compute: Callable, ttl: int, stale_ttl: int,
+                         lock_timeout: float) -> Any:
+    """Coalesce concurrent misses for the same key into one computation"""
+    future = _inflight.get(cache_key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[cache_key] = future
+    try:
+        value = await _compute_and_store(cache_key, compute, ttl, stale_ttl, lock_timeout)
+        future.set_result(value)
+        return value
+    except BaseException as e:
+        future.set_exception(e)
+        # Evita "exception was never retrieved" quando ninguém estava esperando
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(cache_key, None)
+
+
+async def _refresh(cache_key: str, compute: Callable, ttl: int, stale_ttl: int, lock_timeout: float):
+    try:
+        token = await cache.acquire_lock(cache_key, lock_timeout)
+        if token is None:
+            # Outro worker já está revalidando
+            return
+        try:
+            value = await compute()
+            await cache.set(cache_key, {"value": value, "fresh_until": time.time() + ttl}, ttl + stale_ttl)
+        finally:
+            await cache.release_lock(cache_key, token)
+    except Exception as e:
+        print(f"Cache refresh error for {cache_key}: {e}")
+    finally:
+        _refreshing.discard(cache_key)
+
+
+def cached(key: Union[str, Callable[..., str]], ttl: Optional[int] = None, stale_ttl: int = 0,
+           lock_timeout: float = 10.0):
+    """
+    Cache-aside decorator for async functions.
+
+    `key` is a format string over the function arguments (e.g. "rss:{request.url}")
+    or a callable receiving the same arguments. Concurrent misses for the same key
+    are coalesced into a single computation, inside the worker and across workers
+    (short KeyDB lock). With `stale_ttl`, expired values keep being served for that
+    long while one background refresh runs.
+    """
+    def decorator(func: Callable):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not cache.available:
+                return await func(*args, **kwargs)
+
+            cache_key = f"cached:{_build_key(key, func, args, kwargs)}"
+            fresh_ttl = ttl or cache.ttl
+
+            def compute():
+                return func(*args, **kwargs)
+
+            envelope = await cache.get(cache_key)
+            if envelope:
+                if envelope["fresh_until"] > time.time():
+                    return envelope["value"]
+
+                # Stale-while-revalidate: devolve o valor antigo e revalida em background
+                if cache_key not in _refreshing and cache_key not in _inflight:
+                    _refreshing.add(cache_key)
+                    task = asyncio.create_task(
+                        _refresh(cache_key, compute, fresh_ttl, stale_ttl, lock_timeout)
+                    )
+                    _background_tasks.add(task)
+                    task.add_done_callback(_background_tasks.discard)
+                return envelope["value"]
+
+            return await _single_flight(cache_key, compute, fresh_ttl, stale_ttl, lock_timeout)
+
+        return wrapper
+
+    return decorator
@@ -30,6 +30,53 @@ class Settings(BaseSettings):
     CEREBRAS_API_KEY: str = ""
     CEREBRAS_MODEL: str = "llama-3.3-70b"
     CEREBRAS_BASE_URL: str = "https://api.cerebras.ai/v1"
+    CEREBRAS_MAX_CONCURRENCY: int = 8
+    CEREBRAS_PAGE_TIMEOUT: float = 30.0
+    CEREBRAS_MAX_RETRIES: int = 3
+    CEREBRAS_MAX_CONNECTIONS: int = 50
+    CEREBRAS_BREAKER_THRESHOLD: int = 5
+    CEREBRAS_BREAKER_RECOVERY: float = 30.0
+    CEREBRAS_SCHEDULER_CONCURRENCY: int = 16
+    CEREBRAS_TOKENS_PER_MINUTE: int = 60000
+    
+    # PDF (0 = um worker por CPU)
+    PDF_EXTRACT_WORKERS: int = 0
+    # Documentos enviados: PDF + texto extraído, por SHA-256
+    DOCUMENT_STORE_DIR: str = "uploads/documents"
+    # Jobs em background: workers por estágio do pipeline de documentos
+    JOB_EXTRACT_CONCURRENCY: int = 2
+    JOB_GIST_CONCURRENCY: int = 4
+    
+    # HTTP de saída: cliente único (pool, conexões por host, teto de resposta); cache em disco se HTTP_CACHE_DIR
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    HTTP_PER_HOST_CONNECTIONS: int = 10
+    HTTP_TIMEOUT: float = 30.0
+    HTTP_MAX_RESPONSE_BYTES: int = 10 * 1024 * 1024
+    HTTP_CACHE_DIR: str = ""
+    
+    # RSS: conexões simultâneas por host e prazo total de uma busca em vários feeds
+    RSS_PER_HOST_CONCURRENCY: int = 2
+    RSS_FETCH_TIMEOUT: float = 30.0
+    RSS_SEARCH_DEADLINE: float = 10.0
+    RSS_PARSE_WORKERS: int = 2
+    # Coleta em background: intervalo entre verificações e limites do intervalo adaptativo (segundos)
+    RSS_INGEST_ENABLED: bool = True
+    RSS_INGEST_TICK: float = 30.0
+    RSS_INGEST_BATCH: int = 50
+    RSS_DEFAULT_INTERVAL: float = 900.0
+    RSS_MIN_INTERVAL: float = 300.0
+    RSS_MAX_INTERVAL: float = 21600.0
+    # Prazo de cada feed numa coleta em background (limitado a 1/5 do lock da coleta)
+    RSS_FEED_DEADLINE: float = 60.0
+    # Índice de busca: idade máxima antes de reler itens novos do banco (segundos)
+    RSS_SEARCH_SYNC_INTERVAL: float = 5.0
+    # Feeds de URLs avulsas (/rss/fetch, /rss/search): quantos podem existir e após quanto tempo sem uso expiram
+    RSS_MAX_EPHEMERAL_FEEDS: int = 200
+    RSS_EPHEMERAL_TTL: float = 86400.0
+    # Feeds em hosts internos (localhost, rede privada) só com isso ligado
+    RSS_ALLOW_PRIVATE_HOSTS: bool = False
     
     # Cartesia
     CARTESIA_API_KEY: str = ""
@@ -1,8 +1,22 @@
 from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import declarative_base, sessionmaker
 from .config import settings
 
-engine = create_engine(settings.database_url)
+# SQLite (padrão em desenvolvimento) precisa aceitar conexões vindas de threads do pool
+connect_args = {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    echo=settings.DB_ECHO,
+    pool_size=settings.DB_POOL_SIZE,
+    pool_pre_ping=True,
+    connect_args=connect_args
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+
+def init_db():
+    """Create missing tables"""
+    from app import models  # noqa: F401  (registra os modelos no Base)
+    Base.metadata.create_all(bind=engine)
@@ -2,7 +2,9 @@ from fastapi import FastAPI, WebSocketException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.cache import cache
-from app.middleware.rate_limit import RateLimitMiddleware, LoginRateLimitMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.services.http_client import http
+import asyncio
 import logging
 import os
 
@@ -14,8 +16,66 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Orkut 2.0 API starting...")
     logger.info(f"Cache enabled: {cache.enabled}")
     logger.info(f"Redis/KeyDB URL: {cache.redis_url}")
+    await cache.connect()
+    await http.start()
+    await _start_cerebras()
+    try:
+        from app.database import init_db
+        await asyncio.to_thread(init_db)
+    except Exception as e:
+        logger.error(f"❌ Database init failed: {e}")
+    from app.services.jobs import jobs
+    await jobs.start()
+    from app.config import settings
+    from app.services.feed_store import POPULAR_FEEDS
+    from app.services.rss_ingester import rss_ingester
+    if settings.RSS_INGEST_ENABLED:
+        try:
+            await rss_ingester.start([feed["url"] for feed in POPULAR_FEEDS])
+        except Exception as e:
+            logger.error(f"❌ RSS ingester failed to start: {e}")
+    # Índice de busca carregado em background; buscas antes disso veem o que já entrou
+    from app.services.rss_search import item_index
+    index_warmup = asyncio.create_task(item_index.sync())
     yield
     logger.info("🛑 Orkut 2.0 API stopping...")
+    await rss_ingester.stop()
+    await asyncio.gather(index_warmup, return_exceptions=True)
+    await jobs.stop()
+    from app.services import cerebras_service as cs_module
+    if cs_module.cerebras_service:
+        await cs_module.cerebras_service.close()
+    await http.close()
+    from app.services import pdf_extractor, rss_fetcher
+    rss_fetcher.shutdown_executor()
+    pdf_extractor.shutdown_executor()
+    await cache.close()
+
+async def _start_cerebras():
+    """Create the Cerebras service (on the shared HTTP client) when an API key is configured"""
+    try:
+        from app.config import settings
+        from app.services import cerebras_service as cs_module
+        
+        if settings.CEREBRAS_API_KEY:
+            cs_module.cerebras_service = cs_module.CerebrasService(
+                api_key=settings.CEREBRAS_API_KEY,
+                model=settings.CEREBRAS_MODEL,
+                max_concurrency=settings.CEREBRAS_MAX_CONCURRENCY,
+                page_timeout=settings.CEREBRAS_PAGE_TIMEOUT,
+                max_retries=settings.CEREBRAS_MAX_RETRIES,
+                max_connections=settings.CEREBRAS_MAX_CONNECTIONS,
+                breaker_threshold=settings.CEREBRAS_BREAKER_THRESHOLD,
+                breaker_recovery=settings.CEREBRAS_BREAKER_RECOVERY,
+                scheduler_concurrency=settings.CEREBRAS_SCHEDULER_CONCURRENCY,
+                tokens_per_minute=settings.CEREBRAS_TOKENS_PER_MINUTE,
+                base_url=settings.CEREBRAS_BASE_URL
+            )
+            await cs_module.cerebras_service.initialize()
+        else:
+            logger.warning("⚠️  Cerebras API key not configured")
+    except Exception as e:
+        logger.error(f"❌ Failed to initialize Cerebras: {e}")
 
 app = FastAPI(
     title="Orkut 2.0 API",
@@ -54,43 +114,8 @@ app.add_middleware(
 # ============================================================
 # Rate Limiting
 # ============================================================
+# Limite global + políticas por rota (login, uploads, IA) num único middleware ASGI
 app.add_middleware(RateLimitMiddleware, requests_per_minute=60)
-app.add_middleware(LoginRateLimitMiddleware, max_attempts=5)
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup"""
-    logger.info("🚀 Initializing Orkut 2.0 API services...")
-    
-    # Initialize Cerebras
-    try:
-        from app.config import settings
-        from app.services import cerebras_service as cs_module
-        
-        if settings.CEREBRAS_API_KEY:
-            cs_module.cerebras_service = cs_module.CerebrasService(
-                api_key=settings.CEREBRAS_API_KEY,
-                model=settings.CEREBRAS_MODEL
-            )
-            await cs_module.cerebras_service.initialize()
-        else:
-            logger.warning("⚠️  Cerebras API key not configured")
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize Cerebras: {e}")
-    
-    logger.info("✅ Services initialization complete")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Close services on shutdown"""
-    logger.info("🛑 Shutting down API...")
-    
-    try:
-        from app.services import cerebras_service as cs_module
-        if cs_module.cerebras_service:
-            await cs_module.cerebras_service.close()
-    except:
-        pass
 
 @app.get("/health")
 async def health():
@@ -98,6 +123,8 @@ async def health():
         "status": "ok",
         "version": "0.1.0",
         "cache": "keydb" if cache.enabled else "disabled",
+        "cache_stats": cache.get_stats(),
+        "http": http.metrics(),
         "database": "postgresql"
     }
 
@@ -0,0 +1,204 @@
+"""
+Rate limiter algorithms
+Sliding window counter: O(1) por requisição e memória limitada
+"""
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int  # segundos até haver orçamento de novo (0 se permitido)
+
+
+def _window_position(now: float, window: int):
+    """Index of the current window and how much of it has elapsed (0..1)"""
+    index = int(now // window)
+    elapsed = (now - index * window) / window
+    return index, elapsed
+
+
+def _result(allowed: bool, limit: int, estimated: float, elapsed: float, window: int) -> RateLimitResult:
+    remaining = max(0, int(limit - estimated))
+    retry_after = 0 if allowed else max(1, math.ceil((1 - elapsed) * window))
+    return RateLimitResult(allowed, limit, remaining, retry_after)
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding window counter em memória (por processo).
+
+    Guarda apenas dois contadores por cliente (janela atual e anterior) e
+    estima a taxa como `anterior * (1 - decorrido) + atual`. Clientes inativos
+    são removidos em ordem LRU, então a memória fica limitada a `max_keys`.
+    """
+
+    def __init__(self, limit: int, window: int = 60, max_keys: int = 100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        # key -> [window_index, current_count, previous_count]
+        self._counters: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def _evict(self, now_index: int):
+        # Clientes mais antigos ficam no início; remove os ociosos por 2+ janelas
+        # e os que excedem o limite de chaves. Custo amortizado O(1).
+        while self._counters:
+            key, entry = next(iter(self._counters.items()))
+            if len(self._counters) > self.max_keys or entry[0] < now_index - 1:
+                self._counters.popitem(last=False)
+            else:
+                break
+
+    def hit(self, key: str, cost: float = 1, now: Optional[float] = None) -> RateLimitResult:
+        now = time.time() if now is None else now
+        index, elapsed = _window_position(now, self.window)
+
+        entry = self._counters.get(key)
+        if entry is None:
+            entry = [index, 0, 0]
+            self._counters[key] = entry
+        else:
+            self._counters.move_to_end(key)
+            if entry[0] != index:
+                # Janela avançou: a atual vira anterior (ou zera se pulou mais de uma)
+                entry[2] = entry[1] if entry[0] == index - 1 else 0
+                entry[1] = 0
+                entry[0] = index
+
+        estimated = entry[2] * (1 - elapsed) + entry[1]
+        allowed = estimated + cost <= self.limit
+        if allowed:
+            entry[1] += cost
+            estimated += cost
+
+        self._evict(index)
+        return _result(allowed, self.limit, estimated, elapsed, self.window)
+
+    def refund(self, key: str, cost: float = 1, now: Optional[float] = None):
+        """Give back `cost` charged in the current window (request rejected by another limit)"""
+        now = time.time() if now is None else now
+        index, _ = _window_position(now, self.window)
+        entry = self._counters.get(key)
+        if entry is not None and entry[0] == index:
+            entry[1] = max(0, entry[1] - cost)
+
+
+# KEYS[1] = contador da janela atual, KEYS[2] = contador da janela anterior
+# ARGV = limit, cost, peso da janela anterior, ttl (ms)
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local estimated = previous * tonumber(ARGV[3]) + current
+if estimated + cost > limit then
+    return {0, tostring(estimated)}
+end
+redis.call('INCRBYFLOAT', KEYS[1], cost)
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+return {1, tostring(estimated + cost)}
+"""
+
+
+# Devolve custo à janela atual sem deixar o contador negativo
+REFUND_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if current > 0 then
+    redis.call('SET', KEYS[1], tostring(math.max(0, current - tonumber(ARGV[1]))), 'KEEPTTL')
+end
+return 1
+"""
+
+
+class RedisSlidingWindowLimiter:
+    """
+    Mesmo algoritmo, com os contadores no KeyDB via script Lua atômico,
+    para que o limite valha somando todos os workers e nós.
+    Se o KeyDB falhar, cai para o limiter em memória do processo.
+    """
+
+    def __init__(self, limit: int, window: int = 60, name: str = "global", max_keys: int = 100_000):
+        self.limit = limit
+        self.window = window
+        self.name = name
+        self.fallback = SlidingWindowLimiter(limit, window, max_keys)
+
+    async def hit(self, key: str, cost: float = 1, now: Optional[float] = None) -> RateLimitResult:
+        from app.cache import cache
+
+        if not cache.available:
+            return self.fallback.hit(key, cost, now)
+
+        now = time.time() if now is None else now
+        index, elapsed = _window_position(now, self.window)
+        base = cache._k(f"ratelimit:{self.name}:{key}")
+
+        try:
+            allowed, estimated = await cache.client.eval(
+                SLIDING_WINDOW_SCRIPT,
+                2,
+                f"{base}:{index}",
+                f"{base}:{index - 1}",
+                self.limit,
+                cost,
+                1 - elapsed,
+                self.window * 2 * 1000,
+            )
+        except Exception as e:
+            logger.warning(f"⚠️  Rate limit backend error, using local limiter: {e}")
+            return self.fallback.hit(key, cost, now)
+
+        return _result(bool(allowed), self.limit, float(estimated), elapsed, self.window)
+
+    async def refund(self, key: str, cost: float = 1, now: Optional[float] = None):
+        from app.cache import cache
+
+        if not cache.available:
+            self.fallback.refund(key, cost, now)
+            return
+        now = time.time() if now is None else now
+        index, _ = _window_position(now, self.window)
+        try:
+            await cache.client.eval(REFUND_SCRIPT, 1, cache._k(f"ratelimit:{self.name}:{key}:{index}"), cost)
+        except Exception as e:
+            logger.warning(f"⚠️  Rate limit refund failed: {e}")
+
+
+class RateLimiter:
+    """Front door used by the middleware: picks the memory or KeyDB backend"""
+
+    def __init__(self, limit: int, window: int = 60, name: str = "global", backend: Optional[str] = None,
+                 max_keys: int = 100_000):
+        backend = backend or os.getenv("RATE_LIMIT_BACKEND", "memory")
+        self.limit = limit
+        self.window = window
+        self.backend = backend
+        if backend == "redis":
+            self._redis = RedisSlidingWindowLimiter(limit, window, name, max_keys)
+            self._memory = None
+        else:
+            self._redis = None
+            self._memory = SlidingWindowLimiter(limit, window, max_keys)
+
+    async def hit(self, key: str, cost: float = 1) -> RateLimitResult:
+        if self._redis is not None:
+            return await self._redis.hit(key, cost)
+        return self._memory.hit(key, cost)
+
+    async def refund(self, key: str, cost: float = 1):
+        if self._redis is not None:
+            await self._redis.refund(key, cost)
+        else:
+            self._memory.refund(key, cost)
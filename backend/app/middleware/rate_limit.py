@@ -2,101 +2,189 @@
 Rate Limiting Middleware
 Previne brute force e abuse
 """
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime, timedelta
-from typing import Dict, Tuple
-import time
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from app.middleware.limiter import RateLimiter, RateLimitResult
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+# Custo de uma requisição a partir do scope ASGI (sem ler o corpo)
+CostFunction = Callable[[Scope], float]
+
+# ~4 caracteres por token em texto PT/EN
+CHARS_PER_TOKEN = 4
+
+
+def _content_length(scope: Scope) -> Optional[int]:
+    for name, value in scope.get("headers", []):
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def request_bytes(default: int = 1024 * 1024) -> CostFunction:
+    """Charge uploads by body size (Content-Length); `default` when it is unknown"""
+    def cost(scope: Scope) -> float:
+        length = _content_length(scope)
+        return float(length if length is not None else default)
+    return cost
+
+
+def estimated_tokens(default: int = 2000) -> CostFunction:
+    """Charge LLM endpoints by the estimated prompt size in tokens"""
+    def cost(scope: Scope) -> float:
+        length = _content_length(scope)
+        if length is None:
+            return float(default)
+        return float(max(1, length // CHARS_PER_TOKEN))
+    return cost
+
+
+class RatePolicy:
     """
-    Rate limit por IP
+    Limite aplicado às rotas que começam com `path_prefix` (um prefixo ou uma tupla).
+    `cost` define quanto cada requisição consome do orçamento (padrão: 1).
     """
-    
-    def __init__(self, app, requests_per_minute: int = 60):
-        super().__init__(app)
-        self.requests_per_minute = requests_per_minute
-        self.requests: Dict[str, list] = {}
-        
-    async def dispatch(self, request: Request, call_next):
-        # Get IP
-        ip = request.client.host if request.client else 'unknown'
-        
-        # Get current time
-        now = time.time()
-        
-        # Clean old requests (older than 1 minute)
-        if ip in self.requests:
-            self.requests[ip] = [
-                req_time for req_time in self.requests[ip]
-                if now - req_time < 60
-            ]
-        else:
-            self.requests[ip] = []
-        
-        # Check limit
-        if len(self.requests[ip]) >= self.requests_per_minute:
-            raise HTTPException(
-                status_code=429,
-                detail="Too many requests. Please try again later."
-            )
-        
-        # Add current request
-        self.requests[ip].append(now)
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Add rate limit headers
-        response.headers["X-RateLimit-Limit"] = str(self.requests_per_minute)
-        response.headers["X-RateLimit-Remaining"] = str(
-            self.requests_per_minute - len(self.requests[ip])
-        )
-        
-        return response
+
+    def __init__(self, name: str, path_prefix: Union[str, Tuple[str, ...]], limit: int, window: int = 60,
+                 methods: Optional[Tuple[str, ...]] = None,
+                 detail: str = "Too many requests. Please try again later.",
+                 backend: Optional[str] = None, cost: Optional[CostFunction] = None):
+        self.name = name
+        self.path_prefix = path_prefix
+        self.methods = methods
+        self.detail = detail
+        self.limit = limit
+        self.cost = cost
+        self.limiter = RateLimiter(limit, window=window, name=name, backend=backend)
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods and method not in self.methods:
+            return False
+        return path.startswith(self.path_prefix)
+
+    def cost_of(self, scope: Scope) -> float:
+        if self.cost is None:
+            return 1
+        # Uma requisição sozinha nunca pode custar mais que o orçamento inteiro
+        return min(self.cost(scope), self.limit)
 
 
-class LoginRateLimitMiddleware(BaseHTTPMiddleware):
+# Peso de POSTs sem política própria no orçamento global por IP (o resto custa 1).
+# IA e uploads não entram aqui: o custo deles vai para as políticas por rota.
+DEFAULT_ROUTE_WEIGHTS: Dict[str, float] = {
+    "/api/ai/rss/search": 5,
+    "/api/ai/rss/fetch": 2,
+}
+WEIGHTED_METHODS = ("POST",)
+
+
+def default_policies(backend: Optional[str] = None, max_login_attempts: int = 5) -> List[RatePolicy]:
+    """Per-route policies: login, uploads (bytes) and AI endpoints (estimated tokens)"""
+    return [
+        RatePolicy(
+            "login", "/api/auth/login", max_login_attempts, window=300, methods=("POST",),
+            detail="Too many login attempts. Please try again in 5 minutes.", backend=backend,
+        ),
+        # Uploads: número de requisições e volume em bytes
+        RatePolicy(
+            "upload-pdf", ("/api/ai/upload-pdf", "/api/ai/jobs/upload-pdf"), 10, methods=("POST",), backend=backend,
+        ),
+        RatePolicy("p2p-upload", "/api/ai/p2p/upload", 20, methods=("POST",), backend=backend),
+        RatePolicy(
+            "upload-bytes", ("/api/ai/upload-pdf", "/api/ai/jobs/upload-pdf", "/api/ai/p2p/upload"),
+            200 * 1024 * 1024, methods=("POST",), backend=backend,
+            detail="Upload bandwidth limit reached. Please try again later.",
+            cost=request_bytes(),
+        ),
+        # IA: número de requisições e tokens estimados (protege a cota da Cerebras)
+        RatePolicy("ai-gist", ("/api/ai/gist-memory", "/api/ai/jobs/gist-memory"), 20, methods=("POST",), backend=backend),
+        RatePolicy("ai-question", "/api/ai/ask-question", 30, methods=("POST",), backend=backend),
+        RatePolicy(
+            "ai-tokens", ("/api/ai/gist-memory", "/api/ai/jobs/gist-memory", "/api/ai/ask-question"), 300_000,
+            methods=("POST",), backend=backend,
+            detail="AI token budget exhausted. Please try again later.",
+            cost=estimated_tokens(),
+        ),
+    ]
+
+
+class RateLimitMiddleware:
     """
-    Rate limit específico para login (mais restritivo)
+    Rate limit por IP (ASGI puro)
+
+    Aplica as políticas por rota (cada uma com seu orçamento e custo) e o
+    limite global, numa única passada (preflights OPTIONS não contam), e
+    responde 429 com `Retry-After` sem chamar a aplicação. Não envolve o
+    corpo da resposta, então streaming (ex.: /api/ai/p2p/stream) passa direto.
     """
-    
-    def __init__(self, app, max_attempts: int = 5):
-        super().__init__(app)
-        self.max_attempts = max_attempts
-        self.attempts: Dict[str, list] = {}
-        
-    async def dispatch(self, request: Request, call_next):
-        # Apenas para /login
-        if request.url.path != "/api/auth/login":
-            return await call_next(request)
-        
+
+    def __init__(self, app: ASGIApp, requests_per_minute: int = 60,
+                 policies: Optional[List[RatePolicy]] = None, backend: Optional[str] = None,
+                 route_weights: Optional[Dict[str, float]] = None):
+        self.app = app
+        self.requests_per_minute = requests_per_minute
+        self.limiter = RateLimiter(requests_per_minute, window=60, name="global", backend=backend)
+        self.policies = default_policies(backend) if policies is None else policies
+        self.route_weights = DEFAULT_ROUTE_WEIGHTS if route_weights is None else route_weights
+
+    def _weight(self, method: str, path: str) -> float:
+        if method not in WEIGHTED_METHODS:
+            return 1
+        for prefix, weight in self.route_weights.items():
+            if path.startswith(prefix):
+                return min(weight, self.requests_per_minute)
+        return 1
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Preflight CORS não consome orçamento
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
         # Get IP
-        ip = request.client.host if request.client else 'unknown'
-        
-        # Get current time
-        now = time.time()
-        
-        # Clean old attempts (older than 5 minutes)
-        if ip in self.attempts:
-            self.attempts[ip] = [
-                attempt_time for attempt_time in self.attempts[ip]
-                if now - attempt_time < 300  # 5 minutes
-            ]
-        else:
-            self.attempts[ip] = []
-        
-        # Check limit
-        if len(self.attempts[ip]) >= self.max_attempts:
-            raise HTTPException(
-                status_code=429,
-                detail="Too many login attempts. Please try again in 5 minutes."
-            )
-        
-        # Add current attempt
-        self.attempts[ip].append(now)
-        
-        # Process request
-        response = await call_next(request)
-        
-        return response
+        client = scope.get("client")
+        ip = client[0] if client else 'unknown'
+        method = scope["method"]
+        path = scope["path"]
+
+        # Políticas por rota primeiro (mais restritivas), depois o limite global. Cada
+        # limite cobra ao admitir; se um posterior recusar, os já cobrados são devolvidos.
+        checks = [(policy.limiter, policy.cost_of(scope), policy.detail)
+                  for policy in self.policies if policy.matches(method, path)]
+        checks.append((self.limiter, self._weight(method, path), "Too many requests. Please try again later."))
+        charged = []
+        for limiter, cost, detail in checks:
+            result = await limiter.hit(ip, cost)
+            if not result.allowed:
+                for charged_limiter, charged_cost in charged:
+                    await charged_limiter.refund(ip, charged_cost)
+                await self._reject(result, detail, scope, receive, send)
+                return
+            charged.append((limiter, cost))
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                # Add rate limit headers
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(result.limit)
+                headers["X-RateLimit-Remaining"] = str(result.remaining)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    @staticmethod
+    async def _reject(result: RateLimitResult, detail: str, scope: Scope, receive: Receive, send: Send):
+        response = JSONResponse(
+            {"detail": detail},
+            status_code=429,
+            headers={
+                "Retry-After": str(result.retry_after),
+                "X-RateLimit-Limit": str(result.limit),
+                "X-RateLimit-Remaining": "0",
+            },
+        )
+        await response(scope, receive, send)
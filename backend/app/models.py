@@ -0,0 +1,76 @@
+"""
+Database models
+"""
+from datetime import datetime
+from sqlalchemy import (
+    JSON, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint
+)
+from app.database import Base
+
+
+class Document(Base):
+    """Uploaded document, identified by the SHA-256 of its bytes (blobs live in DOCUMENT_STORE_DIR)"""
+    __tablename__ = "documents"
+
+    id = Column(String(64), primary_key=True)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=False)
+    size = Column(Integer, nullable=False)
+    pages = Column(Integer, nullable=False)
+    words = Column(Integer, nullable=False)
+    # [[página, início, fim], ...]: trecho de cada página no texto extraído
+    page_offsets = Column(JSON, nullable=False, default=list)
+    # Resultados de análise já calculados, por chave (ex.: "gist_memory:v1")
+    analysis = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Feed(Base):
+    """RSS feed polled by the ingester"""
+    __tablename__ = "feeds"
+
+    id = Column(Integer, primary_key=True)
+    url = Column(String(2048), nullable=False, unique=True)
+    title = Column(String(512))
+    description = Column(Text, nullable=False, default="")
+    link = Column(String(2048), nullable=False, default="")
+    language = Column(String(32))
+    updated = Column(String(64), nullable=False, default="")
+    # Intervalo adaptativo: encurta quando o feed publica, alonga enquanto nada muda
+    poll_interval = Column(Float, nullable=False)
+    next_poll_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_polled_at = Column(DateTime)
+    # fetched_at do último parse gravado: um parse igual (304) não é regravado
+    parsed_at = Column(Float)
+    last_error = Column(Text)
+    failures = Column(Integer, nullable=False, default=0)
+    # Assinado de passagem (/rss/fetch, /rss/search): expira sem uso; /feeds cria assinaturas duráveis
+    ephemeral = Column(Boolean, nullable=False, default=False, index=True)
+    last_used_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class FeedItem(Base):
+    """Ingested RSS item, unique per (feed, guid)"""
+    __tablename__ = "feed_items"
+    __table_args__ = (
+        UniqueConstraint("feed_id", "guid", name="uq_feed_items_feed_guid"),
+        Index("ix_feed_items_feed_published", "feed_id", "published_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    feed_id = Column(Integer, ForeignKey("feeds.id", ondelete="CASCADE"), nullable=False)
+    guid = Column(String(1024), nullable=False)
+    title = Column(Text)
+    summary = Column(Text, nullable=False, default="")
+    content = Column(Text, nullable=False, default="")
+    link = Column(String(2048), nullable=False, default="")
+    author = Column(String(512), nullable=False, default="")
+    image = Column(String(2048))
+    tags = Column(JSON, nullable=False, default=list)
+    # Data publicada pelo feed (ou atualizada); ordenação usa published_at, que cai para a ingestão
+    published = Column(String(32))
+    published_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Itens editados na origem mudam aqui: o índice de busca reindexa por esta coluna
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
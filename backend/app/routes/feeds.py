@@ -1,24 +1,70 @@
 """
 Feeds routes
 """
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+
+from app.services import feed_store
+from app.services.rss_ingester import IngestError, rss_ingester
 
 router = APIRouter()
 
 
+class FeedCreate(BaseModel):
+    url: str
+
+
 @router.get("/feeds")
 async def get_feeds():
     """Get all feeds"""
-    return []
+    return await feed_store.list_feeds()
 
 
 @router.post("/feeds")
-async def create_feed():
-    """Create feed"""
-    return {"id": "1", "url": "https://example.com/feed"}
+async def create_feed(request: FeedCreate):
+    """Create feed (subscribed and ingested right away)"""
+    try:
+        return await rss_ingester.ingest_url(request.url)
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=f"Could not fetch feed: {e}")
+
+
+@router.get("/feeds/items")
+async def get_items(limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    """Latest items across all feeds"""
+    return await _page(None, limit, cursor)
+
+
+@router.get("/feeds/{feed_id}")
+async def get_feed(feed_id: int):
+    """Get feed by ID"""
+    feed = await feed_store.get_feed(feed_id)
+    if feed is None:
+        raise HTTPException(status_code=404, detail="Feed not found")
+    return feed
+
+
+@router.get("/feeds/{feed_id}/items")
+async def get_feed_items(feed_id: int, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    """Items of a feed, newest first; pass `next_cursor` back to get the next page"""
+    if await feed_store.get_feed(feed_id) is None:
+        raise HTTPException(status_code=404, detail="Feed not found")
+    return await _page(feed_id, limit, cursor)
 
 
 @router.delete("/feeds/{feed_id}")
-async def delete_feed(feed_id: str):
+async def delete_feed(feed_id: int):
     """Delete feed"""
+    if not await feed_store.delete_feed(feed_id):
+        raise HTTPException(status_code=404, detail="Feed not found")
     return {"message": "Feed deleted"}
+
+
+async def _page(feed_id: Optional[int], limit: int, cursor: Optional[str]) -> dict:
+    try:
+        items, next_cursor = await feed_store.feed_items(feed_id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": items, "next_cursor": next_cursor}
@@ -1,21 +1,296 @@
 """
 Cerebras LLM Service
 """
+import asyncio
+import hashlib
 import httpx
+import json
 import logging
-from typing import Optional
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.cache import cache
+from app.services.http_client import HTTP2_AVAILABLE, LatencyStats, OutboundHTTP, http
+from app.services.retrieval import select_context
 
 logger = logging.getLogger(__name__)
 
+# Versão do prompt de gist: alterar o prompt exige trocar a versão (invalida o cache)
+GIST_PROMPT_VERSION = "v1"
+GIST_CACHE_TTL = 7 * 24 * 3600
+
+# Gists por página, endereçados pelo conteúdo (compartilhados entre documentos e usuários)
+gist_cache = cache.namespace("gist")
+
+
+class CerebrasError(Exception):
+    """Cerebras request failed (after retries)"""
+
+
+class CircuitOpenError(CerebrasError):
+    """Provider marked unhealthy: calls are short-circuited until the breaker half-opens"""
+
+
+# Status que valem nova tentativa (e contam como falha do provedor)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """
+    closed -> open após `failure_threshold` falhas seguidas;
+    open -> half_open depois de `recovery_timeout` segundos (uma chamada de teste);
+    half_open -> closed se a chamada de teste funcionar, senão open de novo.
+    Uma chamada de teste sem resposta por `probe_timeout` segundos é dada como
+    perdida e outra pode ser feita (uma sonda perdida não trava o circuito).
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 probe_timeout: float = 120.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe_timeout = probe_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self.counters = {"successes": 0, "failures": 0, "short_circuited": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = "half_open"
+            self._probe_in_flight = False
+
+        if self.state == "half_open":
+            if self._probe_in_flight and time.monotonic() - self._probe_started < self.probe_timeout:
+                return False
+            self._probe_in_flight = True
+            self._probe_started = time.monotonic()
+        return True
+
+    def release_probe(self):
+        """Call admitted by allow() ended without an outcome (cancelled): let another call probe"""
+        self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open" and time.monotonic() - self.opened_at < self.recovery_timeout
+
+    def record_success(self):
+        self.counters["successes"] += 1
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self.state != "closed":
+            logger.info("✅ Cerebras circuit closed")
+        self.state = "closed"
+
+    def record_failure(self):
+        self.counters["failures"] += 1
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.counters["opened"] += 1
+                logger.warning(f"⚠️  Cerebras circuit opened ({self.consecutive_failures} failures)")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def metrics(self) -> dict:
+        return {
+            "state": "open" if self.is_open else ("half_open" if self.state == "open" else self.state),
+            "consecutive_failures": self.consecutive_failures,
+            **self.counters,
+        }
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse Retry-After (seconds or HTTP date)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Prioridades do scheduler (menor = atendido antes)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# ~4 caracteres por token em texto PT/EN
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Prompt + completion tokens charged against the budget"""
+    return len(prompt) // CHARS_PER_TOKEN + max_tokens
+
+
+class TokenBudget:
+    """Token bucket for a tokens-per-minute limit (0 = unlimited)"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait until `tokens` are available; returns the time spent waiting"""
+        if self.capacity <= 0:
+            return 0.0
+
+        # Um pedido maior que o balde inteiro espera o balde encher e passa
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        # O lock mantém a ordem de chegada (quem já está esperando não é ultrapassado)
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                delay = (tokens - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.tokens -= tokens
+        return waited
+
+
+class CompletionScheduler:
+    """
+    Fila de completions na frente do provedor:
+    - prompts idênticos em andamento viram uma única chamada;
+    - fila com prioridade (Q&A interativo antes de gists em background);
+    - orçamento global de tokens por minuto para evitar rajadas de 429.
+    """
+
+    def __init__(self, send: Callable[[str, int], Awaitable[str]], max_concurrency: int = 16,
+                 tokens_per_minute: int = 0):
+        self.send = send
+        self.max_concurrency = max_concurrency
+        self.budget = TokenBudget(tokens_per_minute)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._seq = 0
+        self.counters = {"submitted": 0, "deduplicated": 0, "completed": 0, "tokens": 0, "budget_wait_s": 0.0}
+
+    @staticmethod
+    def _key(prompt: str, max_tokens: int) -> str:
+        normalized = " ".join(prompt.split())
+        return hashlib.sha256(f"{max_tokens}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        self._workers = [task for task in self._workers if not task.done()]
+        while len(self._workers) < self.max_concurrency:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self):
+        while True:
+            _, _, key, prompt, max_tokens, future = await self._queue.get()
+            try:
+                tokens = estimate_tokens(prompt, max_tokens)
+                self.counters["budget_wait_s"] += await self.budget.acquire(tokens)
+                self.counters["tokens"] += tokens
+                result = await self.send(prompt, max_tokens)
+                if not future.done():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.counters["completed"] += 1
+                self._inflight.pop(key, None)
+                self._queue.task_done()
+
+    async def submit(self, prompt: str, max_tokens: int, priority: int = PRIORITY_INTERACTIVE) -> str:
+        self.counters["submitted"] += 1
+        key = self._key(prompt, max_tokens)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.counters["deduplicated"] += 1
+            return await asyncio.shield(future)
+
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._seq += 1
+        await self._queue.put((priority, self._seq, key, prompt, max_tokens, future))
+        # shield: um chamador que desiste (timeout) não cancela a chamada dos outros
+        return await asyncio.shield(future)
+
+    async def close(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def metrics(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": len(self._inflight),
+            "tokens_per_minute": self.budget.capacity,
+            **self.counters,
+        }
+
+
+def page_fingerprint(page: str, model: str) -> str:
+    """Hash of (normalized page text, model, prompt version)"""
+    normalized = " ".join(page.split())
+    payload = f"{model}\x00{GIST_PROMPT_VERSION}\x00{normalized}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
 class CerebrasService:
     """Cerebras LLM Service for Gist Memory and AI"""
     
-    def __init__(self, api_key: str, model: str = "llama-3.3-70b"):
+    def __init__(self, api_key: str, model: str = "llama-3.3-70b", max_concurrency: int = 8,
+                 page_timeout: float = 30.0, max_retries: int = 3, max_connections: int = 50,
+                 breaker_threshold: int = 5, breaker_recovery: float = 30.0,
+                 scheduler_concurrency: int = 16, tokens_per_minute: int = 0,
+                 base_url: str = "https://api.cerebras.ai/v1"):
         self.api_key = api_key
         self.model = model
-        self.base_url = "https://api.cerebras.ai/v1"
-        self.client: Optional[httpx.AsyncClient] = None
+        self.base_url = base_url.rstrip("/")
+        # Cliente HTTP compartilhado da aplicação (conexões e TLS reaproveitados)
+        self.client: Optional[OutboundHTTP] = None
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self.timeout = httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=10.0)
+        # Limite de páginas resumidas em paralelo por documento
+        self.max_concurrency = max_concurrency
+        self.page_timeout = page_timeout
+        # Retry com backoff exponencial + jitter
+        self.max_retries = max_retries
+        self.retry_base_delay = 0.5
+        self.retry_max_delay = 8.0
+        self.max_connections = max_connections
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_recovery)
+        self.counters = {"requests": 0, "retries": 0}
+        self.scheduler = CompletionScheduler(self._send, scheduler_concurrency, tokens_per_minute)
+        # Trechos (BM25) enviados ao LLM em perguntas sobre documentos grandes
+        self.retrieval_k = 5
+        # Time-to-first-token dos endpoints em streaming
+        self.ttft: Dict[str, LatencyStats] = {}
     
     async def initialize(self):
         """Initialize async client"""
@@ -23,49 +298,219 @@ class CerebrasService:
             logger.warning("⚠️  Cerebras API key not configured")
             return
         
-        self.client = httpx.AsyncClient(
-            headers={"Authorization": f"Bearer {self.api_key}"},
-            base_url=self.base_url,
-            timeout=30.0
-        )
-        logger.info("✅ Cerebras client initialized")
+        http.set_host_limit(self.base_url, self.max_connections)
+        self.client = http
+        logger.info(f"✅ Cerebras client initialized (HTTP/2: {HTTP2_AVAILABLE})")
+    
+    @property
+    def available(self) -> bool:
+        """False while the circuit breaker is open (callers should use the local fallback)"""
+        return not self.breaker.is_open
+    
+    def metrics(self) -> dict:
+        """Client and circuit breaker metrics"""
+        return {
+            "model": self.model,
+            "http2": HTTP2_AVAILABLE,
+            "max_connections": self.max_connections,
+            **self.counters,
+            "breaker": self.breaker.metrics(),
+            "scheduler": self.scheduler.metrics(),
+            "ttft": {kind: stats.summary() for kind, stats in self.ttft.items()}
+        }
+    
+    def record_ttft(self, kind: str, seconds: float):
+        """Record time-to-first-token (or first gist) for a streaming endpoint"""
+        self.ttft.setdefault(kind, LatencyStats()).record(seconds)
+    
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        # Full jitter; Retry-After do provedor tem prioridade
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+        if response is not None:
+            retry_after = _retry_after_seconds(response)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, 30.0))
+        return delay
     
     async def close(self):
         """Close client"""
-        if self.client:
-            await self.client.aclose()
+        await self.scheduler.close()
+        # O cliente é da aplicação: fechado no lifespan
+        self.client = None
     
-    async def complete(self, prompt: str, max_tokens: int = 500) -> str:
-        """Complete text with LLM"""
+    async def complete(self, prompt: str, max_tokens: int = 500,
+                       priority: int = PRIORITY_INTERACTIVE) -> str:
+        """Complete text with LLM through the scheduler (raises CerebrasError on failure)"""
         if not self.client:
             await self.initialize()
         
         if not self.client:
-            return "Cerebras not configured"
+            raise CerebrasError("Cerebras not configured")
         
+        # Circuito aberto: falhar já, sem entrar na fila
+        if not self.available:
+            self.breaker.counters["short_circuited"] += 1
+            raise CircuitOpenError("Cerebras circuit open")
+        
+        return await self.scheduler.submit(prompt, max_tokens, priority)
+    
+    async def _send(self, prompt: str, max_tokens: int) -> str:
+        """One upstream completion with retries and circuit breaker"""
+        if not self.breaker.allow():
+            self.breaker.counters["short_circuited"] += 1
+            raise CircuitOpenError("Cerebras circuit open")
+        
+        # Como em complete_stream: toda saída fecha a chamada no breaker (ResponseTooLarge,
+        # DecodingError, cancelamento...), senão a sonda do half_open ficaria presa
+        settled = False
         try:
-            response = await self.client.post(
-                "/chat/completions",
-                json={
-                    "model": self.model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": max_tokens,
-                    "temperature": 0.7
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data["choices"][0]["message"]["content"]
-        except Exception as e:
-            logger.error(f"❌ Cerebras error: {e}")
-            return f"Error: {str(e)}"
+            payload = {
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens,
+                "temperature": 0.7
+            }
+        
+            last_error: Optional[Exception] = None
+            for attempt in range(self.max_retries + 1):
+                response = None
+                self.counters["requests"] += 1
+                try:
+                    response = await self.client.post(
+                        f"{self.base_url}/chat/completions", json=payload, headers=self.headers, timeout=self.timeout
+                    )
+                    if response.status_code in RETRYABLE_STATUS:
+                        last_error = CerebrasError(f"HTTP {response.status_code}")
+                    else:
+                        response.raise_for_status()
+                        content = response.json()["choices"][0]["message"]["content"]
+                        settled = True
+                        self.breaker.record_success()
+                        return content
+                except httpx.HTTPStatusError as e:
+                    # 4xx (exceto 408/429) é erro da requisição, não do provedor: sem retry
+                    settled = True
+                    self.breaker.record_success()
+                    logger.error(f"❌ Cerebras error: {e}")
+                    raise CerebrasError(str(e)) from e
+                except (httpx.TransportError, ValueError, KeyError) as e:
+                    last_error = e
+            
+                if attempt < self.max_retries:
+                    self.counters["retries"] += 1
+                    delay = self._backoff(attempt, response)
+                    logger.warning(f"⚠️  Cerebras attempt {attempt + 1} failed ({last_error}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        
+            settled = True
+            self.breaker.record_failure()
+            logger.error(f"❌ Cerebras error after {self.max_retries + 1} attempts: {last_error}")
+            raise CerebrasError(str(last_error)) from last_error
+        except Exception:
+            if not settled:
+                settled = True
+                self.breaker.record_failure()
+            raise
+        finally:
+            if not settled:
+                self.breaker.release_probe()
     
-    async def gist_memory(self, document: str) -> dict:
-        """Summarize document with Gist Memory"""
-        # Split document into pages
+    async def complete_stream(self, prompt: str, max_tokens: int = 500) -> AsyncIterator[str]:
+        """Stream completion deltas (stream=True). Retries only happen before the first token"""
+        if not self.client:
+            await self.initialize()
+        
+        if not self.client:
+            raise CerebrasError("Cerebras not configured")
+        
+        if not self.breaker.allow():
+            self.breaker.counters["short_circuited"] += 1
+            raise CircuitOpenError("Cerebras circuit open")
+        
+        # Todo caminho fecha a chamada no breaker: sem isso a sonda do half_open ficaria presa
+        settled = False
+        try:
+            # Streams não passam pela deduplicação, mas respeitam o orçamento de tokens
+            tokens = estimate_tokens(prompt, max_tokens)
+            self.scheduler.counters["budget_wait_s"] += await self.scheduler.budget.acquire(tokens)
+            self.scheduler.counters["tokens"] += tokens
+        
+            payload = {
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens,
+                "temperature": 0.7,
+                "stream": True
+            }
+        
+            last_error: Optional[Exception] = None
+            for attempt in range(self.max_retries + 1):
+                self.counters["requests"] += 1
+                started = False
+                retry_response = None
+                try:
+                    async with self.client.stream(
+                        "POST", f"{self.base_url}/chat/completions",
+                        json=payload, headers=self.headers, timeout=self.timeout
+                    ) as response:
+                        if response.status_code in RETRYABLE_STATUS:
+                            last_error = CerebrasError(f"HTTP {response.status_code}")
+                            retry_response = response
+                        else:
+                            if response.is_error:
+                                await response.aread()
+                                settled = True
+                                self.breaker.record_success()
+                                raise CerebrasError(f"HTTP {response.status_code}: {response.text[:200]}")
+                        
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == "[DONE]":
+                                    break
+                                chunk = json.loads(data)
+                                delta = chunk["choices"][0].get("delta", {}).get("content")
+                                if delta:
+                                    started = True
+                                    yield delta
+                        
+                            settled = True
+                            self.breaker.record_success()
+                            return
+                except (httpx.TransportError, ValueError, KeyError) as e:
+                    if started:
+                        # Já enviamos tokens ao cliente: não dá para repetir
+                        settled = True
+                        self.breaker.record_failure()
+                        raise CerebrasError(f"Stream interrupted: {e}") from e
+                    last_error = e
+            
+                if attempt < self.max_retries:
+                    self.counters["retries"] += 1
+                    delay = self._backoff(attempt, retry_response)
+                    logger.warning(f"⚠️  Cerebras stream attempt {attempt + 1} failed ({last_error}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        
+            settled = True
+            self.breaker.record_failure()
+            logger.error(f"❌ Cerebras stream error after {self.max_retries + 1} attempts: {last_error}")
+            raise CerebrasError(str(last_error)) from last_error
+        except Exception:
+            if not settled:
+                settled = True
+                self.breaker.record_failure()
+            raise
+        finally:
+            if not settled:
+                # Cliente desistiu do stream (GeneratorExit/CancelledError): não é falha do provedor
+                self.breaker.release_probe()
+    
+    @staticmethod
+    def split_pages(document: str, words_per_page: int = 500) -> List[str]:
+        """Split document into ~500-word pages on paragraph boundaries"""
         paragraphs = document.split("\n\n")
         pages = []
-        gists = []
         current_page = []
         current_words = 0
         
@@ -74,7 +519,7 @@ class CerebrasService:
             current_words += words
             current_page.append(para)
             
-            if current_words > 500:  # ~500 words per page
+            if current_words > words_per_page:
                 pages.append("\n\n".join(current_page))
                 current_page = []
                 current_words = 0
@@ -82,30 +527,133 @@ class CerebrasService:
         if current_page:
             pages.append("\n\n".join(current_page))
         
-        # Generate gist for each page
-        logger.info(f"📄 Creating gists for {len(pages)} pages...")
-        
-        for i, page in enumerate(pages):
-            try:
-                gist = await self.complete(
+        return pages
+    
+    async def _gist_page(self, page: str, key: str, semaphore: asyncio.Semaphore) -> str:
+        """Summarize one page (bounded by the semaphore, with per-page timeout) and cache it"""
+        async with semaphore:
+            gist = await asyncio.wait_for(
+                self.complete(
                     f"Resuma este texto em 1-2 frases:\n\n{page[:500]}...",
-                    max_tokens=100
-                )
-                gists.append(gist)
-                logger.info(f"✅ Gist {i+1}/{len(pages)} created")
-            except Exception as e:
-                logger.error(f"❌ Failed to create gist {i+1}: {e}")
+                    max_tokens=100,
+                    priority=PRIORITY_BACKGROUND
+                ),
+                timeout=self.page_timeout
+            )
+        
+        await gist_cache.set(key, gist, GIST_CACHE_TTL)
+        return gist
+    
+    async def _lookup_gists(self, pages: List[str]) -> Tuple[List[str], Dict[str, str]]:
+        """Fingerprint every page and fetch the gists already cached (one round trip)"""
+        keys = [f"page:{page_fingerprint(page, self.model)}" for page in pages]
+        cached = await gist_cache.get_many(set(keys))
+        return keys, cached
+    
+    @staticmethod
+    def _cache_stats(hits: int, total: int) -> dict:
+        return {
+            "hits": hits,
+            "misses": total - hits,
+            "hit_rate": round(hits / total, 3) if total else 0.0
+        }
+    
+    async def gist_memory(self, document: str) -> dict:
+        """Summarize document with Gist Memory (pages summarized concurrently)"""
+        if not self.available:
+            raise CircuitOpenError("Cerebras circuit open")
+        
+        pages = self.split_pages(document)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        keys, cached = await self._lookup_gists(pages)
+        hits = sum(1 for key in keys if key in cached)
+        
+        logger.info(
+            f"📄 Creating gists for {len(pages)} pages "
+            f"({hits} cached, concurrency {self.max_concurrency})..."
+        )
+        
+        # Páginas idênticas são resumidas uma única vez
+        pending: Dict[str, asyncio.Future] = {}
+        for page, key in zip(pages, keys):
+            if key not in cached and key not in pending:
+                pending[key] = asyncio.ensure_future(self._gist_page(page, key, semaphore))
+        
+        async def resolve(key: str) -> str:
+            if key in cached:
+                return cached[key]
+            return await asyncio.shield(pending[key])
+        
+        # gather preserva a ordem das páginas; falhas não derrubam o documento
+        results = await asyncio.gather(*(resolve(key) for key in keys), return_exceptions=True)
+        
+        gists = []
+        failed_pages = []
+        for i, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.error(f"❌ Failed to create gist {i+1}: {result!r}")
                 gists.append("Erro ao gerar resumo")
+                failed_pages.append(i + 1)
+            else:
+                gists.append(result)
+        
+        if pages and len(failed_pages) == len(pages):
+            raise CerebrasError("All pages failed")
+        
+        logger.info(f"✅ {len(pages) - len(failed_pages)}/{len(pages)} gists created")
         
         return {
             "total_pages": len(pages),
             "pages": pages,
-            "gists": gists
+            "gists": gists,
+            "failed_pages": failed_pages,
+            "cache": self._cache_stats(hits, len(pages))
         }
     
-    async def answer_question(self, context: str, question: str) -> str:
-        """Answer question about context"""
-        prompt = f"""Responda a pergunta baseado no contexto fornecido.
+    async def gist_memory_stream(self, document: str) -> AsyncIterator[dict]:
+        """Yield gists as they finish (out of order) so the UI can render progressively"""
+        pages = self.split_pages(document)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        keys, cached = await self._lookup_gists(pages)
+        hits = sum(1 for key in keys if key in cached)
+        
+        yield {"event": "start", "total_pages": len(pages), "cache": self._cache_stats(hits, len(pages))}
+        
+        # Páginas já resumidas saem imediatamente
+        for i, key in enumerate(keys):
+            if key in cached:
+                yield {"event": "gist", "page": i + 1, "gist": cached[key], "cached": True}
+        
+        pending: Dict[str, asyncio.Future] = {}
+        
+        async def run(index: int, page: str, key: str) -> dict:
+            if key not in pending:
+                pending[key] = asyncio.ensure_future(self._gist_page(page, key, semaphore))
+            try:
+                gist = await asyncio.shield(pending[key])
+                return {"event": "gist", "page": index + 1, "gist": gist}
+            except Exception as e:
+                logger.error(f"❌ Failed to create gist {index+1}: {e!r}")
+                return {"event": "gist", "page": index + 1, "gist": "Erro ao gerar resumo", "error": True}
+        
+        tasks = [
+            asyncio.create_task(run(i, page, key))
+            for i, (page, key) in enumerate(zip(pages, keys))
+            if key not in cached
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Cliente desconectou: não continuar gastando chamadas
+            for task in list(tasks) + list(pending.values()):
+                task.cancel()
+        
+        yield {"event": "done", "total_pages": len(pages)}
+    
+    @staticmethod
+    def _question_prompt(context: str, question: str) -> str:
+        return f"""Responda a pergunta baseado no contexto fornecido.
 
 Contexto:
 {context}
@@ -114,8 +662,17 @@ Pergunta:
 {question}
 
 Resposta:"""
-        
-        return await self.complete(prompt)
+    
+    async def answer_question(self, context: str, question: str) -> str:
+        """Answer question about context (only the most relevant chunks are sent)"""
+        context = await select_context(context, question, k=self.retrieval_k)
+        return await self.complete(self._question_prompt(context, question))
+    
+    async def answer_question_stream(self, context: str, question: str) -> AsyncIterator[str]:
+        """Answer question about context, yielding tokens as they are generated"""
+        context = await select_context(context, question, k=self.retrieval_k)
+        async for delta in self.complete_stream(self._question_prompt(context, question)):
+            yield delta
 
 
 # Global instance (will be initialized in main.py)
@@ -0,0 +1,375 @@
+"""
+Document analyzer for the simulated Gist Memory
+Tokeniza o documento uma vez e calcula contagens, seções, tópicos e frases-chave
+"""
+import re
+from array import array
+from collections import Counter
+from functools import cached_property
+from itertools import chain
+from re import Match
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from app.services.text import STOP_WORDS
+
+# Espaço em branco sem quebra de linha (equivale ao strip() de cada linha)
+_H = r'[^\S\n]'
+
+# Os cinco padrões de título numa única regex, aplicada ao documento inteiro
+# (re.MULTILINE) em vez de linha a linha. Cada alternativa casa a linha sem os
+# espaços das pontas, como `re.match(padrão, linha.strip())` fazia:
+#   - títulos em maiúsculas
+#   - numeração (1. Título)
+#   - numeração romana
+#   - títulos com dois pontos
+#   - markdown headers
+TITLE_RE = re.compile(
+    rf'^{_H}*(?:'
+    rf'[A-Z](?:[A-Z]|{_H}){{5,}}'
+    rf'|\d+\.{_H}+[A-Z].*'
+    rf'|[IVX]+\.{_H}+[A-Z].*'
+    rf'|[A-Z][^.!?\n]*:'
+    rf'|#{{1,6}}{_H}+.*'
+    rf')(?<=\S){_H}*$',
+    re.MULTILINE
+)
+
+# Frase = trecho entre [.!?]+ com algum caractere visível; a partida começa no
+# primeiro caractere visível, então vazios de re.split(r'[.!?]+') nem aparecem
+SENTENCE_RE = re.compile(r'[^.!?\s][^.!?]*')
+SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+PARAGRAPH_SEP = '\n\n'
+VISIBLE_RE = re.compile(r'\S')
+
+# Palavras com 4+ letras: mesmo resultado que WORD_RE filtrado por len(word) > 3
+TOPIC_WORD_RE = re.compile(r'\b[a-zA-ZÀ-ÿ]{4,}\b')
+
+INDICATOR_WORDS = (
+    'importante', 'fundamental', 'principal', 'essencial', 'resultado', 'conclusão', 'objetivo', 'método',
+    'processo', 'descoberta', 'evidência', 'análise', 'estudo', 'pesquisa', 'dados', 'informação'
+)
+
+MAX_SECTIONS = 10
+MAX_TOPICS = 8
+MIN_SECTION_WORDS = 20
+MIN_PARAGRAPH_WORDS = 50
+
+
+def _has_more_words(text: str, count: int) -> bool:
+    """len(text.split()) > count, without splitting the whole text"""
+    # count + 1 palavras precisam de pelo menos 2 * count + 1 caracteres
+    return len(text) > 2 * count and len(text.split(None, count)) > count
+
+
+class Section(NamedTuple):
+    text: str
+    start: int = -1  # posição no documento; -1 quando o texto foi remontado (blocos de palavras)
+    end: int = -1
+
+
+def _sentence_spans(text: str, offset: int = 0):
+    """(starts, ends) of the non-blank sentences of `text` as int64 arrays"""
+    flat = np.fromiter(chain.from_iterable(map(Match.span, SENTENCE_RE.finditer(text))), dtype=np.int64)
+    spans = flat.reshape(-1, 2) + offset
+    return spans[:, 0].copy(), spans[:, 1].copy()
+
+
+def split_sentences(text: str) -> List[str]:
+    """Non-empty stripped sentences, same as re.split(r'[.!?]+') + strip + filter"""
+    return [s.strip() for s in SENTENCE_SPLIT_RE.split(text) if s.strip()]
+
+
+def _codepoints(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+
+def _vectorizable(text: str, lowered: str, patterns) -> bool:
+    # Offsets do texto minúsculo só batem com os do original se lower() não mudar
+    # o tamanho; o sigma final é a única regra de lower() que depende do contexto;
+    # padrões com espaço nas pontas dependem do strip() de cada frase
+    return (
+        len(lowered) == len(text)
+        and 'Σ' not in text
+        and all(pattern == pattern.strip() for pattern in patterns)
+    )
+
+
+def score_sentences(text: str, starts: np.ndarray, ends: np.ndarray, patterns: List[str]) -> np.ndarray:
+    """
+    How many of `patterns` occur (as substrings) in each sentence text[start:end], lowercased.
+
+    Mesmo resultado que `sum(1 for p in patterns if p in sentence.lower())` por
+    frase, mas com uma varredura vetorizada por padrão sobre o texto inteiro em
+    vez de uma busca por frase. Padrões repetidos contam mais de uma vez.
+    """
+    scores = np.zeros(len(starts), dtype=np.int64)
+    if not len(starts) or not patterns:
+        return scores
+
+    lowered = text.lower()
+    if not _vectorizable(text, lowered, patterns):
+        for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            sentence_lower = text[start:end].strip().lower()
+            scores[i] = sum(1 for pattern in patterns if pattern in sentence_lower)
+        return scores
+
+    chars = _codepoints(lowered)
+    for pattern, weight in Counter(patterns).items():
+        if not pattern:
+            scores += weight  # '' está contido em qualquer frase
+            continue
+
+        # Posições onde o padrão começa: filtra candidatos caractere a caractere
+        codes = _codepoints(pattern)
+        size = len(codes)
+        if size > len(chars):
+            continue
+        positions = np.flatnonzero(chars[:len(chars) - size + 1] == codes[0])
+        for k in range(1, size):
+            positions = positions[chars[positions + k] == codes[k]]
+        if not len(positions):
+            continue
+
+        # Ocorrência conta para a frase que a contém inteira
+        sentence = np.searchsorted(starts, positions, side='right') - 1
+        inside = (sentence >= 0) & (positions + size <= ends[np.maximum(sentence, 0)])
+        hit = np.zeros(len(starts), dtype=bool)
+        hit[sentence[inside]] = True
+        scores += weight * hit
+    return scores
+
+
+def summarize(section_num: int, text: str, starts: np.ndarray, ends: np.ndarray, word_count: int,
+              topics: list) -> str:
+    """Summary line for one section, given its non-blank sentence spans in `text`"""
+    def sentence(i):
+        return text[starts[i]:ends[i]].strip()
+
+    # Frases-chave: tópicos principais + palavras indicativas
+    patterns = [topic.lower() for topic in topics] + list(INDICATOR_WORDS)
+    scores = score_sentences(text, starts, ends, patterns)
+    key = np.flatnonzero(scores > 0)
+    # Ordenar por relevância (estável: empates mantêm a ordem do texto)
+    key = key[np.argsort(-scores[key], kind='stable')]
+
+    if len(key):
+        summary = f"Seção {section_num}: {sentence(key[0])[:150]}..."
+        if len(key) > 1:
+            summary += f" Também aborda: {sentence(key[1])[:100]}..."
+    elif len(starts):
+        # Fallback: usar primeiras frases
+        summary = f"Seção {section_num}: {sentence(0)[:150]}..."
+        if len(starts) > 1:
+            summary += f" {sentence(1)[:100]}..."
+    else:
+        summary = f"Seção {section_num}: Contém {word_count} palavras sobre os temas do documento."
+
+    summary += f" ({word_count} palavras, {len(starts)} frases)"
+    return summary
+
+
+def summarize_text(section: str, section_num: int, topics: list) -> str:
+    """Summary for a standalone section text"""
+    starts, ends = _sentence_spans(section)
+    return summarize(section_num, section, starts, ends, len(section.split()), topics)
+
+
+def top_topics(words: List[str]) -> list:
+    """
+    Top 10 words and top 5 bigrams (frequency > 1) among non stop words, max 8 topics.
+
+    Palavras viram ids inteiros na ordem da primeira ocorrência, então a
+    contagem é um np.bincount e o desempate por ordem de aparição (como no
+    Counter.most_common) é só uma ordenação estável.
+    """
+    vocabulary = list(dict.fromkeys(words))
+    ids_of = {word: i for i, word in enumerate(vocabulary)}
+    ids = np.fromiter(map(ids_of.__getitem__, words), dtype=np.int64, count=len(words))
+    stop = np.fromiter((word in STOP_WORDS for word in vocabulary), dtype=bool, count=len(vocabulary))
+    ids = ids[~stop[ids]]
+
+    word_freq = np.bincount(ids, minlength=len(vocabulary))
+    ranked = np.argsort(-word_freq, kind='stable')[:10]
+    top_words = [vocabulary[i] for i in ranked.tolist() if word_freq[i] > 1]
+
+    top_bigrams = []
+    if len(ids) > 1:
+        bigrams = ids[:-1] * len(vocabulary) + ids[1:]
+        codes, first, counts = np.unique(bigrams, return_index=True, return_counts=True)
+        # Ordem do Counter: frequência, depois primeira ocorrência
+        ranked = np.lexsort((first, -counts))[:5]
+        top_bigrams = [
+            f"{vocabulary[code // len(vocabulary)]} {vocabulary[code % len(vocabulary)]}"
+            for code, count in zip(codes[ranked].tolist(), counts[ranked].tolist()) if count > 1
+        ]
+
+    return (top_words + top_bigrams)[:MAX_TOPICS]
+
+
+class DocumentAnalyzer:
+    """
+    Análise de um documento com uma única tokenização.
+
+    Os tokens e os offsets de frases e parágrafos são calculados uma vez (sob
+    demanda) e reaproveitados por contagens, seções, tópicos e resumos. Seções
+    são intervalos do documento: as frases de cada uma saem dos offsets já
+    calculados (searchsorted), sem dividir o texto de novo.
+    """
+
+    def __init__(self, content: str):
+        self.content = content
+
+    # --- tokenização (uma vez) ---
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        return self.content.split()
+
+    @property
+    def word_count(self) -> int:
+        return len(self.tokens)
+
+    @cached_property
+    def _sentence_spans(self):
+        return _sentence_spans(self.content)
+
+    @property
+    def sentence_count(self) -> int:
+        return len(self._sentence_spans[0])
+
+    @cached_property
+    def _paragraph_spans(self):
+        """(start, end) of the non-blank pieces of content.split('\\n\\n')"""
+        content = self.content
+        starts, ends = array('q'), array('q')
+        start = 0
+        while True:
+            end = content.find(PARAGRAPH_SEP, start)
+            stop = len(content) if end < 0 else end
+            if VISIBLE_RE.search(content, start, stop):
+                starts.append(start)
+                ends.append(stop)
+            if end < 0:
+                return starts, ends
+            start = end + len(PARAGRAPH_SEP)
+
+    @property
+    def paragraph_count(self) -> int:
+        return len(self._paragraph_spans[0])
+
+    @cached_property
+    def topic_words(self) -> List[str]:
+        """Lowercased words with 4+ letters, in order (stop words included)"""
+        return TOPIC_WORD_RE.findall(self.content.lower())
+
+    # --- seções ---
+
+    def _span(self, start: int, end: int) -> Section:
+        text = self.content[start:end]
+        stripped = text.strip()
+        if not stripped:
+            return Section(stripped, start, start)
+        offset = start + text.index(stripped[0])
+        return Section(stripped, offset, offset + len(stripped))
+
+    def _titled_sections(self) -> List[Section]:
+        # Cada título (exceto na primeira linha) fecha a seção anterior; o '\n'
+        # antes do título não faz parte dela
+        sections = []
+        start = 0
+        for end in self._title_bounds():
+            section = self._span(start, end)
+            if _has_more_words(section.text, MIN_SECTION_WORDS):
+                sections.append(section)
+                if len(sections) >= MAX_SECTIONS:
+                    break
+            start = end + 1
+        return sections
+
+    def _title_bounds(self):
+        for match in TITLE_RE.finditer(self.content):
+            if match.start() > 0:
+                yield match.start() - 1
+        yield len(self.content)
+
+    def _paragraph_sections(self) -> List[Section]:
+        sections = []
+        for start, end in zip(*self._paragraph_spans):
+            if end - start <= 2 * MIN_PARAGRAPH_WORDS:
+                continue  # curto demais para ter MIN_PARAGRAPH_WORDS + 1 palavras
+            section = self._span(start, end)
+            if _has_more_words(section.text, MIN_PARAGRAPH_WORDS):
+                sections.append(section)
+                if len(sections) >= MAX_SECTIONS:
+                    break
+        return sections
+
+    def _chunk_sections(self) -> List[Section]:
+        words = self.tokens
+        chunk_size = max(200, len(words) // 5)  # Máximo 5 seções
+        return [Section(' '.join(words[i:i + chunk_size])) for i in range(0, len(words), chunk_size)]
+
+    @cached_property
+    def sections(self) -> List[Section]:
+        """Logical sections: titles, then large paragraphs, then fixed word blocks"""
+        sections = self._titled_sections()
+        if len(sections) <= 1:
+            sections = self._paragraph_sections()
+        if len(sections) <= 1:
+            sections = self._chunk_sections()
+        return sections[:MAX_SECTIONS]
+
+    def section_spans(self, section: Section):
+        """(starts, ends) of the section's non-blank sentences, relative to section.text"""
+        if section.start < 0:
+            return _sentence_spans(section.text)
+
+        # Frases do documento que cruzam o intervalo da seção, recortadas nas pontas
+        starts, ends = self._sentence_spans
+        first = np.searchsorted(ends, section.start, side='right')
+        last = np.searchsorted(starts, section.end, side='left')
+        starts = np.maximum(starts[first:last], section.start) - section.start
+        ends = np.minimum(ends[first:last], section.end) - section.start
+
+        # Só a primeira e a última podem ter ficado em branco no recorte
+        keep = np.ones(len(starts), dtype=bool)
+        for i in {0, len(starts) - 1} if len(starts) else ():
+            keep[i] = not section.text[starts[i]:ends[i]].isspace()
+        return starts[keep], ends[keep]
+
+    def section_sentences(self, section: Section) -> List[str]:
+        starts, ends = self.section_spans(section)
+        return [section.text[start:end].strip() for start, end in zip(starts.tolist(), ends.tolist())]
+
+    # --- tópicos e resumos ---
+
+    @cached_property
+    def topics(self) -> list:
+        """Top words and bigrams by frequency (max 8)"""
+        return top_topics(self.topic_words)
+
+    def summarize_section(self, section: Section, section_num: int, topics: Optional[list] = None) -> str:
+        starts, ends = self.section_spans(section)
+        return summarize(
+            section_num,
+            section.text,
+            starts,
+            ends,
+            len(section.text.split()),
+            self.topics if topics is None else topics
+        )
+
+    def gist_memory(self) -> dict:
+        """Gists, topics and document statistics"""
+        sections = self.sections
+        gists = [self.summarize_section(section, i + 1) for i, section in enumerate(sections)]
+        return {
+            "total_pages": max(1, len(sections)),
+            "gists": gists,
+            "topics": self.topics,
+            "word_count": self.word_count,
+            "sentence_count": self.sentence_count,
+            "paragraph_count": self.paragraph_count,
+        }
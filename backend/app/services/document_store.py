@@ -0,0 +1,142 @@
+"""
+Document store for uploaded PDFs
+Metadados no banco (SQLAlchemy) e blobs (PDF + texto extraído) em disco, por SHA-256
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Document
+
+logger = logging.getLogger(__name__)
+
+
+def _blob_path(document_id: str, extension: str) -> Path:
+    # Subdiretório pelos 2 primeiros hex: evita um diretório com milhares de arquivos
+    return Path(settings.DOCUMENT_STORE_DIR) / document_id[:2] / f"{document_id}{extension}"
+
+
+def _is_document_id(document_id: str) -> bool:
+    return len(document_id) == 64 and all(c in "0123456789abcdef" for c in document_id)
+
+
+def _to_dict(document: Document) -> dict:
+    return {
+        "id": document.id,
+        "filename": document.filename,
+        "content_type": document.content_type,
+        "size": document.size,
+        "pages": document.pages,
+        "words": document.words,
+        "page_offsets": document.page_offsets,
+        "created_at": document.created_at.isoformat(),
+    }
+
+
+def _write_atomic(path: Path, data: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, "w", encoding="utf-8") as out:
+        out.write(data)
+    os.replace(temp_path, path)
+
+
+# --- operações síncronas (rodam em thread, fora do event loop) ---
+
+def _get(document_id: str) -> Optional[dict]:
+    with SessionLocal() as session:
+        document = session.get(Document, document_id)
+        return _to_dict(document) if document else None
+
+
+def _save(upload_path: str, document_id: str, filename: str, content_type: str, size: int, text: str,
+          pages: int, page_offsets: list) -> dict:
+    pdf_path = _blob_path(document_id, ".pdf")
+    pdf_path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(upload_path, pdf_path)
+    _write_atomic(_blob_path(document_id, ".txt"), text)
+
+    document = Document(
+        id=document_id,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        pages=pages,
+        words=len(text.split()),
+        page_offsets=[list(offset) for offset in page_offsets],
+        analysis={},
+    )
+    with SessionLocal() as session:
+        session.add(document)
+        try:
+            session.commit()
+        except IntegrityError:
+            # Mesmo arquivo enviado em paralelo: o outro upload já registrou
+            session.rollback()
+            document = session.get(Document, document_id)
+        return _to_dict(document)
+
+
+def _load_text(document_id: str) -> Optional[str]:
+    try:
+        return _blob_path(document_id, ".txt").read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def _get_analysis(document_id: str, key: str) -> Any:
+    with SessionLocal() as session:
+        document = session.get(Document, document_id)
+        return document.analysis.get(key) if document else None
+
+
+def _set_analysis(document_id: str, key: str, value: Any):
+    with SessionLocal() as session:
+        document = session.get(Document, document_id)
+        if document is None:
+            return
+        # JSON não rastreia mutações in-place: atribuir um novo dict
+        document.analysis = {**document.analysis, key: value}
+        session.commit()
+
+
+# --- API assíncrona ---
+
+async def get_document(document_id: str) -> Optional[dict]:
+    """Document metadata, or None if unknown"""
+    if not _is_document_id(document_id):
+        return None
+    return await asyncio.to_thread(_get, document_id)
+
+
+async def save_document(upload_path: str, document_id: str, filename: str, content_type: str, size: int,
+                        text: str, pages: int, page_offsets: list) -> dict:
+    """Move the uploaded file into the blob dir, store the text and register the document"""
+    document = await asyncio.to_thread(
+        _save, upload_path, document_id, filename, content_type, size, text, pages, page_offsets
+    )
+    logger.info(f"✅ Document stored: {document_id[:12]} ({pages} pages)")
+    return document
+
+
+async def load_text(document_id: str) -> Optional[str]:
+    """Extracted text of a stored document, or None if unknown"""
+    if not _is_document_id(document_id):
+        return None
+    return await asyncio.to_thread(_load_text, document_id)
+
+
+async def get_analysis(document_id: str, key: str) -> Any:
+    return await asyncio.to_thread(_get_analysis, document_id, key)
+
+
+async def set_analysis(document_id: str, key: str, value: Any):
+    await asyncio.to_thread(_set_analysis, document_id, key, value)
@@ -0,0 +1,454 @@
+"""
+Feed store for ingested RSS
+Feeds assinados e itens deduplicados por (feed, guid), indexados por feed, data e guid
+"""
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal
+from app.models import Feed, FeedItem
+
+logger = logging.getLogger(__name__)
+
+# Feeds assinados na inicialização (também listados em /rss/popular-feeds)
+POPULAR_FEEDS = [
+    {
+        "name": "G1 - Tecnologia",
+        "url": "https://g1.globo.com/rss/g1/tecnologia/",
+        "category": "Tecnologia",
+        "description": "Últimas notícias de tecnologia do G1",
+        "language": "pt-br"
+    },
+    {
+        "name": "TechCrunch",
+        "url": "https://techcrunch.com/feed/",
+        "category": "Tecnologia",
+        "description": "Latest technology news from TechCrunch",
+        "language": "en"
+    },
+    {
+        "name": "Folha - Tec",
+        "url": "https://feeds.folha.uol.com.br/tec/rss091.xml",
+        "category": "Tecnologia",
+        "description": "Notícias de tecnologia da Folha de S.Paulo",
+        "language": "pt-br"
+    },
+    {
+        "name": "Hacker News",
+        "url": "https://hnrss.org/frontpage",
+        "category": "Tecnologia",
+        "description": "Top stories from Hacker News",
+        "language": "en"
+    },
+    {
+        "name": "BBC News - Technology",
+        "url": "http://feeds.bbci.co.uk/news/technology/rss.xml",
+        "category": "Tecnologia",
+        "description": "BBC Technology News",
+        "language": "en"
+    },
+    {
+        "name": "Exame - Tecnologia",
+        "url": "https://exame.com/rss/",
+        "category": "Negócios",
+        "description": "Notícias de negócios e tecnologia da Exame",
+        "language": "pt-br"
+    }
+]
+
+# IN (...) com muitos parâmetros estoura o limite do SQLite
+GUID_BATCH = 500
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _feed_to_dict(feed: Feed, item_count: Optional[int] = None) -> dict:
+    data = {
+        "id": feed.id,
+        "url": feed.url,
+        "title": feed.title,
+        "description": feed.description,
+        "link": feed.link,
+        "language": feed.language,
+        "updated": feed.updated,
+        "poll_interval": feed.poll_interval,
+        "next_poll_at": _isoformat(feed.next_poll_at),
+        "last_polled_at": _isoformat(feed.last_polled_at),
+        "parsed_at": feed.parsed_at,
+        "last_error": feed.last_error,
+        "failures": feed.failures,
+        "ephemeral": feed.ephemeral,
+    }
+    if item_count is not None:
+        data["item_count"] = item_count
+    return data
+
+
+def _item_to_dict(item: FeedItem) -> dict:
+    return {
+        "id": item.guid,
+        "feed_id": item.feed_id,
+        "title": item.title,
+        "description": item.summary,
+        "content": item.content,
+        "link": item.link,
+        "published": item.published,
+        "author": item.author,
+        "image": item.image,
+        "tags": item.tags,
+    }
+
+
+def item_guid(entry: dict) -> str:
+    """Stable identity of an entry: its id, its link, or a hash of its text"""
+    guid = entry["id"] or entry["link"]
+    if not guid:
+        text = f"{entry['title'] or ''}\x00{entry['summary']}"
+        guid = "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return guid[:1024]
+
+
+def _published_at(entry: dict, default: datetime) -> datetime:
+    published = entry["published"] or entry["updated"]
+    return datetime.fromisoformat(published) if published else default
+
+
+# --- operações síncronas (rodam em thread, fora do event loop) ---
+
+def _subscribe(url: str, poll_interval: float, ephemeral: bool) -> Tuple[dict, bool]:
+    now = datetime.utcnow()
+    with SessionLocal() as session:
+        feed = session.scalar(select(Feed).where(Feed.url == url))
+        if feed is None:
+            feed = Feed(url=url, poll_interval=poll_interval, next_poll_at=now,
+                        ephemeral=ephemeral, last_used_at=now)
+            session.add(feed)
+            try:
+                session.commit()
+                return _feed_to_dict(feed), True
+            except IntegrityError:
+                # Mesma URL assinada em paralelo
+                session.rollback()
+                feed = session.scalar(select(Feed).where(Feed.url == url))
+        # Uso renova a validade; assinatura durável torna permanente um feed avulso
+        feed.last_used_at = now
+        if not ephemeral:
+            feed.ephemeral = False
+        session.commit()
+        return _feed_to_dict(feed), False
+
+
+def _get_feed(feed_id: int) -> Optional[dict]:
+    with SessionLocal() as session:
+        feed = session.get(Feed, feed_id)
+        return _feed_to_dict(feed) if feed else None
+
+
+def _get_feed_by_url(url: str) -> Optional[dict]:
+    with SessionLocal() as session:
+        feed = session.scalar(select(Feed).where(Feed.url == url))
+        return _feed_to_dict(feed) if feed else None
+
+
+def _feed_ids_by_url(urls: List[str]) -> Dict[str, int]:
+    with SessionLocal() as session:
+        return dict(session.execute(select(Feed.url, Feed.id).where(Feed.url.in_(urls))).all())
+
+
+def _list_feeds() -> List[dict]:
+    with SessionLocal() as session:
+        counts = dict(session.execute(
+            select(FeedItem.feed_id, func.count()).group_by(FeedItem.feed_id)
+        ).all())
+        feeds = session.scalars(select(Feed).order_by(Feed.id)).all()
+        return [_feed_to_dict(feed, counts.get(feed.id, 0)) for feed in feeds]
+
+
+def _delete_feed(feed_id: int) -> bool:
+    with SessionLocal() as session:
+        feed = session.get(Feed, feed_id)
+        if feed is None:
+            return False
+        # Sem depender de ON DELETE CASCADE (SQLite não aplica por padrão)
+        session.query(FeedItem).filter(FeedItem.feed_id == feed_id).delete(synchronize_session=False)
+        session.delete(feed)
+        session.commit()
+        return True
+
+
+def _count_ephemeral() -> int:
+    with SessionLocal() as session:
+        return session.scalar(select(func.count()).select_from(Feed).where(Feed.ephemeral.is_(True)))
+
+
+def _touch(feed_ids: List[int]):
+    with SessionLocal() as session:
+        session.query(Feed).filter(Feed.id.in_(feed_ids)).update(
+            {Feed.last_used_at: datetime.utcnow()}, synchronize_session=False
+        )
+        session.commit()
+
+
+def _expire(cutoff: datetime) -> int:
+    with SessionLocal() as session:
+        stale = list(session.scalars(
+            select(Feed.id).where(Feed.ephemeral.is_(True), Feed.last_used_at < cutoff)
+        ))
+        if not stale:
+            return 0
+        session.query(FeedItem).filter(FeedItem.feed_id.in_(stale)).delete(synchronize_session=False)
+        session.query(Feed).filter(Feed.id.in_(stale)).delete(synchronize_session=False)
+        session.commit()
+        return len(stale)
+
+
+def _due_feeds(now: datetime, limit: int) -> List[dict]:
+    with SessionLocal() as session:
+        feeds = session.scalars(
+            select(Feed).where(Feed.next_poll_at <= now).order_by(Feed.next_poll_at).limit(limit)
+        ).all()
+        return [_feed_to_dict(feed) for feed in feeds]
+
+
+def _upsert_items(session, feed_id: int, entries: Dict[str, dict], now: datetime) -> List[datetime]:
+    guids = list(entries)
+    existing: Dict[str, FeedItem] = {}
+    for start in range(0, len(guids), GUID_BATCH):
+        batch = guids[start:start + GUID_BATCH]
+        for item in session.scalars(
+            select(FeedItem).where(FeedItem.feed_id == feed_id, FeedItem.guid.in_(batch))
+        ):
+            existing[item.guid] = item
+
+    new_items: List[datetime] = []
+    for guid, entry in entries.items():
+        values = {
+            "title": entry["title"],
+            "summary": entry["summary"],
+            "content": entry["content"],
+            "link": entry["link"],
+            "author": entry["author"],
+            "image": entry["image"],
+            "tags": entry["tags"],
+            "published": entry["published"] or entry["updated"],
+        }
+        item = existing.get(guid)
+        if item is None:
+            published_at = _published_at(entry, now)
+            session.add(FeedItem(feed_id=feed_id, guid=guid, published_at=published_at, **values))
+            new_items.append(published_at)
+        else:
+            # Itens editados na origem: atualizar só o que mudou
+            for name, value in values.items():
+                if getattr(item, name) != value:
+                    setattr(item, name, value)
+    return new_items
+
+
+def _store_parse(feed_id: int, parsed: dict) -> List[datetime]:
+    """Upsert the entries of a parse; returns published_at of the new items"""
+    now = datetime.utcnow()
+    # Último valor de cada guid (feeds às vezes repetem itens)
+    entries: Dict[str, dict] = {}
+    for entry in parsed["entries"]:
+        entries[item_guid(entry)] = entry
+
+    with SessionLocal() as session:
+        for attempt in range(2):
+            feed = session.get(Feed, feed_id)
+            if feed is None:
+                return []
+            info = parsed["feed"]
+            feed.title = info["title"]
+            feed.description = info["description"]
+            feed.link = info["link"]
+            feed.language = info["language"]
+            feed.updated = info["updated"]
+            feed.parsed_at = parsed["fetched_at"]
+
+            new_items = _upsert_items(session, feed_id, entries, now)
+            try:
+                session.commit()
+                return new_items
+            except IntegrityError:
+                # Mesmo parse gravado em paralelo (outro worker): refazer vendo os itens dele
+                session.rollback()
+                if attempt:
+                    raise
+
+
+def _schedule(feed_id: int, poll_interval: float, delay: float, error: Optional[str]):
+    now = datetime.utcnow()
+    with SessionLocal() as session:
+        feed = session.get(Feed, feed_id)
+        if feed is None:
+            return
+        feed.poll_interval = poll_interval
+        feed.last_polled_at = now
+        feed.next_poll_at = now + timedelta(seconds=delay)
+        feed.last_error = error
+        feed.failures = feed.failures + 1 if error else 0
+        session.commit()
+
+
+def encode_cursor(published_at: datetime, item_id: int) -> str:
+    return f"{published_at.isoformat()}_{item_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on malformed cursors"""
+    published_at, _, item_id = cursor.rpartition("_")
+    return datetime.fromisoformat(published_at), int(item_id)
+
+
+def _items(feed_id: Optional[int], limit: Optional[int],
+           cursor: Optional[Tuple[datetime, int]]) -> Tuple[List[dict], Optional[str]]:
+    with SessionLocal() as session:
+        query = select(FeedItem)
+        if feed_id is not None:
+            query = query.where(FeedItem.feed_id == feed_id)
+        if cursor is not None:
+            # Paginação por chave (published_at, id): estável mesmo com itens chegando
+            published_at, item_id = cursor
+            query = query.where(
+                (FeedItem.published_at < published_at)
+                | ((FeedItem.published_at == published_at) & (FeedItem.id < item_id))
+            )
+        query = query.order_by(FeedItem.published_at.desc(), FeedItem.id.desc())
+        if limit is not None:
+            query = query.limit(limit + 1)
+        rows = session.scalars(query).all()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            next_cursor = encode_cursor(rows[limit - 1].published_at, rows[limit - 1].id)
+        return [_item_to_dict(item) for item in rows[:limit]], next_cursor
+
+
+INDEX_COLUMNS = (FeedItem.id, FeedItem.feed_id, FeedItem.title, FeedItem.summary, FeedItem.published_at,
+                 FeedItem.updated_at)
+
+
+def items_after(after_id: int, limit: int) -> List[tuple]:
+    """(id, feed_id, title, summary, published_at, updated_at) of items with id > after_id, by id (sync)"""
+    with SessionLocal() as session:
+        return [tuple(row) for row in session.execute(
+            select(*INDEX_COLUMNS).where(FeedItem.id > after_id).order_by(FeedItem.id).limit(limit)
+        )]
+
+
+def items_updated_after(updated_at: datetime, after_id: int, max_id: int, limit: int) -> List[tuple]:
+    """
+    Same columns as items_after for items with id <= max_id changed after
+    (updated_at, after_id), in that order (sync, for reindexing)
+    """
+    with SessionLocal() as session:
+        return [tuple(row) for row in session.execute(
+            select(*INDEX_COLUMNS).where(
+                FeedItem.id <= max_id,
+                (FeedItem.updated_at > updated_at)
+                | ((FeedItem.updated_at == updated_at) & (FeedItem.id > after_id)),
+            ).order_by(FeedItem.updated_at, FeedItem.id).limit(limit)
+        )]
+
+
+def feed_ids() -> set:
+    """Ids of the subscribed feeds (sync, for indexing)"""
+    with SessionLocal() as session:
+        return set(session.scalars(select(Feed.id)))
+
+
+def _items_by_ids(item_ids: List[int]) -> Dict[int, dict]:
+    with SessionLocal() as session:
+        rows = session.execute(
+            select(FeedItem, Feed.title, Feed.url).join(Feed, Feed.id == FeedItem.feed_id)
+            .where(FeedItem.id.in_(item_ids))
+        )
+        return {
+            item.id: {**_item_to_dict(item), "source": title, "source_url": url}
+            for item, title, url in rows
+        }
+
+
+# --- API assíncrona ---
+
+async def subscribe_feed(url: str, poll_interval: float, ephemeral: bool = False) -> Tuple[dict, bool]:
+    """
+    Subscribe to a feed (idempotent): (feed, whether this call created it). New
+    feeds are due immediately. Ephemeral feeds expire once unused; a durable
+    subscription makes a feed permanent.
+    """
+    return await asyncio.to_thread(_subscribe, url, poll_interval, ephemeral)
+
+
+async def get_feed(feed_id: int) -> Optional[dict]:
+    return await asyncio.to_thread(_get_feed, feed_id)
+
+
+async def get_feed_by_url(url: str) -> Optional[dict]:
+    return await asyncio.to_thread(_get_feed_by_url, url)
+
+
+async def list_feeds() -> List[dict]:
+    """Subscribed feeds with their item counts"""
+    return await asyncio.to_thread(_list_feeds)
+
+
+async def delete_feed(feed_id: int) -> bool:
+    """Unsubscribe a feed and drop its items"""
+    return await asyncio.to_thread(_delete_feed, feed_id)
+
+
+async def count_ephemeral_feeds() -> int:
+    return await asyncio.to_thread(_count_ephemeral)
+
+
+async def touch_feeds(feed_ids: List[int]):
+    """Mark feeds as used now (keeps ephemeral feeds alive)"""
+    if feed_ids:
+        await asyncio.to_thread(_touch, feed_ids)
+
+
+async def expire_feeds(unused_for: float) -> int:
+    """Delete ephemeral feeds (and their items) unused for `unused_for` seconds; returns how many"""
+    return await asyncio.to_thread(_expire, datetime.utcnow() - timedelta(seconds=unused_for))
+
+
+async def due_feeds(limit: int) -> List[dict]:
+    """Feeds whose next poll time has passed, most overdue first"""
+    return await asyncio.to_thread(_due_feeds, datetime.utcnow(), limit)
+
+
+async def store_parse(feed_id: int, parsed: dict) -> List[datetime]:
+    """Upsert a parsed feed; returns the published time of each new item"""
+    return await asyncio.to_thread(_store_parse, feed_id, parsed)
+
+
+async def schedule_feed(feed_id: int, poll_interval: float, delay: float, error: Optional[str] = None):
+    """Record a poll and schedule the next one `delay` seconds from now"""
+    await asyncio.to_thread(_schedule, feed_id, poll_interval, delay, error)
+
+
+async def feed_items(feed_id: Optional[int] = None, limit: Optional[int] = 20,
+                     cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """(items newest first, cursor of the next page); all feeds when feed_id is None"""
+    position = decode_cursor(cursor) if cursor else None
+    return await asyncio.to_thread(_items, feed_id, limit, position)
+
+
+async def items_by_ids(item_ids: List[int]) -> Dict[int, dict]:
+    """Items (with their feed title and URL) keyed by database id"""
+    if not item_ids:
+        return {}
+    return await asyncio.to_thread(_items_by_ids, item_ids)
+
+
+async def feed_ids_by_url(urls: List[str]) -> Dict[str, int]:
+    return await asyncio.to_thread(_feed_ids_by_url, urls)
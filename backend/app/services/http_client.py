@@ -0,0 +1,361 @@
+"""
+Outbound HTTP
+Cliente httpx único da aplicação: pool com keep-alive (HTTP/2 quando disponível),
+limite de conexões por host, teto de tamanho das respostas, cache HTTP em disco
+opcional (Cache-Control) e latência por host
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (habilita HTTP/2 no httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Headers da resposta que não vão para o cache (dependem da conexão ou já foram aplicados)
+UNCACHED_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-encoding", "content-length"}
+
+
+class ResponseTooLarge(httpx.HTTPError):
+    """Response body exceeded the configured size cap"""
+
+
+class LatencyStats:
+    """Rolling latency samples (count, avg, p50, p95) in milliseconds"""
+
+    def __init__(self, size: int = 500):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds * 1000)
+        self.count += 1
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"count": self.count}
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "avg_ms": round(sum(ordered) / len(ordered), 1),
+            "p50_ms": round(ordered[len(ordered) // 2], 1),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        }
+
+
+def cache_directives(value: str) -> Dict[str, Optional[str]]:
+    """Parse a Cache-Control header into {directive: value or None}"""
+    directives = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def freshness_lifetime(headers: httpx.Headers) -> Optional[float]:
+    """
+    Seconds a response stays fresh (max-age, else Expires, minus Age);
+    None when it must not be stored at all (no-store).
+    """
+    directives = cache_directives(headers.get("cache-control", ""))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    lifetime = 0.0
+    try:
+        if directives.get("max-age") is not None:
+            lifetime = float(directives["max-age"])
+        elif headers.get("expires"):
+            date = parsedate_to_datetime(headers["date"]).timestamp() if headers.get("date") else time.time()
+            lifetime = parsedate_to_datetime(headers["expires"]).timestamp() - date
+        lifetime -= float(headers.get("age", 0))
+    except (TypeError, ValueError):
+        return 0.0
+    return max(lifetime, 0.0)
+
+
+class HTTPDiskCache:
+    """
+    Cache privado de respostas GET 200 em disco, um arquivo por URL
+    (metadados em JSON na primeira linha, corpo em seguida). Respostas frescas
+    saem do disco sem rede; vencidas com ETag/Last-Modified são revalidadas.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def _load(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._path(url), "rb") as f:
+                meta, _, body = f.read().partition(b"\n")
+        except FileNotFoundError:
+            return None
+        entry = json.loads(meta)
+        if entry.get("url") != url:
+            return None
+        entry["body"] = body
+        return entry
+
+    def _store(self, url: str, headers: list, body: bytes, expires_at: float):
+        path = self._path(url)
+        meta = {"url": url, "headers": headers, "expires_at": expires_at}
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(json.dumps(meta).encode("utf-8") + b"\n" + body)
+        os.replace(temp, path)
+
+    async def load(self, url: str) -> Optional[dict]:
+        try:
+            return await asyncio.to_thread(self._load, url)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  HTTP cache read failed for {url}: {e}")
+            return None
+
+    async def store(self, url: str, response: httpx.Response, body: bytes) -> bool:
+        """Store a GET 200 response if its headers allow it"""
+        lifetime = freshness_lifetime(response.headers)
+        if lifetime is None or response.headers.get("vary", "").strip() == "*":
+            return False
+        if not lifetime and not (response.headers.get("etag") or response.headers.get("last-modified")):
+            return False
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in UNCACHED_HEADERS]
+        try:
+            await asyncio.to_thread(self._store, url, headers, body, time.time() + lifetime)
+        except OSError as e:
+            logger.warning(f"⚠️  HTTP cache write failed for {url}: {e}")
+            return False
+        return True
+
+    async def refresh(self, url: str, entry: dict, not_modified: httpx.Response):
+        """Revalidated (304): merge the new headers and restart the freshness lifetime"""
+        headers = httpx.Headers(entry["headers"])
+        headers.update({k: v for k, v in not_modified.headers.items() if k.lower() not in UNCACHED_HEADERS})
+        lifetime = freshness_lifetime(headers) or 0.0
+        try:
+            await asyncio.to_thread(self._store, url, list(headers.items()), entry["body"], time.time() + lifetime)
+        except OSError as e:
+            logger.warning(f"⚠️  HTTP cache write failed for {url}: {e}")
+
+
+class HostStats:
+    def __init__(self):
+        self.counters = {"requests": 0, "errors": 0, "cache_hits": 0, "revalidated": 0, "bytes": 0}
+        self.latency = LatencyStats()
+
+    def summary(self) -> dict:
+        return {**self.counters, "latency": self.latency.summary()}
+
+
+class OutboundHTTP:
+    """
+    Todas as chamadas HTTP de saída (feeds RSS, Cerebras) passam por aqui:
+    um único AsyncClient reaproveita conexões e TLS entre requisições, um
+    semáforo por host limita conexões simultâneas (com limites próprios por
+    host, ex.: a API do Cerebras) e cada host acumula contadores e latência.
+
+    `request`/`get`/`post` leem a resposta inteira até `max_response_bytes`;
+    `stream` entrega a resposta sem ler o corpo (SSE do Cerebras).
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20, keepalive_expiry: float = 60.0,
+                 per_host: int = 10, timeout: float = 30.0, max_response_bytes: int = 10 * 1024 * 1024,
+                 cache_dir: str = ""):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_response_bytes = max_response_bytes
+        self.cache = HTTPDiskCache(cache_dir) if cache_dir else None
+        self.host_limits: Dict[str, int] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self.stats: Dict[str, HostStats] = {}
+
+    async def start(self):
+        """Create the shared client (called from app lifespan; also created on first use)"""
+        if self._client is None:
+            self._client = self._new_client()
+            logger.info(
+                f"✅ Outbound HTTP client started (HTTP/2: {HTTP2_AVAILABLE}, "
+                f"disk cache: {self.cache.directory if self.cache else 'off'})"
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        # Semáforos ficam presos ao event loop em que foram usados
+        self._hosts.clear()
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=self.limits, timeout=self.timeout)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._new_client()
+        return self._client
+
+    def set_host_limit(self, url: str, connections: int):
+        """Own concurrency limit for the host of `url` (e.g. an API we pay for)"""
+        host = self._host(url)
+        self.host_limits[host] = connections
+        self._hosts.pop(host, None)
+
+    def _host(self, url: str) -> str:
+        return httpx.URL(url).netloc.decode("ascii").lower()
+
+    def _limit(self, host: str) -> asyncio.Semaphore:
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.host_limits.get(host, self.per_host))
+        return self._hosts[host]
+
+    def _stats(self, host: str) -> HostStats:
+        if host not in self.stats:
+            self.stats[host] = HostStats()
+        return self.stats[host]
+
+    async def _read(self, response: httpx.Response, max_bytes: int) -> bytes:
+        length = response.headers.get("content-length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            raise ResponseTooLarge(f"Response from {response.url.host} is {length} bytes (limit {max_bytes})")
+        chunks, size = [], 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > max_bytes:
+                raise ResponseTooLarge(f"Response from {response.url.host} exceeded {max_bytes} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Streamed request under the host limit; latency is measured to the response headers"""
+        host = self._host(url)
+        stats = self._stats(host)
+        stats.counters["requests"] += 1
+        async with self._limit(host):
+            started = time.perf_counter()
+            try:
+                async with self.client.stream(method, url, **kwargs) as response:
+                    stats.latency.record(time.perf_counter() - started)
+                    yield response
+            except httpx.HTTPError:
+                stats.counters["errors"] += 1
+                raise
+
+    async def request(self, method: str, url: str, *, headers: Optional[dict] = None,
+                      max_bytes: Optional[int] = None, **kwargs) -> httpx.Response:
+        """Buffered request (body capped at `max_bytes`); GETs go through the disk cache when enabled"""
+        headers = dict(headers or {})
+        max_bytes = max_bytes or self.max_response_bytes
+        host = self._host(url)
+        stats = self._stats(host)
+
+        entry = None
+        conditional = any(name.lower() in ("if-none-match", "if-modified-since") for name in headers)
+        request_directives = cache_directives(headers.get("Cache-Control", ""))
+        if self.cache is not None and method == "GET" and "no-store" not in request_directives:
+            entry = await self.cache.load(url)
+            if entry is not None:
+                if entry["expires_at"] > time.time() and "no-cache" not in request_directives:
+                    stats.counters["cache_hits"] += 1
+                    return self._from_cache(method, url, entry, headers)
+                if not conditional:
+                    cached_headers = httpx.Headers(entry["headers"])
+                    if cached_headers.get("etag"):
+                        headers["If-None-Match"] = cached_headers["etag"]
+                    if cached_headers.get("last-modified"):
+                        headers["If-Modified-Since"] = cached_headers["last-modified"]
+
+        stats.counters["requests"] += 1
+        try:
+            async with self._limit(host):
+                started = time.perf_counter()
+                try:
+                    async with self.client.stream(method, url, headers=headers, **kwargs) as streamed:
+                        body = await self._read(streamed, max_bytes)
+                finally:
+                    stats.latency.record(time.perf_counter() - started)
+        except httpx.HTTPError:
+            stats.counters["errors"] += 1
+            raise
+        stats.counters["bytes"] += len(body)
+
+        # Corpo já decodificado: sem Content-Encoding para não decodificar de novo
+        response = httpx.Response(
+            streamed.status_code,
+            headers=[(k, v) for k, v in streamed.headers.multi_items() if k.lower() not in UNCACHED_HEADERS],
+            content=body,
+            request=streamed.request,
+            extensions=streamed.extensions,
+        )
+        if entry is not None and response.status_code == 304 and not conditional:
+            stats.counters["revalidated"] += 1
+            await self.cache.refresh(url, entry, response)
+            return self._from_cache(method, url, entry, {})
+        if self.cache is not None and method == "GET" and response.status_code == 200:
+            await self.cache.store(url, response, body)
+        return response
+
+    def _from_cache(self, method: str, url: str, entry: dict, headers: dict) -> httpx.Response:
+        cached_headers = httpx.Headers(entry["headers"])
+        request = httpx.Request(method, url, headers=headers)
+        etag, modified = cached_headers.get("etag"), cached_headers.get("last-modified")
+        # O chamador tem a mesma versão (GET condicional dele): responder 304 como o servidor faria
+        if (etag and headers.get("If-None-Match") == etag) or (
+                modified and headers.get("If-Modified-Since") == modified):
+            return httpx.Response(304, headers=cached_headers, request=request)
+        return httpx.Response(200, headers=cached_headers, content=entry["body"], request=request)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def metrics(self) -> dict:
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "disk_cache": self.cache is not None,
+            "hosts": {host: stats.summary() for host, stats in self.stats.items()},
+        }
+
+
+def _create_http() -> OutboundHTTP:
+    from app.config import settings
+
+    return OutboundHTTP(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive=settings.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        per_host=settings.HTTP_PER_HOST_CONNECTIONS,
+        timeout=settings.HTTP_TIMEOUT,
+        max_response_bytes=settings.HTTP_MAX_RESPONSE_BYTES,
+        cache_dir=settings.HTTP_CACHE_DIR,
+    )
+
+
+# Instância global
+http = _create_http()
@@ -0,0 +1,378 @@
+"""
+Background jobs
+Fila de jobs em estágios (KeyDB ou local), com concorrência limitada por estágio
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.cache import cache
+
+logger = logging.getLogger(__name__)
+
+JOB_TTL = 24 * 3600
+# Tempo máximo bloqueado esperando um job (abaixo do socket timeout do KeyDB)
+POP_TIMEOUT = 1
+# Job em processamento sem renovar o lease por esse tempo é dado como abandonado (worker morreu)
+LEASE_TTL = 60
+LEASE_REFRESH = LEASE_TTL / 3
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobError(Exception):
+    """Failure with a message that is safe to show in the job status"""
+
+
+class LocalJobBackend:
+    """Fila e registros em memória do processo (desenvolvimento, testes, KeyDB fora do ar)"""
+
+    name = "memory"
+    # Jobs em andamento se perdem com o processo
+    durable = False
+
+    def __init__(self, max_records: int = 10_000):
+        self.queues: Dict[str, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self.records: "OrderedDict[str, dict]" = OrderedDict()
+        self.payloads: Dict[str, dict] = {}
+        self.max_records = max_records
+
+    async def push(self, stage: str, job_id: str):
+        await self.queues[stage].put(job_id)
+
+    async def pop(self, stage: str) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self.queues[stage].get(), POP_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+
+    async def ack(self, stage: str, job_id: str):
+        pass
+
+    async def touch(self, job_id: str):
+        pass
+
+    async def recover(self, stage: str) -> int:
+        return 0
+
+    async def save(self, record: dict):
+        self.records[record["id"]] = record
+        self.records.move_to_end(record["id"])
+        # Registros mais antigos saem primeiro (equivalente ao TTL do KeyDB)
+        while len(self.records) > self.max_records:
+            job_id, _ = self.records.popitem(last=False)
+            self.payloads.pop(job_id, None)
+
+    async def load(self, job_id: str) -> Optional[dict]:
+        record = self.records.get(job_id)
+        return dict(record) if record is not None else None
+
+    async def save_payload(self, job_id: str, payload: dict):
+        self.payloads[job_id] = payload
+
+    async def load_payload(self, job_id: str) -> Optional[dict]:
+        return self.payloads.get(job_id)
+
+
+# Devolve o job ao fim da fila (próximo a sair) só se ainda estava em processamento
+REQUEUE_SCRIPT = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) > 0 then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+class RedisJobBackend:
+    """
+    Filas como listas no KeyDB e registros como chaves com TTL, para que
+    qualquer worker de qualquer nó processe os jobs. O pop move o job para a
+    lista de processamento do estágio (BLMOVE) e cria um lease renovado
+    enquanto ele roda; o ack tira o job de lá. Jobs sem lease (worker morto)
+    voltam para a fila em recover(), chamado na partida dos workers.
+    """
+
+    name = "redis"
+    durable = True
+
+    def _queue(self, stage: str) -> str:
+        return cache._k(f"jobs:queue:{stage}")
+
+    def _processing(self, stage: str) -> str:
+        return cache._k(f"jobs:processing:{stage}")
+
+    def _lease(self, job_id: str) -> str:
+        return cache._k(f"jobs:{job_id}:lease")
+
+    async def push(self, stage: str, job_id: str):
+        await cache.client.lpush(self._queue(stage), job_id)
+
+    async def pop(self, stage: str) -> Optional[str]:
+        item = await cache.client.blmove(
+            self._queue(stage), self._processing(stage), POP_TIMEOUT, src="RIGHT", dest="LEFT"
+        )
+        if item is None:
+            return None
+        job_id = item.decode() if isinstance(item, bytes) else item
+        await self.touch(job_id)
+        return job_id
+
+    async def ack(self, stage: str, job_id: str):
+        async with cache.client.pipeline(transaction=True) as pipe:
+            pipe.lrem(self._processing(stage), 1, job_id)
+            pipe.delete(self._lease(job_id))
+            await pipe.execute()
+
+    async def touch(self, job_id: str):
+        await cache.client.set(self._lease(job_id), 1, ex=LEASE_TTL)
+
+    async def recover(self, stage: str) -> int:
+        """Requeue jobs left in processing by workers that died (no lease, record idle)"""
+        requeued = 0
+        for item in await cache.client.lrange(self._processing(stage), 0, -1):
+            job_id = item.decode() if isinstance(item, bytes) else item
+            if await cache.client.exists(self._lease(job_id)):
+                continue
+            record = await self.load(job_id)
+            if record is None or record["stage"] != stage or record["status"] in (COMPLETED, FAILED):
+                # Expirado, ou já concluído / passado adiante antes do ack: só falta tirar da lista
+                await cache.client.lrem(self._processing(stage), 1, job_id)
+                continue
+            # Entre o BLMOVE e o lease há um instante sem lease: o registro recente indica job vivo
+            if time.time() - record.get("updated_at", 0) < LEASE_TTL:
+                continue
+            if await self.requeue(stage, job_id):
+                record.update(status=QUEUED, updated_at=time.time())
+                await self.save(record)
+                requeued += 1
+        return requeued
+
+    async def requeue(self, stage: str, job_id: str) -> bool:
+        """Move a job from processing back to the front of its queue (False if it was not there)"""
+        moved = await cache.client.eval(REQUEUE_SCRIPT, 2, self._processing(stage), self._queue(stage), job_id)
+        await cache.client.delete(self._lease(job_id))
+        return bool(moved)
+
+    async def save(self, record: dict):
+        if not await cache.set(f"jobs:{record['id']}", record, JOB_TTL):
+            raise JobError("Job store unavailable")
+
+    async def load(self, job_id: str) -> Optional[dict]:
+        return await cache.get(f"jobs:{job_id}")
+
+    async def save_payload(self, job_id: str, payload: dict):
+        if not await cache.set(f"jobs:{job_id}:payload", payload, JOB_TTL):
+            raise JobError("Job store unavailable")
+
+    async def load_payload(self, job_id: str) -> Optional[dict]:
+        return await cache.get(f"jobs:{job_id}:payload")
+
+
+class Job:
+    """Job being processed by a stage handler"""
+
+    def __init__(self, manager: "JobManager", record: dict, payload: dict):
+        self._manager = manager
+        self.record = record
+        self.payload = payload
+
+    @property
+    def id(self) -> str:
+        return self.record["id"]
+
+    async def progress(self, fraction: float, message: Optional[str] = None):
+        """Report progress of the current stage (0..1); overall progress spans all stages"""
+        stages = self.record["stages"]
+        position = stages.index(self.record["stage"])
+        self.record["progress"] = round((position + min(max(fraction, 0.0), 1.0)) / len(stages), 4)
+        if message:
+            self.record["message"] = message
+        await self._manager._save(self.record)
+
+    async def update_payload(self, **values):
+        """Data for the next stages (ex.: document_id after extraction)"""
+        self.payload.update(values)
+        await self._manager.backend.save_payload(self.id, self.payload)
+
+
+Handler = Callable[[Job], Awaitable[Any]]
+
+
+class JobManager:
+    """
+    Pipeline de estágios: cada estágio tem sua fila e `concurrency` workers
+    (corrotinas). Um job percorre a lista de estágios com que foi criado; o
+    resultado do último estágio vira o resultado do job.
+    """
+
+    def __init__(self, backend: Optional[str] = None):
+        self.backend_name = backend or os.getenv("JOB_BACKEND", "redis")
+        self.backend = LocalJobBackend()
+        self.handlers: Dict[str, Handler] = {}
+        self.concurrency: Dict[str, int] = {}
+        self._workers: List[asyncio.Task] = []
+        self._active: Dict[str, int] = defaultdict(int)
+
+    def stage(self, name: str, concurrency: int = 1):
+        """Register the handler of a stage"""
+        def decorator(handler: Handler) -> Handler:
+            self.handlers[name] = handler
+            self.concurrency[name] = max(1, concurrency)
+            return handler
+        return decorator
+
+    async def start(self):
+        """Pick the backend and start the stage workers (called from app lifespan)"""
+        if self._workers:
+            return
+
+        self.backend = LocalJobBackend()
+        if self.backend_name == "redis" and cache.available:
+            try:
+                await cache.client.ping()
+                self.backend = RedisJobBackend()
+            except Exception as e:
+                logger.warning(f"⚠️  KeyDB unavailable for jobs, using local queue: {e}")
+
+        for stage, concurrency in self.concurrency.items():
+            try:
+                requeued = await self.backend.recover(stage)
+                if requeued:
+                    logger.warning(f"⚠️  Requeued {requeued} abandoned jobs at stage {stage}")
+            except Exception as e:
+                logger.error(f"❌ Job recovery error ({stage}): {e}")
+            for _ in range(concurrency):
+                self._workers.append(asyncio.create_task(self._worker(stage)))
+        logger.info(f"✅ Job workers started ({self.backend.name}): {self.concurrency}")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _save(self, record: dict):
+        record["updated_at"] = time.time()
+        await self.backend.save(record)
+
+    async def submit(self, kind: str, stages: List[str], payload: dict) -> dict:
+        """Create a job and queue it at its first stage"""
+        unknown = [stage for stage in stages if stage not in self.handlers]
+        if unknown:
+            raise ValueError(f"Unknown job stages: {unknown}")
+
+        now = time.time()
+        record = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "stages": stages,
+            "stage": stages[0],
+            "progress": 0.0,
+            "message": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.backend.save_payload(record["id"], payload)
+        await self._save(record)
+        await self.backend.push(stages[0], record["id"])
+        return record
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.backend.load(job_id)
+
+    def metrics(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "concurrency": dict(self.concurrency),
+            "active": dict(self._active),
+        }
+
+    async def _worker(self, stage: str):
+        while True:
+            try:
+                job_id = await self.backend.pop(stage)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Job queue error ({stage}): {e}")
+                await asyncio.sleep(POP_TIMEOUT)
+                continue
+            if job_id is None:
+                continue
+
+            self._active[stage] += 1
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                await self._run(stage, job_id)
+                # Sem ack (erro do backend, worker morto) o job continua em processamento até recover()
+                await self.backend.ack(stage, job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Job {job_id} not acknowledged at {stage}: {e}")
+            finally:
+                heartbeat.cancel()
+                self._active[stage] -= 1
+
+    async def _heartbeat(self, job_id: str):
+        """Renew the job lease while its handler runs"""
+        while True:
+            await asyncio.sleep(LEASE_REFRESH)
+            try:
+                await self.backend.touch(job_id)
+            except Exception as e:
+                logger.warning(f"⚠️  Job {job_id} lease renewal failed: {e}")
+
+    async def _run(self, stage: str, job_id: str):
+        record = await self.backend.load(job_id)
+        payload = await self.backend.load_payload(job_id)
+        if record is None or payload is None:
+            logger.warning(f"⚠️  Job {job_id} expired before stage {stage}")
+            return
+
+        record.update(status=RUNNING, stage=stage)
+        job = Job(self, record, payload)
+        try:
+            await job.progress(0.0)
+            result = await self.handlers[stage](job)
+        except asyncio.CancelledError:
+            if self.backend.durable:
+                # Desligamento: o job volta para a fila e outro worker (ou este nó, ao voltar) continua
+                record.update(status=QUEUED, message="Interrupted, requeued")
+                await self._save(record)
+                await self.backend.requeue(stage, job_id)
+            else:
+                record.update(status=FAILED, error="Interrupted")
+                await self._save(record)
+            raise
+        except Exception as e:
+            logger.error(f"❌ Job {job_id} failed at {stage}: {e}")
+            record.update(status=FAILED, error=str(e) if isinstance(e, JobError) else f"{stage} failed")
+            await self._save(record)
+            return
+
+        stages = record["stages"]
+        position = stages.index(stage)
+        if position + 1 < len(stages):
+            record.update(status=QUEUED, stage=stages[position + 1], progress=(position + 1) / len(stages))
+            await self._save(record)
+            await self.backend.push(stages[position + 1], job_id)
+        else:
+            record.update(status=COMPLETED, progress=1.0, result=result)
+            await self._save(record)
+            logger.info(f"✅ Job {job_id} completed ({record['kind']})")
+
+
+# Instância global (estágios são registrados pelos módulos da API)
+jobs = JobManager()
@@ -0,0 +1,198 @@
+"""
+PDF upload and text extraction
+Upload gravado em disco em blocos e extração de páginas em paralelo num pool de processos
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Cada tarefa reabre o PDF no processo; intervalos pequenos demais só pagam esse custo
+MIN_PAGES_PER_TASK = 8
+
+_executor: Optional[ProcessPoolExecutor] = None
+_workers = 0
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class PDFLibraryMissing(Exception):
+    pass
+
+
+class SavedUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+class ExtractedPDF(NamedTuple):
+    text: str  # sem espaços nas pontas, com os marcadores '--- Página N ---'
+    num_pages: int
+    library: str
+    page_offsets: List[Tuple[int, int, int]]  # (página, início, fim) do texto de cada página
+
+
+def _write_chunk(out, digest, chunk: bytes):
+    out.write(chunk)
+    digest.update(chunk)
+
+
+async def save_upload(upload, max_bytes: int, suffix: str = "", directory: Optional[str] = None) -> SavedUpload:
+    """
+    Copy an UploadFile to a temp file in chunks, stopping as soon as it exceeds `max_bytes`.
+    Nada fica inteiro em memória; escrita e SHA-256 rodam fora do event loop.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLarge(upload.size)
+
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(size)
+                await asyncio.to_thread(_write_chunk, out, digest, chunk)
+    except BaseException:
+        await asyncio.to_thread(_remove, path)
+        raise
+    return SavedUpload(path, size, digest.hexdigest())
+
+
+def _remove(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def remove_file(path: str):
+    await asyncio.to_thread(_remove, path)
+
+
+# --- executadas nos processos do pool (funções de módulo para serem picklable) ---
+
+def _open_pdf(path: str):
+    """(library name, object with .pages) using PyPDF2, or pdfplumber if PyPDF2 is missing"""
+    try:
+        import PyPDF2
+        return "PyPDF2", PyPDF2.PdfReader(path)
+    except ImportError:
+        pass
+    try:
+        import pdfplumber
+        return "pdfplumber", pdfplumber.open(path)
+    except ImportError:
+        raise PDFLibraryMissing("PDF processing libraries not installed. Please install PyPDF2 or pdfplumber.")
+
+
+def _count_pages(path: str) -> Tuple[str, int]:
+    library, pdf = _open_pdf(path)
+    try:
+        return library, len(pdf.pages)
+    finally:
+        if hasattr(pdf, "close"):
+            pdf.close()
+
+
+def _extract_range(path: str, start: int, stop: int) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
+    """Text of pages [start, stop): ([(page_number, text)], [(page_number, error)])"""
+    _, pdf = _open_pdf(path)
+    pages, errors = [], []
+    try:
+        for page_num in range(start, stop):
+            try:
+                page_text = pdf.pages[page_num].extract_text()
+                if page_text:
+                    pages.append((page_num + 1, page_text))
+            except Exception as page_error:
+                errors.append((page_num + 1, str(page_error)))
+    finally:
+        if hasattr(pdf, "close"):
+            pdf.close()
+    return pages, errors
+
+
+# --- pool ---
+
+def get_executor() -> ProcessPoolExecutor:
+    """Process pool for PDF parsing, created on first use"""
+    global _executor, _workers
+    if _executor is None:
+        from app.config import settings
+
+        _workers = settings.PDF_EXTRACT_WORKERS or os.cpu_count() or 1
+        # spawn: fork a partir de um processo com threads (uvicorn, redis) pode travar
+        _executor = ProcessPoolExecutor(max_workers=_workers, mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"✅ PDF extraction pool started ({_workers} workers)")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def page_ranges(num_pages: int, workers: int) -> List[Tuple[int, int]]:
+    """Split [0, num_pages) into contiguous ranges, about one per worker"""
+    if num_pages <= 0:
+        return []
+    tasks = max(1, min(workers, num_pages // MIN_PAGES_PER_TASK))
+    size = math.ceil(num_pages / tasks)
+    return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
+
+async def extract_pdf_text(path: str) -> ExtractedPDF:
+    """Extract the text of every page in parallel across the pool"""
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+
+    library, num_pages = await loop.run_in_executor(executor, _count_pages, path)
+    results = await asyncio.gather(*(
+        loop.run_in_executor(executor, _extract_range, path, start, stop)
+        for start, stop in page_ranges(num_pages, _workers)
+    ))
+
+    parts, page_offsets, position = [], [], 0
+    for pages, errors in results:
+        for page_num, error in errors:
+            logger.warning(f"⚠️  Error extracting page {page_num}: {error}")
+        for page_num, page_text in pages:
+            marker = f"\n\n--- Página {page_num} ---\n\n"
+            parts.append(marker)
+            parts.append(page_text)
+            position += len(marker)
+            page_offsets.append((page_num, position, position + len(page_text)))
+            position += len(page_text)
+
+    # strip() do texto final: ajustar os offsets ao que sobrou
+    text = "".join(parts)
+    stripped = text.strip()
+    lead = len(text) - len(text.lstrip())
+    page_offsets = [
+        (page_num, max(0, start - lead), max(0, min(end - lead, len(stripped))))
+        for page_num, start, end in page_offsets
+    ]
+
+    logger.info(f"✅ PDF extracted with {library}: {num_pages} pages")
+    return ExtractedPDF(stripped, num_pages, library, page_offsets)
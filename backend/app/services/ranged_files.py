@@ -0,0 +1,217 @@
+"""
+Ranged file responses
+Arquivos servidos com Range (206 simples ou multipart/byteranges), ETag,
+If-None-Match e If-Range; corpo em blocos grandes, por zero-copy quando o
+servidor ASGI oferece a extensão http.response.zerocopy
+"""
+import asyncio
+import os
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from typing import BinaryIO, List, Optional, Tuple
+from urllib.parse import quote
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 1024 * 1024
+# Mais faixas que isso num pedido: servir o arquivo inteiro (RFC 9110 permite ignorar Range)
+MAX_RANGES = 16
+ZEROCOPY = "http.response.zerocopy"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Byte ranges of a Range header as sorted, merged (start, end) pairs with
+    `end` inclusive. None when the header must be ignored (not bytes, or
+    malformed); RangeNotSatisfiable when no range overlaps the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    parts = [part.strip() for part in spec.split(",") if part.strip()]
+    if not parts or len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        first, dash, last = part.partition("-")
+        if not dash:
+            return None
+        try:
+            if not first.strip():
+                # bytes=-N: os últimos N bytes
+                length = int(last)
+                if length < 0:
+                    return None
+                if length == 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last.strip() else max(size - 1, start)
+                if start < 0 or end < start:
+                    return None
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _open(path: str) -> Tuple[BinaryIO, os.stat_result]:
+    file = open(path, "rb")
+    try:
+        return file, os.fstat(file.fileno())
+    except BaseException:
+        file.close()
+        raise
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """Strong ETag from size and modification time (changes whenever the file does)"""
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match usa comparação fraca: W/"x" equivale a "x"
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def _if_range_matches(header: str, etag: str, stat_result: os.stat_result) -> bool:
+    header = header.strip()
+    if header.startswith(("\"", "W/")):
+        # Comparação forte: ETag fraco nunca vale para Range
+        return header == etag
+    try:
+        return int(parsedate_to_datetime(header).timestamp()) == int(stat_result.st_mtime)
+    except (TypeError, ValueError):
+        return False
+
+
+class RangeFileResponse(Response):
+    """
+    Envia o arquivo inteiro ou as faixas pedidas. Com a extensão zerocopy do
+    ASGI cada faixa vai num único envio (sendfile no servidor); sem ela, em
+    blocos de CHUNK_SIZE lidos com pread numa thread. Recebe o arquivo já
+    aberto (o mesmo do fstat que deu tamanho e ETag) e o fecha ao terminar.
+    """
+
+    def __init__(self, file: BinaryIO, size: int, ranges: Optional[List[Tuple[int, int]]],
+                 media_type: str, headers: dict):
+        self.file = file
+        self.ranges = ranges
+        self.boundary = secrets.token_hex(16)
+        self.parts = self._plan(size, ranges, media_type)
+        headers = dict(headers)
+        if ranges is None:
+            status_code = 200
+        elif len(ranges) == 1:
+            status_code = 206
+            headers["Content-Range"] = f"bytes {ranges[0][0]}-{ranges[0][1]}/{size}"
+        else:
+            status_code = 206
+            media_type = f"multipart/byteranges; boundary={self.boundary}"
+        headers["Content-Length"] = str(sum(len(prefix) + count for prefix, _, count in self.parts))
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+
+    def _plan(self, size: int, ranges: Optional[List[Tuple[int, int]]], media_type: str) -> list:
+        # (bytes antes da faixa, offset, tamanho); no multipart, o fechamento é um prefixo sem dados
+        if ranges is None:
+            return [(b"", 0, size)]
+        if len(ranges) == 1:
+            return [(b"", ranges[0][0], ranges[0][1] - ranges[0][0] + 1)]
+        parts = []
+        for i, (start, end) in enumerate(ranges):
+            prefix = (b"\r\n" if i else b"") + (
+                f"--{self.boundary}\r\n"
+                f"Content-Type: {media_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+            ).encode("latin-1")
+            parts.append((prefix, start, end - start + 1))
+        parts.append((f"\r\n--{self.boundary}--\r\n".encode("latin-1"), 0, 0))
+        return parts
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        zerocopy = ZEROCOPY in scope.get("extensions", {})
+        with self.file as file:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            for prefix, offset, count in self.parts:
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                if zerocopy and count:
+                    await send({"type": ZEROCOPY, "file": file, "offset": offset, "count": count, "more_body": True})
+                    continue
+                while count > 0:
+                    chunk = await asyncio.to_thread(os.pread, file.fileno(), min(CHUNK_SIZE, count), offset)
+                    if not chunk:  # arquivo encolheu durante o envio
+                        break
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                    offset += len(chunk)
+                    count -= len(chunk)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def file_response(request: Request, path: str, media_type: str, filename: Optional[str] = None,
+                        headers: Optional[dict] = None) -> Response:
+    """
+    Response for a file on disk honoring Range, If-Range and If-None-Match
+    (304 / 206 / 416 / 200). Raises FileNotFoundError if the file is missing.
+    """
+    # Abrir antes do stat: tamanho, ETag e bytes enviados vêm do mesmo arquivo,
+    # mesmo que o caminho seja trocado por outro no meio
+    file, stat_result = await asyncio.to_thread(_open, path)
+    try:
+        response = _file_response(request, file, stat_result, media_type, filename, headers)
+    except BaseException:
+        file.close()
+        raise
+    if not isinstance(response, RangeFileResponse):
+        file.close()
+    return response
+
+
+def _file_response(request: Request, file: BinaryIO, stat_result: os.stat_result, media_type: str,
+                   filename: Optional[str], headers: Optional[dict]) -> Response:
+    etag = file_etag(stat_result)
+    size = stat_result.st_size
+    headers = {
+        **(headers or {}),
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+    }
+    if filename is not None:
+        headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Disposition"})
+
+    ranges = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range de outra versão do arquivo: o cliente recebe o arquivo novo inteiro
+    if range_header and (if_range is None or _if_range_matches(if_range, etag, stat_result)):
+        try:
+            ranges = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    return RangeFileResponse(file, size, ranges, media_type, headers)
@@ -0,0 +1,156 @@
+"""
+Retrieval: chunk index (BM25) per document
+Seleciona só os trechos relevantes em vez de mandar o documento inteiro ao LLM
+"""
+import asyncio
+import hashlib
+import logging
+import math
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.cache import cache
+from app.services.text import search_terms
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato do índice: mudar o chunking/tokenização exige trocar a versão
+INDEX_VERSION = "v1"
+INDEX_CACHE_TTL = 24 * 3600
+
+# Índices serializados no KeyDB + LRU pequeno em memória (evita decodificar a cada pergunta)
+index_cache = cache.namespace("retrieval")
+_local_indexes: "OrderedDict[str, ChunkIndex]" = OrderedDict()
+LOCAL_INDEX_LIMIT = 32
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def split_chunks(text: str, chunk_words: int = 150, overlap: int = 30) -> List[str]:
+    """Split text into overlapping word windows"""
+    words = text.split()
+    if not words:
+        return []
+
+    step = max(1, chunk_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+class ChunkIndex:
+    """
+    Índice invertido BM25 sobre os chunks de um documento.
+    `postings[term]` = [(chunk_id, tf), ...], então uma consulta custa
+    proporcional às listas dos termos da pergunta, não ao documento.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, chunks: List[str], postings: Dict[str, List[Tuple[int, int]]], lengths: List[int]):
+        self.chunks = chunks
+        self.postings = postings
+        self.lengths = lengths
+        self.avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    @classmethod
+    def build(cls, text: str, chunk_words: int = 150, overlap: int = 30) -> "ChunkIndex":
+        chunks = split_chunks(text, chunk_words, overlap)
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for chunk_id, chunk in enumerate(chunks):
+            terms = search_terms(chunk)
+            lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append((chunk_id, tf))
+        return cls(chunks, postings, lengths)
+
+    def to_dict(self) -> dict:
+        return {"chunks": self.chunks, "postings": self.postings, "lengths": self.lengths}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChunkIndex":
+        postings = {term: [tuple(p) for p in plist] for term, plist in data["postings"].items()}
+        return cls(data["chunks"], postings, data["lengths"])
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (chunk_id, score) by BM25"""
+        n = len(self.chunks)
+        if not n:
+            return []
+
+        scores: Dict[int, float] = {}
+        for term in set(search_terms(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for chunk_id, tf in plist:
+                norm = self.K1 * (1 - self.B + self.B * self.lengths[chunk_id] / (self.avg_length or 1))
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def select(self, query: str, k: int = 5) -> List[str]:
+        """Top-k chunks, returned in document order"""
+        hits = self.search(query, k)
+        return [self.chunks[chunk_id] for chunk_id, _ in sorted(hits)]
+
+
+def _remember(key: str, index: ChunkIndex):
+    _local_indexes[key] = index
+    _local_indexes.move_to_end(key)
+    while len(_local_indexes) > LOCAL_INDEX_LIMIT:
+        _local_indexes.popitem(last=False)
+
+
+def get_index_local(text: str) -> ChunkIndex:
+    """Index from the in-process LRU, building it if needed (sync, no KeyDB)"""
+    key = f"{INDEX_VERSION}:{content_hash(text)}"
+    index = _local_indexes.get(key)
+    if index is None:
+        index = ChunkIndex.build(text)
+        _remember(key, index)
+    else:
+        _local_indexes.move_to_end(key)
+    return index
+
+
+async def get_index(text: str) -> ChunkIndex:
+    """Index for a document: in-process LRU -> KeyDB -> build once (off the event loop)"""
+    key = f"{INDEX_VERSION}:{content_hash(text)}"
+
+    index = _local_indexes.get(key)
+    if index is not None:
+        _local_indexes.move_to_end(key)
+        return index
+
+    data = await index_cache.get(key)
+    if data is not None:
+        index = ChunkIndex.from_dict(data)
+    else:
+        index = await asyncio.to_thread(ChunkIndex.build, text)
+        await index_cache.set(key, index.to_dict(), INDEX_CACHE_TTL)
+        logger.info(f"✅ Retrieval index built: {len(index.chunks)} chunks, {len(index.postings)} terms")
+
+    _remember(key, index)
+    return index
+
+
+async def select_context(context: str, question: str, k: int = 5, max_chars: int = 6000) -> str:
+    """Whole context when it is small; otherwise only the top-k chunks for the question"""
+    if len(context) <= max_chars:
+        return context
+
+    index = await get_index(context)
+    selected = index.select(question, k)
+    if not selected:
+        # Nenhum termo em comum: usar o início do documento
+        return context[:max_chars]
+    return "\n\n[...]\n\n".join(selected)
+
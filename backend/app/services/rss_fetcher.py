@@ -0,0 +1,240 @@
+"""
+RSS fetching
+Busca concorrente de feeds (limite por host, prazo global) com GET condicional:
+feeds sem mudança voltam como 304 e reaproveitam o parse guardado
+"""
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import feedparser
+
+from app.cache import cache
+from app.services.http_client import http
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato do parse guardado: mudar _normalize_entry exige trocar a versão
+FEED_STATE_VERSION = "v1"
+FEED_STATE_TTL = 7 * 24 * 3600
+
+feed_cache = cache.namespace("rss_feeds")
+_local_feeds: "OrderedDict[str, dict]" = OrderedDict()
+LOCAL_FEED_LIMIT = 256
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class FetchResult(NamedTuple):
+    feeds: Dict[str, dict]  # url -> feed parseado, na ordem das URLs pedidas
+    failed: Dict[str, str]  # url -> erro
+    timed_out: List[str]  # URLs ainda pendentes quando o prazo acabou
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.failed or self.timed_out)
+
+
+def _iso(parsed_time) -> Optional[str]:
+    return datetime(*parsed_time[:6]).isoformat() if parsed_time else None
+
+
+def _image(entry) -> Optional[str]:
+    if entry.get("media_content"):
+        return entry.media_content[0].get("url")
+    for enclosure in entry.get("enclosures", []):
+        if enclosure.get("type", "").startswith("image/"):
+            return enclosure.get("href")
+    return None
+
+
+def _normalize_entry(entry) -> dict:
+    # Só dados serializáveis: o parse vai para o KeyDB
+    return {
+        "id": entry.get("id", entry.get("link", "")),
+        "title": entry.get("title"),
+        "summary": entry.get("summary", ""),
+        "content": entry.content[0].get("value", "") if entry.get("content") else "",
+        "link": entry.get("link", ""),
+        "published": _iso(entry.get("published_parsed")),
+        "updated": _iso(entry.get("updated_parsed")),
+        "author": entry.get("author", ""),
+        "image": _image(entry),
+        "tags": [tag.term for tag in entry.get("tags", [])],
+    }
+
+
+def parse_feed(content: bytes) -> dict:
+    """Parse a feed body into plain dicts (CPU-bound: run it off the event loop)"""
+    feed = feedparser.parse(content)
+    return {
+        "feed": {
+            "title": feed.feed.get("title"),
+            "description": feed.feed.get("description", ""),
+            "link": feed.feed.get("link", ""),
+            "language": feed.feed.get("language"),
+            "updated": feed.feed.get("updated", ""),
+        },
+        "entries": [_normalize_entry(entry) for entry in feed.entries],
+        "bozo": bool(feed.bozo),
+    }
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Process pool for feed parsing (feedparser is CPU-bound and holds the GIL)"""
+    global _executor
+    if _executor is None:
+        from app.config import settings
+
+        # spawn: fork a partir de um processo com threads (uvicorn, redis) pode travar
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.RSS_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"✅ RSS parse pool started ({settings.RSS_PARSE_WORKERS} workers)")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _state_key(url: str) -> str:
+    return f"{FEED_STATE_VERSION}:{hashlib.sha256(url.encode('utf-8')).hexdigest()}"
+
+
+def _remember(key: str, state: dict):
+    _local_feeds[key] = state
+    _local_feeds.move_to_end(key)
+    while len(_local_feeds) > LOCAL_FEED_LIMIT:
+        _local_feeds.popitem(last=False)
+
+
+class RSSFetcher:
+    """
+    Busca feeds em paralelo com no máximo `per_host` conexões por host.
+
+    Cada feed guarda ETag/Last-Modified junto do parse (KeyDB + LRU local);
+    a próxima busca manda If-None-Match/If-Modified-Since e, num 304, devolve
+    o parse guardado sem baixar nem parsear o feed de novo.
+    """
+
+    def __init__(self, per_host: int = 2, timeout: float = 30.0):
+        self.per_host = per_host
+        self.timeout = timeout
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {"fetched": 0, "not_modified": 0, "failed": 0, "timed_out": 0}
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    async def _load_states(self, urls: List[str]) -> Dict[str, dict]:
+        keys = {url: _state_key(url) for url in urls}
+        states = {url: _local_feeds[key] for url, key in keys.items() if key in _local_feeds}
+        missing = [keys[url] for url in urls if url not in states]
+        if missing:
+            found = await feed_cache.get_many(missing)
+            for url in urls:
+                if keys[url] in found:
+                    states[url] = found[keys[url]]
+                    _remember(keys[url], states[url])
+        return states
+
+    async def fetch(self, url: str, state: Optional[dict] = None) -> dict:
+        """Fetch one feed, sending the stored validators; raises on HTTP or network errors"""
+        headers = {}
+        if state is not None:
+            if state.get("etag"):
+                headers["If-None-Match"] = state["etag"]
+            if state.get("last_modified"):
+                headers["If-Modified-Since"] = state["last_modified"]
+
+        async with self._host_limit(url):
+            response = await http.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and state is not None:
+            self.stats["not_modified"] += 1
+            return state
+        response.raise_for_status()
+
+        state = await asyncio.get_running_loop().run_in_executor(get_executor(), parse_feed, response.content)
+        state.update(
+            url=url,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            fetched_at=time.time(),
+        )
+        self.stats["fetched"] += 1
+        if state["bozo"]:
+            logger.warning(f"⚠️  RSS feed may have issues: {url}")
+
+        key = _state_key(url)
+        _remember(key, state)
+        # Sem validadores não há GET condicional: guardar só no processo
+        if state["etag"] or state["last_modified"]:
+            await feed_cache.set(key, state, FEED_STATE_TTL)
+        return state
+
+    async def fetch_one(self, url: str) -> dict:
+        states = await self._load_states([url])
+        return await self.fetch(url, states.get(url))
+
+    async def fetch_many(self, urls: List[str], deadline: Optional[float] = None) -> FetchResult:
+        """
+        Fetch all feeds concurrently. Feeds still pending after `deadline`
+        seconds are cancelled and reported in `timed_out` (partial result).
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return FetchResult({}, {}, [])
+
+        states = await self._load_states(urls)
+        tasks = {url: asyncio.create_task(self.fetch(url, states.get(url))) for url in urls}
+        try:
+            _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        feeds, failed, timed_out = {}, {}, []
+        for url, task in tasks.items():
+            if task in pending:
+                timed_out.append(url)
+            elif task.exception() is not None:
+                error = task.exception()
+                failed[url] = str(error).split("\n")[0] or type(error).__name__
+                logger.warning(f"⚠️  Failed to fetch feed {url}: {failed[url]}")
+            else:
+                feeds[url] = task.result()
+
+        self.stats["failed"] += len(failed)
+        self.stats["timed_out"] += len(timed_out)
+        if timed_out:
+            logger.warning(f"⚠️  RSS deadline reached: {len(timed_out)}/{len(urls)} feeds still pending")
+        return FetchResult(feeds, failed, timed_out)
+
+
+def _create_fetcher() -> RSSFetcher:
+    from app.config import settings
+
+    return RSSFetcher(per_host=settings.RSS_PER_HOST_CONCURRENCY, timeout=settings.RSS_FETCH_TIMEOUT)
+
+
+# Instância global
+rss_fetcher = _create_fetcher()
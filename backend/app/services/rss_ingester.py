@@ -0,0 +1,238 @@
+"""
+RSS ingestion
+Agenda de coleta dos feeds assinados, com intervalo adaptativo por feed
+"""
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from datetime import datetime
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from app.cache import cache
+from app.services import feed_store
+from app.services.rss_fetcher import rss_fetcher
+from app.services.rss_search import item_index
+
+logger = logging.getLogger(__name__)
+
+INGEST_LOCK = "rss:ingest"
+# Expira sozinho se o worker que coleta morrer no meio
+INGEST_LOCK_TIMEOUT = 300.0
+# Prazo de cada feed numa coleta: bem abaixo do lock, para um feed travado não segurá-lo
+MAX_FEED_DEADLINE = INGEST_LOCK_TIMEOUT / 5
+
+
+class IngestError(Exception):
+    pass
+
+
+async def check_feed_url(url: str, allow_private: bool = False):
+    """
+    Reject URLs the server must not fetch on a user's behalf: schemes other
+    than http(s), and hosts resolving to loopback, private, link-local or
+    reserved addresses (unless `allow_private`). Raises IngestError.
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError:
+        raise IngestError("Invalid feed URL")
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise IngestError("Feed URL must be http(s) with a host")
+    if allow_private:
+        return
+
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise IngestError(f"Could not resolve {parts.hostname}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise IngestError(f"Feed host {parts.hostname} is not a public address")
+
+
+def next_interval(current: float, new_items: List[datetime], minimum: float, maximum: float) -> float:
+    """
+    Poll interval after a successful poll: follow the feed's publishing rate
+    when it has news (about half the gap between new items), back off while
+    nothing changes.
+    """
+    if not new_items:
+        interval = current * 1.5
+    elif len(new_items) >= 2:
+        span = (max(new_items) - min(new_items)).total_seconds()
+        interval = min(current, span / (len(new_items) - 1) / 2)
+    else:
+        interval = current / 2
+    return min(max(interval, minimum), maximum)
+
+
+class RSSIngester:
+    """
+    Coleta periódica: a cada `tick` segundos busca os feeds vencidos (em
+    paralelo, pelo RSSFetcher com GET condicional e parse num pool de
+    processos), grava os itens novos no feed_store e reagenda cada feed.
+    Com vários workers, um lock no KeyDB garante uma coleta por vez.
+    Feeds avulsos (ephemeral) são no máximo `max_ephemeral` e saem após
+    `ephemeral_ttl` segundos sem uso. Cada feed tem `feed_deadline` segundos
+    por coleta; o que passar disso conta como falha e é tentado mais tarde.
+    """
+
+    def __init__(self, tick: float = 30.0, batch: int = 50, min_interval: float = 300.0,
+                 max_interval: float = 6 * 3600.0, default_interval: float = 900.0,
+                 max_ephemeral: int = 200, ephemeral_ttl: float = 86400.0, allow_private: bool = False,
+                 feed_deadline: float = 60.0):
+        self.tick = tick
+        self.batch = batch
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.max_ephemeral = max_ephemeral
+        self.ephemeral_ttl = ephemeral_ttl
+        self.allow_private = allow_private
+        self.feed_deadline = min(feed_deadline, MAX_FEED_DEADLINE)
+        # Busca + gravação de um lote; o lock expira só depois de vários lotes
+        self.poll_timeout = 2 * self.feed_deadline
+        self._task: Optional[asyncio.Task] = None
+        # Entre workers vale o lock do KeyDB; dentro do processo, este
+        self._polling = asyncio.Lock()
+
+    async def start(self, subscriptions: List[str] = ()):
+        """Subscribe the default feeds and start the polling loop (called from app lifespan)"""
+        if self._task is not None:
+            return
+        for url in subscriptions:
+            await feed_store.subscribe_feed(url, self.default_interval)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ RSS ingester started (tick {self.tick:.0f}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ RSS ingestion error: {e}")
+            await asyncio.sleep(self.tick)
+
+    async def poll_due(self) -> int:
+        """Poll every feed whose time has come; returns how many feeds were polled"""
+        if self._polling.locked():
+            return 0
+        async with self._polling:
+            token = await cache.acquire_lock(INGEST_LOCK, INGEST_LOCK_TIMEOUT)
+            if token is None:
+                return 0
+            try:
+                if await feed_store.expire_feeds(self.ephemeral_ttl):
+                    item_index.mark_stale()
+                polled = 0
+                started = time.monotonic()
+                # Parar antes que mais um lote possa passar do lock; o resto fica para o próximo tick
+                while time.monotonic() - started + self.poll_timeout < INGEST_LOCK_TIMEOUT:
+                    feeds = await feed_store.due_feeds(self.batch)
+                    if not feeds:
+                        break
+                    await self.poll(feeds)
+                    polled += len(feeds)
+                return polled
+            finally:
+                await cache.release_lock(INGEST_LOCK, token)
+
+    async def poll(self, feeds: List[dict]):
+        """
+        Fetch the given feeds concurrently, store new items and reschedule them.
+        Takes at most `poll_timeout`: feeds not done by then are rescheduled as failed.
+        """
+        done = set()
+        try:
+            await asyncio.wait_for(self._poll(feeds, done), self.poll_timeout)
+        except asyncio.TimeoutError:
+            late = [feed for feed in feeds if feed["id"] not in done]
+            logger.warning(f"⚠️  RSS poll timed out, {len(late)} feeds rescheduled")
+            for feed in late:
+                await self._retry_later(feed, "poll timeout")
+
+    async def _retry_later(self, feed: dict, error: str):
+        # Falhas seguidas afastam as tentativas (sem mudar o intervalo aprendido)
+        delay = min(feed["poll_interval"] * 2 ** feed["failures"], self.max_interval)
+        await feed_store.schedule_feed(feed["id"], feed["poll_interval"], delay, error)
+
+    async def _poll(self, feeds: List[dict], done: set):
+        fetched = await rss_fetcher.fetch_many([feed["url"] for feed in feeds], deadline=self.feed_deadline)
+        for feed in feeds:
+            url = feed["url"]
+            try:
+                if url not in fetched.feeds:
+                    raise IngestError(fetched.failed.get(url, "timeout"))
+                parsed = fetched.feeds[url]
+                new_items: List[datetime] = []
+                # 304 devolve o mesmo parse: só gravar parses que o store ainda não viu
+                if parsed["fetched_at"] != feed["parsed_at"]:
+                    new_items = await feed_store.store_parse(feed["id"], parsed)
+            except Exception as e:
+                logger.warning(f"⚠️  RSS ingestion failed for {url}: {e}")
+                await self._retry_later(feed, str(e))
+                done.add(feed["id"])
+                continue
+
+            interval = next_interval(feed["poll_interval"], new_items, self.min_interval, self.max_interval)
+            await feed_store.schedule_feed(feed["id"], interval, interval)
+            done.add(feed["id"])
+            if new_items:
+                item_index.mark_stale()
+                logger.info(f"📰 {len(new_items)} new items from {url} (next poll in {interval:.0f}s)")
+
+    async def ingest_url(self, url: str, ephemeral: bool = False) -> dict:
+        """
+        Subscribe to a feed and poll it now if it was never polled. A new feed
+        whose first poll fails is unsubscribed again and the error raised.
+        `ephemeral` subscriptions (ad-hoc URLs) are capped and expire when unused.
+        """
+        await check_feed_url(url, self.allow_private)
+        if ephemeral and await feed_store.get_feed_by_url(url) is None:
+            if await feed_store.count_ephemeral_feeds() >= self.max_ephemeral:
+                raise IngestError("Too many ad-hoc feeds, subscribe it through /api/feeds")
+        feed, created = await feed_store.subscribe_feed(url, self.default_interval, ephemeral)
+        if feed["last_polled_at"] is None:
+            await self.poll([feed])
+            feed = await feed_store.get_feed(feed["id"])
+            if feed["last_error"] is not None:
+                # Só desfaz a assinatura criada aqui: feeds já assinados ficam para a próxima coleta
+                if created:
+                    await feed_store.delete_feed(feed["id"])
+                raise IngestError(feed["last_error"])
+        return feed
+
+
+def _create_ingester() -> RSSIngester:
+    from app.config import settings
+
+    return RSSIngester(
+        tick=settings.RSS_INGEST_TICK,
+        batch=settings.RSS_INGEST_BATCH,
+        min_interval=settings.RSS_MIN_INTERVAL,
+        max_interval=settings.RSS_MAX_INTERVAL,
+        default_interval=settings.RSS_DEFAULT_INTERVAL,
+        max_ephemeral=settings.RSS_MAX_EPHEMERAL_FEEDS,
+        ephemeral_ttl=settings.RSS_EPHEMERAL_TTL,
+        allow_private=settings.RSS_ALLOW_PRIVATE_HOSTS,
+        feed_deadline=settings.RSS_FEED_DEADLINE,
+    )
+
+
+# Instância global
+rss_ingester = _create_ingester()
@@ -0,0 +1,370 @@
+"""
+RSS search
+Índice invertido BM25 em memória sobre os itens coletados, atualizado incrementalmente
+"""
+import asyncio
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.services import feed_store
+from app.services.text import index_terms
+
+logger = logging.getLogger(__name__)
+
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+PREFIX_RE = re.compile(r'[a-zà-ÿ]+')
+PREFIX_MIN_LENGTH = 2
+# Um prefixo vira no máximo esta quantidade de termos (os mais frequentes)
+PREFIX_EXPANSION = 32
+# Frases são conferidas no índice direto nos candidatos mais bem ranqueados, até este limite
+PHRASE_VERIFY_LIMIT = 50_000
+# Linhas lidas do banco por consulta / indexadas por vez segurando o lock
+SYNC_BATCH = 5000
+APPLY_BATCH = 500
+TITLE_WEIGHT = 2
+# Entre título e resumo no índice direto: uma frase não atravessa os dois campos
+SEPARATOR = 0xFFFFFFFF
+
+
+class Clause(NamedTuple):
+    kind: str  # "term", "prefix" ou "phrase"
+    terms: Tuple[str, ...]
+
+
+class SearchResult(NamedTuple):
+    hits: List[Tuple[int, float]]  # (id do item no banco, score) da página pedida
+    total: int
+    exact: bool  # False quando a contagem de uma busca por frase parou em PHRASE_VERIFY_LIMIT
+
+
+def parse_query(query: str) -> List[Clause]:
+    """
+    Words (all required), "quoted phrases" and prefix* terms. Words are
+    stemmed and stop words dropped, exactly as in the indexed text.
+    """
+    clauses: Dict[Clause, None] = {}
+    for phrase, word in QUERY_RE.findall(query):
+        if phrase:
+            terms = tuple(index_terms(phrase))
+            if len(terms) > 1:
+                clauses[Clause("phrase", terms)] = None
+            elif terms:
+                clauses[Clause("term", terms)] = None
+        elif word.endswith("*"):
+            prefix = "".join(PREFIX_RE.findall(word.lower()))
+            if len(prefix) >= PREFIX_MIN_LENGTH:
+                clauses[Clause("prefix", (prefix,))] = None
+        else:
+            for term in index_terms(word):
+                clauses[Clause("term", (term,))] = None
+    return list(clauses)
+
+
+class ItemIndex:
+    """
+    Índice invertido dos itens (título com peso 2 + resumo), com BM25.
+
+    Postings ficam em `array` por termo (append O(1) na ingestão) e são lidos
+    como numpy sem cópia na consulta: candidatos = interseção começando pelo
+    termo mais raro, score vetorizado só sobre eles. Um índice direto (termos
+    de cada item em sequência) confere buscas por frase. Itens de feeds
+    removidos ficam marcados como mortos; um item editado na origem
+    (updated_at) é reindexado: a versão antiga morre e a nova entra no fim.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.vocabulary: Dict[str, int] = {}
+        self.sorted_terms: List[str] = []
+        self.postings: List[array] = []  # termo -> posições dos itens (crescente)
+        self.frequencies: List[array] = []  # termo -> tf ponderado, alinhado com postings
+        self.item_ids = array("q")
+        self.feed_ids = array("q")
+        self.lengths = array("I")
+        self.published = array("d")
+        self.tokens = array("I")
+        self.token_offsets = array("q", [0])
+        self.alive = bytearray()
+        self.live_count = 0
+        self.total_length = 0
+        self.last_item_id = 0
+        # Posição atual de cada item (reindexação) e maior (updated_at, id) já visto
+        self.positions: Dict[int, int] = {}
+        self.updated_mark: Optional[Tuple[datetime, int]] = None
+        self.known_feeds: Optional[set] = None
+        self.synced_at = 0.0
+        self._sync_lock = asyncio.Lock()
+        self._sync_started = 0.0
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    # --- indexação (chamadores seguram o lock) ---
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            term_id = self.vocabulary[term] = len(self.postings)
+            insort(self.sorted_terms, term)
+            self.postings.append(array("i"))
+            self.frequencies.append(array("H"))
+        return term_id
+
+    def add(self, item_id: int, feed_id: int, title: Optional[str], summary: Optional[str], published: float):
+        doc = len(self.item_ids)
+        counts: Dict[int, int] = {}
+        sequence = array("I")
+        length = 0
+        for weight, terms in ((TITLE_WEIGHT, index_terms(title or "")), (1, index_terms(summary or ""))):
+            for term in terms:
+                term_id = self._term_id(term)
+                counts[term_id] = counts.get(term_id, 0) + weight
+                sequence.append(term_id)
+            sequence.append(SEPARATOR)
+            length += weight * len(terms)
+
+        for term_id, tf in counts.items():
+            self.postings[term_id].append(doc)
+            self.frequencies[term_id].append(min(tf, 65535))
+        self.item_ids.append(item_id)
+        self.feed_ids.append(feed_id)
+        self.lengths.append(length)
+        self.published.append(published)
+        self.tokens.extend(sequence)
+        self.token_offsets.append(len(self.tokens))
+        self.alive.append(1)
+        self.live_count += 1
+        self.total_length += length
+        self.last_item_id = max(self.last_item_id, item_id)
+        self.positions[item_id] = doc
+
+    def _kill(self, doc: int):
+        if self.alive[doc]:
+            self.alive[doc] = 0
+            self.live_count -= 1
+            self.total_length -= self.lengths[doc]
+
+    def drop_feeds(self, live_feeds: set):
+        """Hide the items of feeds that are no longer subscribed"""
+        if not self.item_ids:
+            return
+        feeds = np.frombuffer(self.feed_ids, dtype=np.int64)
+        alive = np.frombuffer(self.alive, dtype=np.uint8)
+        dead = np.flatnonzero((alive == 1) & ~np.isin(feeds, np.fromiter(live_feeds, dtype=np.int64)))
+        if len(dead):
+            alive[dead] = 0
+            self.live_count -= len(dead)
+            self.total_length -= int(np.frombuffer(self.lengths, dtype=np.uint32)[dead].sum())
+
+    # --- consulta ---
+
+    def search(self, clauses: List[Clause], offset: int = 0, limit: int = 20,
+               feeds: Optional[Iterable[int]] = None) -> SearchResult:
+        """Items matching every clause, by BM25 then most recent first"""
+        with self._lock:
+            return self._search(clauses, offset, limit, feeds)
+
+    def _expand(self, prefix: str) -> List[int]:
+        start = bisect_left(self.sorted_terms, prefix)
+        matches = []
+        for term in self.sorted_terms[start:]:
+            if not term.startswith(prefix):
+                break
+            matches.append(self.vocabulary[term])
+        return heapq.nlargest(PREFIX_EXPANSION, matches, key=lambda term_id: len(self.postings[term_id]))
+
+    def _units(self, clauses: List[Clause]) -> Optional[List[List[int]]]:
+        # Cada unidade é obrigatória; um prefixo é uma unidade com vários termos (OU)
+        units = []
+        for clause in clauses:
+            if clause.kind == "prefix":
+                unit = self._expand(clause.terms[0])
+                if not unit:
+                    return None
+                units.append(unit)
+            else:
+                for term in clause.terms:
+                    if term not in self.vocabulary:
+                        return None
+                    units.append([self.vocabulary[term]])
+        return units
+
+    def _search(self, clauses: List[Clause], offset: int, limit: int,
+                feeds: Optional[Iterable[int]]) -> SearchResult:
+        units = self._units(clauses) if clauses else None
+        if not units or not self.live_count:
+            return SearchResult([], 0, True)
+
+        n = self.live_count
+        lists = [
+            [(np.frombuffer(self.postings[t], dtype=np.int32), np.frombuffer(self.frequencies[t], dtype=np.uint16),
+              math.log(1 + (n - len(self.postings[t]) + 0.5) / (len(self.postings[t]) + 0.5)))
+             for t in unit]
+            for unit in units
+        ]
+
+        def unit_docs(unit) -> np.ndarray:
+            if len(unit) == 1:
+                return unit[0][0]
+            return np.unique(np.concatenate([docs for docs, _, _ in unit]))
+
+        # Interseção a partir da unidade mais rara: custo proporcional à menor lista
+        order = sorted(range(len(lists)), key=lambda i: sum(len(docs) for docs, _, _ in lists[i]))
+        candidates = unit_docs(lists[order[0]])
+        for i in order[1:]:
+            docs = unit_docs(lists[i])
+            position = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            candidates = candidates[docs[position] == candidates]
+            if not len(candidates):
+                return SearchResult([], 0, True)
+
+        candidates = candidates[np.frombuffer(self.alive, dtype=np.uint8)[candidates] == 1]
+        if feeds is not None:
+            feed_ids = np.frombuffer(self.feed_ids, dtype=np.int64)[candidates]
+            candidates = candidates[np.isin(feed_ids, np.fromiter(feeds, dtype=np.int64))]
+        if not len(candidates):
+            return SearchResult([], 0, True)
+
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)[candidates].astype(np.float32)
+        norm = self.K1 * (1 - self.B + self.B * lengths / (self.total_length / n or 1))
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        for unit in lists:
+            for docs, frequencies, idf in unit:
+                position = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                tf = np.where(docs[position] == candidates, frequencies[position], 0).astype(np.float32)
+                scores += idf * tf * (self.K1 + 1) / (tf + norm)
+
+        published = np.frombuffer(self.published, dtype=np.float64)[candidates]
+        phrases = [clause.terms for clause in clauses if clause.kind == "phrase"]
+        if phrases:
+            return self._verify_phrases(candidates, scores, published, phrases, offset, limit)
+
+        wanted = offset + limit
+        if wanted < len(candidates):
+            # Tudo que empata com o k-ésimo score entra, para o desempate por data ser exato
+            kth = np.partition(scores, len(scores) - wanted)[len(scores) - wanted]
+            top = np.flatnonzero(scores >= kth)
+        else:
+            top = np.arange(len(candidates))
+        # Score maior primeiro; empate: mais recente primeiro
+        top = top[np.lexsort((-published[top], -scores[top]))][offset:wanted]
+        hits = [(self.item_ids[int(candidates[i])], float(scores[i])) for i in top]
+        return SearchResult(hits, len(candidates), True)
+
+    def _phrase_mask(self, docs: np.ndarray, phrase: List[int]) -> np.ndarray:
+        # Sequências dos candidatos concatenadas; cada uma termina em SEPARATOR,
+        # então um casamento nunca atravessa dois itens
+        offsets = np.frombuffer(self.token_offsets, dtype=np.int64)
+        starts = offsets[docs]
+        sizes = offsets[docs + 1] - starts
+        ends = np.cumsum(sizes)
+        positions = np.arange(ends[-1]) + np.repeat(starts - (ends - sizes), sizes)
+        sequence = np.frombuffer(self.tokens, dtype=np.uint32)[positions]
+
+        span = len(sequence) - len(phrase) + 1
+        mask = np.zeros(len(docs), dtype=bool)
+        if span <= 0:
+            return mask
+        hit = sequence[:span] == phrase[0]
+        for shift, term_id in enumerate(phrase[1:], 1):
+            hit &= sequence[shift:shift + span] == term_id
+        mask[np.searchsorted(ends, np.flatnonzero(hit), side="right")] = True
+        return mask
+
+    def _verify_phrases(self, candidates: np.ndarray, scores: np.ndarray, published: np.ndarray,
+                        phrases: List[Tuple[str, ...]], offset: int, limit: int) -> SearchResult:
+        ranked = np.lexsort((-published, -scores))[:PHRASE_VERIFY_LIMIT]
+        mask = np.ones(len(ranked), dtype=bool)
+        for phrase in phrases:
+            mask &= self._phrase_mask(candidates[ranked], [self.vocabulary[term] for term in phrase])
+        matched = ranked[mask]
+        hits = [(self.item_ids[int(candidates[i])], float(scores[i])) for i in matched[offset:offset + limit]]
+        return SearchResult(hits, len(matched), len(candidates) <= PHRASE_VERIFY_LIMIT)
+
+    # --- sincronização com o feed_store ---
+
+    def _sync_blocking(self):
+        live_feeds = feed_store.feed_ids()
+        if self.known_feeds is not None and not self.known_feeds <= live_feeds:
+            with self._lock:
+                self.drop_feeds(live_feeds)
+        self.known_feeds = live_feeds
+
+        # Itens já indexados que mudaram (o mesmo item novo e editado entra só pela leitura abaixo)
+        changed = 0
+        while self.updated_mark is not None:
+            rows = feed_store.items_updated_after(*self.updated_mark, self.last_item_id, SYNC_BATCH)
+            self._apply(rows, replace=True)
+            changed += len(rows)
+            if len(rows) < SYNC_BATCH:
+                break
+
+        added = 0
+        while True:
+            rows = feed_store.items_after(self.last_item_id, SYNC_BATCH)
+            self._apply(rows, replace=False)
+            added += len(rows)
+            if len(rows) < SYNC_BATCH:
+                return added + changed
+
+    def _apply(self, rows: List[tuple], replace: bool):
+        for start in range(0, len(rows), APPLY_BATCH):
+            with self._lock:
+                for item_id, feed_id, title, summary, published_at, updated_at in rows[start:start + APPLY_BATCH]:
+                    if replace and item_id in self.positions:
+                        self._kill(self.positions[item_id])
+                    published = published_at.replace(tzinfo=timezone.utc).timestamp()
+                    self.add(item_id, feed_id, title, summary, published)
+                    if self.updated_mark is None or (updated_at, item_id) > self.updated_mark:
+                        self.updated_mark = (updated_at, item_id)
+
+    async def sync(self):
+        """
+        Index items stored or changed since the last sync (runs in a thread).
+        A call made while a sync runs waits for it and then syncs again, so
+        it always sees what was stored before it was called; calls waiting
+        together share that second sync.
+        """
+        requested = time.monotonic()
+        async with self._sync_lock:
+            # Uma sincronização iniciada depois do pedido já leu tudo o que ele precisa
+            if self._sync_started > requested:
+                return
+            started = self._sync_started = time.monotonic()
+            try:
+                changed = await asyncio.to_thread(self._sync_blocking)
+                if changed:
+                    logger.info(
+                        f"✅ RSS search index: +{changed} items ({self.live_count} total) "
+                        f"in {time.monotonic() - started:.2f}s"
+                    )
+            except Exception as e:
+                logger.error(f"❌ RSS search index sync failed: {e}")
+            finally:
+                self.synced_at = time.monotonic()
+
+    def mark_stale(self):
+        """Make the next refresh sync (items were just stored by this process)"""
+        self.synced_at = 0.0
+
+    async def refresh(self, max_age: float):
+        """Sync when the last sync is older than `max_age` seconds (other workers may have ingested)"""
+        if time.monotonic() - self.synced_at >= max_age:
+            await self.sync()
+
+
+# Instância global
+item_index = ItemIndex()
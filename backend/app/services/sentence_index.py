@@ -0,0 +1,197 @@
+"""
+Sentence index for the simulated question answering
+Índice invertido palavra -> frases por documento, construído uma vez e cacheado
+"""
+import asyncio
+import heapq
+import logging
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.cache import cache
+from app.services.retrieval import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato: mudar tokenização ou padrões exige trocar a versão
+SENTENCE_INDEX_VERSION = "v1"
+SENTENCE_INDEX_TTL = 24 * 3600
+
+sentence_index_cache = cache.namespace("sentences")
+_local_indexes: "OrderedDict[str, SentenceIndex]" = OrderedDict()
+LOCAL_INDEX_LIMIT = 32
+
+SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+
+# Sequências máximas de letras: uma palavra-chave (só letras) aparece numa frase
+# se e somente se é substring de um desses tokens
+LETTERS_RE = re.compile(r'[a-zA-ZÀ-ÿ]+')
+
+DATE_PATTERNS = [
+    re.compile(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b'),  # DD/MM/YYYY
+    re.compile(r'\b\d{4}\b'),  # Anos
+    re.compile(r'\b(janeiro|fevereiro|março|abril|maio|junho|julho|agosto|setembro|outubro|novembro|dezembro)\b'),
+    re.compile(r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\b'),
+]
+NUMBER_PATTERNS = [
+    re.compile(r'\b\d+[.,]?\d*\s*%\b'),  # Percentuais
+    re.compile(r'\b\d+[.,]?\d*\s*(mil|milhão|bilhão|thousand|million|billion)\b'),  # Números grandes
+    re.compile(r'\b\d+[.,]?\d*\b'),  # Números gerais
+]
+# As respostas só citam as primeiras menções
+MAX_MENTIONS = 5
+
+
+def _mentions(patterns: List[re.Pattern], text: str) -> List[str]:
+    """First MAX_MENTIONS values of `findall` for each pattern, concatenated in pattern order"""
+    found: List[str] = []
+    for pattern in patterns:
+        if len(found) >= MAX_MENTIONS:
+            break
+        matches = islice(pattern.finditer(text), MAX_MENTIONS - len(found))
+        found.extend(m.group(1) if pattern.groups else m.group(0) for m in matches)
+    return found
+
+
+class SentenceIndex:
+    """
+    Frases de um documento + índice invertido token -> ids de frases.
+
+    Pontuar uma pergunta custa o tamanho das listas dos tokens envolvidos, não
+    o tamanho do documento. Datas e números (primeiras menções), contagem de
+    palavras e tópicos também ficam pré-calculados.
+    """
+
+    def __init__(self, sentences: List[str], postings: Dict[str, List[int]], word_count: int,
+                 dates: List[str], numbers: List[str], topics: List[str]):
+        self.sentences = sentences
+        self.postings = postings
+        self.word_count = word_count
+        self.dates = dates
+        self.numbers = numbers
+        self.topics = topics
+        self._vocabulary: Optional[Tuple[str, List[int], List[str]]] = None
+
+    @classmethod
+    def build(cls, text: str) -> "SentenceIndex":
+        from app.services.document_analyzer import DocumentAnalyzer
+
+        sentences = [s.strip() for s in SENTENCE_SPLIT_RE.split(text) if s.strip()]
+        postings: Dict[str, List[int]] = {}
+        for sentence_id, sentence in enumerate(sentences):
+            for token in set(LETTERS_RE.findall(sentence.lower())):
+                postings.setdefault(token, []).append(sentence_id)
+
+        text_lower = text.lower()
+        return cls(
+            sentences,
+            postings,
+            len(text.split()),
+            _mentions(DATE_PATTERNS, text_lower),
+            _mentions(NUMBER_PATTERNS, text),
+            DocumentAnalyzer(text).topics,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "sentences": self.sentences,
+            "postings": self.postings,
+            "word_count": self.word_count,
+            "dates": self.dates,
+            "numbers": self.numbers,
+            "topics": self.topics,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SentenceIndex":
+        return cls(data["sentences"], data["postings"], data["word_count"], data["dates"], data["numbers"],
+                   data["topics"])
+
+    def _tokens_containing(self, word: str) -> List[str]:
+        # Busca de substring sobre o vocabulário concatenado (uma varredura em C)
+        if self._vocabulary is None:
+            tokens = list(self.postings)
+            offsets, position = [], 0
+            for token in tokens:
+                offsets.append(position)
+                position += len(token) + 1
+            self._vocabulary = ("\n".join(tokens), offsets, tokens)
+
+        joined, offsets, tokens = self._vocabulary
+        found = []
+        position = joined.find(word)
+        while position >= 0:
+            token_id = bisect_right(offsets, position) - 1
+            found.append(tokens[token_id])
+            # Próximo token: cada token entra uma vez só
+            next_token = token_id + 1
+            if next_token >= len(offsets):
+                break
+            position = joined.find(word, offsets[next_token])
+        return found
+
+    def sentences_containing(self, word: str) -> set:
+        """Ids of the sentences whose lowercased text contains `word` (letters only)"""
+        ids: set = set()
+        for token in self._tokens_containing(word):
+            ids.update(self.postings[token])
+        return ids
+
+    def rank(self, keywords: Iterable[str]) -> List[Tuple[str, int]]:
+        """(sentence, number of keywords it contains), best first, ties in document order"""
+        scores: Dict[int, int] = {}
+        for keyword in keywords:
+            for sentence_id in self.sentences_containing(keyword):
+                scores[sentence_id] = scores.get(sentence_id, 0) + 1
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.sentences[sentence_id], score) for sentence_id, score in ranked]
+
+    def first_with_any(self, words: Iterable[str], n: int = 2) -> List[str]:
+        """First `n` sentences (document order) containing any of `words`"""
+        ids: set = set()
+        for word in words:
+            ids |= self.sentences_containing(word)
+        return [self.sentences[sentence_id] for sentence_id in heapq.nsmallest(n, ids)]
+
+
+def _remember(key: str, index: SentenceIndex):
+    _local_indexes[key] = index
+    _local_indexes.move_to_end(key)
+    while len(_local_indexes) > LOCAL_INDEX_LIMIT:
+        _local_indexes.popitem(last=False)
+
+
+def get_sentence_index_local(text: str) -> SentenceIndex:
+    """Index from the in-process LRU, building it if needed (sync, no KeyDB)"""
+    key = f"{SENTENCE_INDEX_VERSION}:{content_hash(text)}"
+    index = _local_indexes.get(key)
+    if index is None:
+        index = SentenceIndex.build(text)
+        _remember(key, index)
+    else:
+        _local_indexes.move_to_end(key)
+    return index
+
+
+async def get_sentence_index(text: str) -> SentenceIndex:
+    """Index for a document: in-process LRU -> KeyDB -> build once (off the event loop)"""
+    key = f"{SENTENCE_INDEX_VERSION}:{content_hash(text)}"
+
+    index = _local_indexes.get(key)
+    if index is not None:
+        _local_indexes.move_to_end(key)
+        return index
+
+    data = await sentence_index_cache.get(key)
+    if data is not None:
+        index = SentenceIndex.from_dict(data)
+    else:
+        index = await asyncio.to_thread(SentenceIndex.build, text)
+        await sentence_index_cache.set(key, index.to_dict(), SENTENCE_INDEX_TTL)
+        logger.info(f"✅ Sentence index built: {len(index.sentences)} sentences, {len(index.postings)} tokens")
+
+    _remember(key, index)
+    return index
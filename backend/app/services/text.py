@@ -0,0 +1,49 @@
+"""
+Text helpers shared by the document analysis, retrieval and search code
+"""
+import re
+from functools import lru_cache
+
+# Palavras comuns a ignorar (PT + EN)
+STOP_WORDS = frozenset({
+    'que', 'de', 'a', 'o', 'e', 'do', 'da', 'em', 'um', 'para', 'é', 'com', 'não', 'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'das', 'dos', 'ao', 'aos', 'às', 'pela', 'pelo', 'pelos', 'pelas',
+    'the', 'of', 'and', 'a', 'to', 'in', 'is', 'you', 'that', 'it', 'he', 'was', 'for', 'on', 'are', 'as', 'with', 'his', 'they', 'i', 'at', 'be', 'this', 'have', 'from', 'or', 'one', 'had', 'by', 'word', 'but', 'not', 'what', 'all', 'were', 'we', 'when', 'your', 'can', 'said', 'there', 'each', 'which', 'she', 'do', 'how', 'their', 'if', 'will', 'up', 'other', 'about', 'out', 'many', 'then', 'them', 'these', 'so', 'some', 'her', 'would', 'make', 'like', 'into', 'him', 'has', 'two', 'more', 'very', 'what', 'know', 'just', 'first', 'get', 'over', 'think', 'also', 'back', 'after', 'use', 'our', 'work', 'life', 'only', 'new', 'way', 'may', 'say'
+})
+
+# Palavras com 3+ letras (inclui acentos do português)
+WORD_RE = re.compile(r'\b[a-zA-ZÀ-ÿ]{3,}\b')
+
+
+def search_terms(text: str) -> list:
+    """Lowercased words (3+ letters) without stop words"""
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+
+# Radicalização leve PT + EN: (sufixo, troca, radical mínimo), testados em ordem;
+# vale o primeiro que casar. Não é um stemmer completo (RSLP/Porter): só junta
+# plurais, advérbios e formas verbais mais comuns.
+STEM_RULES = (
+    ("mente", "", 3),
+    ("ções", "ção", 1), ("ões", "ão", 2), ("ães", "ão", 2), ("ãos", "ão", 2),
+    ("ais", "al", 3), ("éis", "el", 2), ("eis", "el", 3), ("óis", "ol", 2),
+    ("ies", "y", 2), ("sses", "ss", 1), ("ing", "", 3), ("ed", "", 3),
+)
+
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+
+@lru_cache(maxsize=200_000)
+def stem(word: str) -> str:
+    """Light Portuguese/English stem of a lowercased word"""
+    for suffix, replacement, min_stem in STEM_RULES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            return word[:-len(suffix)] + replacement
+    # Plural simples (casas, models), sem mexer em 'ss', 'us', 'is' (class, status, análisis)
+    if len(word) > 4 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def index_terms(text: str) -> list:
+    """search_terms of the text (HTML tags removed), stemmed"""
+    return [stem(word) for word in search_terms(HTML_TAG_RE.sub(" ", text))]
@@ -0,0 +1,90 @@
+"""
+Micro-benchmark dos codecs do cache (app/cache.py)
+
+Compara tempo de encode/decode e bytes armazenados para payloads realistas:
+resultado de Gist Memory (com todas as `pages`) e lista de itens RSS.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_cache_codecs
+"""
+import random
+import string
+import time
+
+from app.cache import COMPRESSORS, SERIALIZERS, Codec
+
+random.seed(42)
+
+WORDS = [
+    "dados", "análise", "processo", "resultado", "pesquisa", "documento", "tecnologia",
+    "comunidade", "sistema", "modelo", "learning", "network", "performance", "cache",
+    "the", "de", "para", "com", "uma", "que", "informação", "estudo", "método",
+]
+
+
+def _text(n_words: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(n_words))
+
+
+def gist_payload(n_pages: int = 200) -> dict:
+    pages = [_text(500) for _ in range(n_pages)]
+    return {
+        "total_pages": n_pages,
+        "pages": pages,
+        "gists": [f"Seção {i + 1}: {_text(40)}" for i in range(n_pages)],
+    }
+
+
+def rss_payload(n_items: int = 50) -> dict:
+    items = []
+    for i in range(n_items):
+        items.append({
+            "id": f"https://example.com/news/{i}",
+            "title": _text(10).title(),
+            "description": _text(80),
+            "content": f"<p>{_text(300)}</p>",
+            "link": f"https://example.com/news/{i}",
+            "published": "2024-05-01T12:00:00",
+            "author": "".join(random.choices(string.ascii_letters, k=10)),
+            "image": None,
+            "tags": ["tecnologia", "ia"],
+        })
+    return {"feed_info": {"title": "Feed", "language": "pt-br"}, "items": items, "total_items": n_items}
+
+
+def bench(codec: Codec, payload: dict, rounds: int) -> tuple:
+    encoded = codec.encode(payload)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        codec.encode(payload)
+    encode_ms = (time.perf_counter() - start) / rounds * 1000
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        codec.decode(encoded)
+    decode_ms = (time.perf_counter() - start) / rounds * 1000
+
+    assert codec.decode(encoded) == payload
+    return encode_ms, decode_ms, len(encoded)
+
+
+def main():
+    payloads = {
+        "gist (200 pages)": (gist_payload(), 20),
+        "rss (50 items)": (rss_payload(), 200),
+    }
+    serializers = [entry[0] for entry in SERIALIZERS.values()]
+    compressors = [entry[0] for entry in COMPRESSORS.values()]
+
+    print(f"{'payload':<18} {'codec':<16} {'encode ms':>10} {'decode ms':>10} {'bytes':>10}")
+    for label, (payload, rounds) in payloads.items():
+        for serializer in serializers:
+            for compression in compressors:
+                codec = Codec(serializer, compression, compress_min_bytes=1024)
+                encode_ms, decode_ms, size = bench(codec, payload, rounds)
+                print(f"{label:<18} {codec.name:<16} {encode_ms:>10.3f} {decode_ms:>10.3f} {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
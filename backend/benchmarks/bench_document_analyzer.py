@@ -0,0 +1,48 @@
+"""
+Throughput da análise simulada de Gist Memory
+
+Compara a implementação anterior (várias tokenizações e cinco regex de título
+por linha, mantida como referência em tests/analyzer_reference.py) com o
+DocumentAnalyzer, em textos sintéticos de 1MB, 10MB e 50MB. A equivalência
+dos dois é conferida em tests/test_document_analyzer.py.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_document_analyzer
+    python -m benchmarks.bench_document_analyzer --sizes 1 10
+"""
+import argparse
+import time
+
+from app.services.document_analyzer import DocumentAnalyzer
+from tests.analyzer_reference import legacy_gist_memory, make_blocks_text, make_text
+
+
+def measure(fn, text, repeat=1):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50], help="tamanhos em MB")
+    args = parser.parse_args()
+
+    print(f"{'documento':>16} {'anterior':>12} {'analyzer':>12} {'MB/s ant.':>10} {'MB/s novo':>10} {'ganho':>7}")
+    for size_mb in args.sizes:
+        for shape, build in (("seções", make_text), ("blocos", make_blocks_text)):
+            text = build(size_mb * 1024 * 1024)
+            repeat = 3 if size_mb <= 10 else 1
+            old = measure(legacy_gist_memory, text, repeat)
+            new = measure(lambda t: DocumentAnalyzer(t).gist_memory(), text, repeat)
+            print(
+                f"{size_mb:>6}MB {shape:>7} {old:>11.3f}s {new:>11.3f}s "
+                f"{size_mb / old:>10.1f} {size_mb / new:>10.1f} {old / new:>6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Overhead por requisição do middleware de rate limit
+
+Compara o antigo RateLimitMiddleware baseado em BaseHTTPMiddleware com o
+middleware ASGI puro de app/middleware/rate_limit.py, chamando a pilha ASGI
+diretamente (sem rede) contra um endpoint trivial.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_rate_limit
+"""
+import asyncio
+import time
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from app.middleware.limiter import RateLimiter
+from app.middleware.rate_limit import RateLimitMiddleware
+
+REQUESTS = 20_000
+
+
+async def endpoint(scope, receive, send):
+    await PlainTextResponse("ok")(scope, receive, send)
+
+
+class BaseHTTPRateLimitMiddleware(BaseHTTPMiddleware):
+    """Mesmo limiter, no formato antigo (BaseHTTPMiddleware)"""
+
+    def __init__(self, app, requests_per_minute: int):
+        super().__init__(app)
+        self.limiter = RateLimiter(requests_per_minute, window=60, backend="memory")
+
+    async def dispatch(self, request: Request, call_next):
+        result = await self.limiter.hit(request.client.host)
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(result.limit)
+        response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+        return response
+
+
+def _scope(i: int) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/health",
+        "raw_path": b"/health",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        # IPs diferentes para não esbarrar no limite
+        "client": (f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}", 1234),
+        "server": ("testserver", 80),
+    }
+
+
+def _receive():
+    # Corpo vazio na primeira chamada; depois o cliente "desconecta"
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(0)
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+async def run(app) -> float:
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        await app(_scope(i), _receive(), send)
+    return (time.perf_counter() - start) / REQUESTS * 1_000_000
+
+
+async def main():
+    baseline = await run(endpoint)
+    old = await run(BaseHTTPRateLimitMiddleware(endpoint, requests_per_minute=10**9))
+    new = await run(RateLimitMiddleware(endpoint, requests_per_minute=10**9, backend="memory"))
+
+    print(f"{'stack':<28} {'µs/request':>12} {'overhead µs':>12}")
+    print(f"{'endpoint only':<28} {baseline:>12.1f} {0:>12.1f}")
+    print(f"{'BaseHTTPMiddleware':<28} {old:>12.1f} {old - baseline:>12.1f}")
+    print(f"{'pure ASGI middleware':<28} {new:>12.1f} {new - baseline:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Benchmark do índice de busca RSS (app/services/rss_search.py)
+
+Indexa itens sintéticos (vocabulário com frequências em lei de Zipf, como em
+texto real) e mede a latência de consultas por termo, vários termos, frase e
+prefixo.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_rss_search [--items 100000]
+"""
+import argparse
+import itertools
+import random
+import string
+import time
+
+from app.services.rss_search import ItemIndex, parse_query
+
+random.seed(42)
+
+WORDS = [
+    "dados", "análise", "processo", "resultado", "pesquisa", "documento", "tecnologia",
+    "comunidade", "sistema", "modelo", "learning", "network", "performance", "cache",
+    "inteligência", "artificial", "governo", "economia", "mercado", "eleições", "python",
+    "futebol", "saúde", "educação", "energia", "clima", "startup", "segurança", "brasil",
+]
+# Palavras sintéticas só com letras (WORD_RE ignora dígitos)
+VOCABULARY = WORDS + sorted({
+    "".join(random.choices(string.ascii_lowercase, k=random.randint(5, 10))) for _ in range(50_000)
+})
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+RARE, RARER = VOCABULARY[500], VOCABULARY[20_000]
+
+QUERIES = {
+    "term": ["tecnologia", "python", RARE, RARER],
+    "multi-term": ["inteligência artificial", "economia mercado brasil", f"python {RARE}"],
+    "phrase": ['"inteligência artificial"', '"mercado brasil"'],
+    "prefix": ["tecno*", f"{RARE[:3]}*", "educ* saúde"],
+}
+
+
+def _text(n_words: int) -> str:
+    return " ".join(random.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=n_words))
+
+
+def build(n_items: int) -> ItemIndex:
+    index = ItemIndex()
+    for item_id in range(1, n_items + 1):
+        index.add(item_id, item_id % 50, _text(8), _text(40), float(item_id))
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build(args.items)
+    elapsed = time.perf_counter() - start
+    print(f"indexed {args.items} items in {elapsed:.1f}s ({args.items / elapsed:.0f} items/s), "
+          f"{len(index.vocabulary)} terms")
+
+    print(f"{'kind':<12} {'query':<28} {'matches':>9} {'ms/query':>10}")
+    for kind, queries in QUERIES.items():
+        for query in queries:
+            clauses = parse_query(query)
+            result = index.search(clauses, 0, 20)
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                index.search(clauses, 0, 20)
+            ms = (time.perf_counter() - start) / args.rounds * 1000
+            print(f"{kind:<12} {query:<28} {result.total:>9} {ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
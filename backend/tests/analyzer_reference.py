@@ -0,0 +1,152 @@
+"""
+Implementação anterior da análise simulada (referência para o DocumentAnalyzer)
+e os geradores de texto do conjunto de equivalência; também usados pelo benchmark
+"""
+import random
+import re
+from collections import Counter
+
+from app.services.text import STOP_WORDS
+
+VOCABULARY = (
+    "dados sistema modelo rede cache processo análise pesquisa memória resultado estudo "
+    "método objetivo evidência documento usuário comunidade servidor latência consulta "
+    "the of and para com que uma não também sobre entre durante"
+).split()
+
+
+# --- implementação anterior ---
+
+def legacy_sections(content):
+    title_patterns = [
+        r'^[A-Z][A-Z\s]{5,}$',
+        r'^\d+\.\s+[A-Z].*$',
+        r'^[IVX]+\.\s+[A-Z].*$',
+        r'^[A-Z][^.!?]*:$',
+        r'^\s*#{1,6}\s+.*$'
+    ]
+    sections = []
+    current_section = []
+    for line in content.split('\n'):
+        is_title = any(re.match(pattern, line.strip(), re.MULTILINE) for pattern in title_patterns)
+        if is_title and current_section:
+            section_text = '\n'.join(current_section).strip()
+            if len(section_text.split()) > 20:
+                sections.append(section_text)
+            current_section = [line]
+        else:
+            current_section.append(line)
+    if current_section:
+        section_text = '\n'.join(current_section).strip()
+        if len(section_text.split()) > 20:
+            sections.append(section_text)
+    if len(sections) <= 1:
+        sections = [p.strip() for p in content.split('\n\n') if len(p.split()) > 50]
+    if len(sections) <= 1:
+        words = content.split()
+        chunk_size = max(200, len(words) // 5)
+        sections = [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
+    return sections[:10]
+
+
+def legacy_topics(content):
+    words = re.findall(r'\b[a-zA-ZÀ-ÿ]{3,}\b', content.lower())
+    significant_words = [word for word in words if word not in STOP_WORDS and len(word) > 3]
+    word_freq = Counter(significant_words)
+    bigrams = []
+    for i in range(len(significant_words) - 1):
+        bigrams.append(f"{significant_words[i]} {significant_words[i+1]}")
+    bigram_freq = Counter(bigrams)
+    top_words = [word for word, count in word_freq.most_common(10) if count > 1]
+    top_bigrams = [bigram for bigram, count in bigram_freq.most_common(5) if count > 1]
+    return (top_words + top_bigrams)[:8]
+
+
+def legacy_summary(section, section_num, topics):
+    words = section.split()
+    sentences = [s.strip() for s in re.split(r'[.!?]+', section) if s.strip()]
+    key_sentences = []
+    indicator_words = ['importante', 'fundamental', 'principal', 'essencial', 'resultado', 'conclusão',
+                       'objetivo', 'método', 'processo', 'descoberta', 'evidência', 'análise', 'estudo',
+                       'pesquisa', 'dados', 'informação']
+    for sentence in sentences:
+        sentence_lower = sentence.lower()
+        topic_matches = sum(1 for topic in topics if topic.lower() in sentence_lower)
+        indicator_matches = sum(1 for word in indicator_words if word in sentence_lower)
+        if topic_matches > 0 or indicator_matches > 0:
+            key_sentences.append((sentence, topic_matches + indicator_matches))
+    key_sentences.sort(key=lambda x: x[1], reverse=True)
+    if key_sentences:
+        summary = f"Seção {section_num}: {key_sentences[0][0][:150]}..."
+        if len(key_sentences) > 1:
+            summary += f" Também aborda: {key_sentences[1][0][:100]}..."
+    elif sentences:
+        summary = f"Seção {section_num}: {sentences[0][:150]}..."
+        if len(sentences) > 1:
+            summary += f" {sentences[1][:100]}..."
+    else:
+        summary = f"Seção {section_num}: Contém {len(words)} palavras sobre os temas do documento."
+    return summary + f" ({len(words)} palavras, {len(sentences)} frases)"
+
+
+def legacy_gist_memory(content):
+    sections = legacy_sections(content)
+    topics = legacy_topics(content)
+    return {
+        "total_pages": max(1, len(sections)),
+        "gists": [legacy_summary(section, i + 1, topics) for i, section in enumerate(sections)],
+        "topics": topics,
+        "word_count": len(content.split()),
+        "sentence_count": len([s for s in re.split(r'[.!?]+', content) if s.strip()]),
+        "paragraph_count": len([p.strip() for p in content.split('\n\n') if p.strip()]),
+    }
+
+
+# --- textos sintéticos ---
+
+def sentence(rng):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(6, 20))).capitalize()
+
+
+def paragraph(rng):
+    return ". ".join(sentence(rng) for _ in range(rng.randint(2, 6))) + rng.choice([".", "!", "?"])
+
+
+def title(rng, n):
+    return rng.choice([
+        f"{n}. {sentence(rng)[:40]}",
+        f"# {sentence(rng)[:40]}",
+        sentence(rng)[:30].upper(),
+        f"{sentence(rng)[:30]}:",
+        f"  {'IVX'[n % 3]}. Parte {n}  ",
+    ])
+
+
+def make_blocks_text(size_bytes, seed=0):
+    """Short lines only: no titles nor long paragraphs, so sections are word blocks of the whole text"""
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < size_bytes:
+        line = sentence(rng) + rng.choice([".", "!", "?"])
+        parts.append(line)
+        size += len(line.encode("utf-8")) + 2
+    return "\n\n".join(parts)
+
+
+def make_text(size_bytes, seed=0, titles=True):
+    rng = random.Random(seed)
+    parts, size, n = [], 0, 0
+    while size < size_bytes:
+        if titles and n % 20 == 0:
+            parts.append(title(rng, n // 20 + 1))
+        block = paragraph(rng)
+        parts.append(block)
+        size += len(block.encode("utf-8")) + 2
+        n += 1
+    return "\n\n".join(parts)
+
+
+def fuzz_text(rng):
+    alphabet = ["A", "B", "IV", "1", ".", "!", "?", ":", "#", " ", "\t", "\r", "\n", "\n\n", "ção", "dados",
+                "Dados", "ESTUDO", "análise", "_", "9.", "ΟΔΟΣ", "İ"]
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 400)))
@@ -0,0 +1,34 @@
+"""
+DocumentAnalyzer: mesmo resultado que a implementação anterior (tests/analyzer_reference.py)
+"""
+import random
+
+from app.services.document_analyzer import DocumentAnalyzer, summarize_text
+from tests.analyzer_reference import (
+    fuzz_text, legacy_gist_memory, legacy_summary, make_blocks_text, make_text,
+)
+
+FUZZ_SAMPLES = 2000
+# Tópicos arbitrários (vazios, com espaços, pontuação, maiúsculas) no resumo
+TOPICS = ["", " dados", "estudo ", "a.b", "ÇÃO", "Σ", "ana", "dados"]
+
+
+def golden_texts():
+    rng = random.Random(42)
+    texts = [make_text(50_000, seed=1), make_text(50_000, seed=2, titles=False), make_blocks_text(50_000), "",
+             "   \n\n  "]
+    return texts + [fuzz_text(rng) for _ in range(FUZZ_SAMPLES)]
+
+
+def test_gist_memory_matches_legacy():
+    for text in golden_texts():
+        assert DocumentAnalyzer(text).gist_memory() == legacy_gist_memory(text), f"divergência para {text[:80]!r}"
+
+
+def test_summary_matches_legacy():
+    rng = random.Random(7)
+    for text in golden_texts():
+        topics = rng.sample(TOPICS, rng.randint(0, 4))
+        assert summarize_text(text, 1, topics) == legacy_summary(text, 1, topics), (
+            f"divergência no resumo de {text[:80]!r} com {topics}"
+        )